@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+A compact, binary on disk format for energy systems and their results.
+
+In contrast to :meth:`EnergySystem.dump <oemof.energy_system.EnergySystem.dump>`
+which pickles the whole object graph, the columnar format splits an energy
+system into two parts stored in a directory:
+
+    - `topology.json`: a table of nodes and flows together with their scalar
+      attributes and references into the array file,
+    - `arrays.npy`: one contiguous float64 array holding all numeric
+      sequences, i.e. the time series attached to flows and nodes as well as
+      the result time series.
+
+On restore the array file is memory-mapped and every sequence is a view into
+it, so nothing is read from disk until it is actually used.
+"""
+
+from collections import UserDict, UserList
+import base64
+import importlib
+import json
+import logging
+import numbers
+import os
+
+import dill as pickle
+import numpy as np
+import pandas as pd
+
+from oemof import network
+
+
+TOPOLOGY = 'topology.json'
+ARRAYS = 'arrays.npy'
+VERSION = 1
+
+
+class ArrayWriter:
+    """ Collects one dimensional arrays and writes them into one contiguous
+    `.npy` file.
+
+    Every call to :meth:`add` returns the location `[offset, length]` of the
+    added values in the resulting file.
+
+    Examples
+    --------
+    >>> writer = ArrayWriter()
+    >>> writer.add([1, 2, 3])
+    [0, 3]
+    >>> writer.add([4, 5])
+    [3, 2]
+    >>> len(writer)
+    5
+    """
+    def __init__(self):
+        self.arrays = []
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        location = [self.size, len(values)]
+        self.arrays.append(values)
+        self.size += len(values)
+        return location
+
+    def write(self, path):
+        """ Write all collected arrays to `path` without concatenating them
+        in memory first.
+        """
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64,
+                                        shape=(self.size,))
+        offset = 0
+        for a in self.arrays:
+            out[offset:offset + len(a)] = a
+            offset += len(a)
+        out.flush()
+        del out
+        self.arrays = []
+
+
+def open_arrays(path, mmap=True):
+    """ Open an array file written by :class:`ArrayWriter`.
+
+    If `mmap` is `True` (the default), the file is memory-mapped read-only.
+    """
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+
+def _qualname(cls):
+    return '{0}:{1}'.format(cls.__module__, cls.__qualname__)
+
+
+def _import(qualname):
+    module, name = qualname.split(':')
+    obj = importlib.import_module(module)
+    for part in name.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _numeric_array(values):
+    """ Return `values` as an array if it is a non empty, one dimensional
+    sequence of numbers and `None` otherwise.
+    """
+    if len(values) == 0:
+        return None
+    try:
+        array = np.asarray(values)
+    except ValueError:
+        return None
+    if array.dtype.kind in 'fiu' and array.ndim == 1:
+        return array
+    return None
+
+
+class _Encoder:
+    """ Turns (nested) attribute values into JSON compatible data, moving all
+    numeric sequences into an :class:`ArrayWriter`.
+    """
+    def __init__(self, nodes, writer):
+        self.index = {id(n): i for i, n in enumerate(nodes)}
+        self.writer = writer
+
+    def __call__(self, value):
+        if value is None or isinstance(value, (bool, str)):
+            return value
+        if isinstance(value, numbers.Integral):
+            return int(value)
+        if isinstance(value, numbers.Real):
+            return float(value)
+        if id(value) in self.index:
+            return {'__node__': self.index[id(value)]}
+        if isinstance(value, tuple):
+            return {'__tuple__': [self(v) for v in value]}
+        if isinstance(value, (UserList, UserDict)):
+            extra = {k: self(v) for k, v in vars(value).items()
+                     if k != 'data'}
+            return {'__user__': _qualname(type(value)),
+                    'data': self(value.data), 'attributes': extra}
+        if isinstance(value, (list, np.ndarray)):
+            array = _numeric_array(value)
+            if array is not None:
+                return {'__array__': self.writer.add(array)}
+            return [self(v) for v in value]
+        if isinstance(value, dict):
+            return {'__dict__': [[self(k), self(v)]
+                                 for k, v in value.items()]}
+        if hasattr(value, '__dict__') and not callable(value):
+            return {'__object__': _qualname(type(value)),
+                    'attributes': {k: self(v)
+                                   for k, v in vars(value).items()}}
+        try:
+            return {'__pickle__': base64.b64encode(
+                pickle.dumps(value)).decode('ascii')}
+        except Exception as e:
+            logging.warning("Could not store value {0!r}: {1}".format(
+                value, e))
+            return None
+
+
+class _Decoder:
+    """ Inverse of :class:`_Encoder`. Arrays are returned as views into the
+    (memory-mapped) array file.
+    """
+    def __init__(self, nodes, arrays):
+        self.nodes = nodes
+        self.arrays = arrays
+
+    def __call__(self, value):
+        if isinstance(value, list):
+            return [self(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        if '__node__' in value:
+            return self.nodes[value['__node__']]
+        if '__tuple__' in value:
+            return tuple(self(v) for v in value['__tuple__'])
+        if '__array__' in value:
+            offset, length = value['__array__']
+            return self.arrays[offset:offset + length]
+        if '__user__' in value:
+            cls = _import(value['__user__'])
+            obj = cls.__new__(cls)
+            vars(obj).update({k: self(v)
+                              for k, v in value['attributes'].items()})
+            # Sequences emulating infinite lists, like
+            # :class:`oemof.solph.plumbing._Sequence`, copy a read-only view
+            # only once they have to grow.
+            obj.data = self(value['data'])
+            return obj
+        if '__dict__' in value:
+            return {self(k): self(v) for k, v in value['__dict__']}
+        if '__object__' in value:
+            cls = _import(value['__object__'])
+            obj = cls.__new__(cls)
+            vars(obj).update({k: self(v)
+                              for k, v in value['attributes'].items()})
+            return obj
+        if '__pickle__' in value:
+            return pickle.loads(base64.b64decode(value['__pickle__']))
+        raise ValueError("Unknown value in columnar dump: {}".format(value))
+
+
+def _encode_timeindex(timeindex):
+    if timeindex is None:
+        return None
+    freq = getattr(timeindex, 'freqstr', None)
+    kind = 'period' if isinstance(timeindex, pd.PeriodIndex) else 'datetime'
+    if freq is not None:
+        return {'kind': kind, 'start': str(timeindex[0]),
+                'periods': len(timeindex), 'freq': freq,
+                'tz': str(getattr(timeindex, 'tz', None) or '') or None}
+    return {'kind': kind, 'values': [str(t) for t in timeindex],
+            'tz': str(getattr(timeindex, 'tz', None) or '') or None}
+
+
+def _decode_timeindex(data):
+    if data is None:
+        return None
+    if data['kind'] == 'period':
+        if 'values' in data:
+            return pd.PeriodIndex(data['values'])
+        return pd.period_range(data['start'], periods=data['periods'],
+                               freq=data['freq'])
+    if 'values' in data:
+        return pd.DatetimeIndex(data['values'], tz=data['tz'])
+    return pd.date_range(data['start'], periods=data['periods'],
+                         freq=data['freq'], tz=data['tz'])
+
+
+def dump(es, path):
+    """ Store the nodes, flows, timeindex and results of `es` in the
+    directory `path` using the columnar format.
+
+    Parameters
+    ----------
+    es : :class:`EnergySystem <oemof.energy_system.EnergySystem>`
+    path : str
+        Directory to write to. It is created if it does not exist.
+    """
+    os.makedirs(path, exist_ok=True)
+    nodes = list(es.nodes)
+    writer = ArrayWriter()
+    encode = _Encoder(nodes, writer)
+    results = es.results
+    if hasattr(results, 'materialize'):
+        # Lazy results reference the optimization model, so store their
+        # values instead.
+        results = results.materialize()
+
+    topology = {
+        'version': VERSION,
+        'timeindex': _encode_timeindex(es.timeindex),
+        'nodes': [{'class': _qualname(type(n)),
+                   'label': (encode(n._label) if hasattr(n, '_label')
+                             else None),
+                   'attributes': {k: encode(v)
+                                  for k, v in getattr(n, '__dict__',
+                                                      {}).items()}}
+                  for n in nodes],
+        'flows': [[encode.index[id(s)], encode.index[id(t)], encode(f)]
+                  for s in nodes for t, f in s.outputs.items()
+                  if id(t) in encode.index],
+        'results': encode(results)}
+
+    with open(os.path.join(path, TOPOLOGY), 'w') as f:
+        json.dump(topology, f)
+    writer.write(os.path.join(path, ARRAYS))
+
+
+def restore(es, path, mmap=True):
+    """ Restore the nodes, flows, timeindex and results stored in the
+    directory `path` into `es`.
+
+    Existing nodes of `es` are replaced and regrouped using the groupings of
+    `es`. Numeric sequences are read-only views into the memory-mapped array
+    file unless `mmap` is `False`. Sequences stored from lists are restored
+    as arrays.
+
+    Parameters
+    ----------
+    es : :class:`EnergySystem <oemof.energy_system.EnergySystem>`
+    path : str
+        Directory written by :func:`dump`.
+    mmap : boolean
+        Whether to memory-map the array file (default) or to read it into
+        memory completely.
+    """
+    with open(os.path.join(path, TOPOLOGY)) as f:
+        topology = json.load(f)
+    if topology.get('version') != VERSION:
+        raise ValueError("Unsupported columnar dump version: {}".format(
+            topology.get('version')))
+    arrays = open_arrays(os.path.join(path, ARRAYS), mmap=mmap)
+
+    nodes = []
+    for n in topology['nodes']:
+        cls = _import(n['class'])
+        node = cls.__new__(cls)
+        kwargs = {}
+        if n['label'] is not None:
+            kwargs['label'] = _Decoder(nodes, arrays)(n['label'])
+            node._label = kwargs['label']
+        node._state = ((), kwargs)
+        nodes.append(node)
+
+    decode = _Decoder(nodes, arrays)
+    for node, n in zip(nodes, topology['nodes']):
+        if n['attributes']:
+            vars(node).update({k: decode(v)
+                               for k, v in n['attributes'].items()})
+    for s, t, f in topology['flows']:
+        network.flow[nodes[s], nodes[t]] = decode(f)
+
+    es.entities = nodes
+    es._groups = {}
+    for n in nodes:
+        es._regroup(n, es.groups, es._groupings)
+    es.timeindex = _decode_timeindex(topology['timeindex'])
+    es.results = decode(topology['results'])
+    return es
@@ -5,15 +5,23 @@ Created on Mon Jul 20 15:53:14 2015
 @author: uwe
 """
 
+from contextvars import ContextVar
 from functools import partial
 import logging
 import os
 
 import dill as pickle
 
+from oemof.columnar import (dump as dump_columnar,
+                            restore as restore_columnar)
 from oemof.network import Entity
 from oemof.groupings import DEFAULT as BY_UID, Grouping, Nodes
-from oemof.network import Node
+from oemof.network import Node, registry_scope
+
+
+#: The registry scopes entered by using energy systems as context managers,
+#: innermost last.
+_scopes = ContextVar("scopes", default=())
 
 
 class EnergySystem:
@@ -101,6 +109,22 @@ class EnergySystem:
     >>> components == es.groups[Sink]
     True
 
+    Constructing an :class:`EnergySystem` makes it the global registry for
+    all nodes created afterwards. If you want to populate several energy
+    systems at the same time, e.g. in different threads or :mod:`asyncio`
+    tasks, use them as context managers instead. Nodes created inside the
+    `with` block are only added to the energy system of the block, regardless
+    of what other threads or tasks are doing:
+
+    >>> first, second = EnergySystem(), EnergySystem()
+    >>> with first:
+    ...     bus = Bus(label="electricity")
+    >>> with second:
+    ...     bus = Bus(label="electricity")
+    ...     sink = Sink(label="demand", inputs=[bus])
+    >>> len(first.nodes), len(second.nodes)
+    (1, 2)
+
     """
     def __init__(self, **kwargs):
         for attribute in ['entities']:
@@ -118,6 +142,19 @@ class EnergySystem:
         self.results = kwargs.get('results')
         self.timeindex = kwargs.get('timeindex')
 
+    def __enter__(self):
+        # The scopes are kept outside of the instance, so that it can be
+        # dumped and restored inside the `with` block.
+        scope = registry_scope(self)
+        scope.__enter__()
+        _scopes.set(_scopes.get() + (scope,))
+        return self
+
+    def __exit__(self, *exc_info):
+        scopes = _scopes.get()
+        _scopes.set(scopes[:-1])
+        return scopes[-1].__exit__(*exc_info)
+
     @staticmethod
     def _regroup(entity, groups, groupings):
         for g in groupings:
@@ -150,8 +187,21 @@ class EnergySystem:
                 for source in self.nodes
                 for target in source.outputs}
 
-    def dump(self, dpath=None, filename=None):
+    def dump(self, dpath=None, filename=None, columnar=False):
         r""" Dump an EnergySystem instance.
+
+        Parameters
+        ----------
+        dpath : str
+            Directory to dump to. Defaults to `~/.oemof/dumps`.
+        filename : str
+            Name of the dump. Defaults to `es_dump.oemof` or, if `columnar` is
+            `True`, to `es_dump.columnar`.
+        columnar : boolean
+            If `True`, use the binary :mod:`columnar format <oemof.columnar>`
+            instead of pickling all attributes. The dump is then a directory
+            with a table of nodes and flows and one contiguous array file
+            containing all sequences and result time series.
         """
         if dpath is None:
             bpath = os.path.join(os.path.expanduser("~"), '.oemof')
@@ -162,17 +212,35 @@ class EnergySystem:
                 os.mkdir(dpath)
 
         if filename is None:
-            filename = 'es_dump.oemof'
+            filename = 'es_dump.columnar' if columnar else 'es_dump.oemof'
 
-        pickle.dump(self.__dict__, open(os.path.join(dpath, filename), 'wb'))
+        if columnar:
+            dump_columnar(self, os.path.join(dpath, filename))
+        else:
+            pickle.dump(self.__dict__,
+                        open(os.path.join(dpath, filename), 'wb'))
 
         msg = ('Attributes dumped to: {0}'.format(os.path.join(
             dpath, filename)))
         logging.debug(msg)
         return msg
 
-    def restore(self, dpath=None, filename=None):
+    def restore(self, dpath=None, filename=None, columnar=False):
         r""" Restore an EnergySystem instance.
+
+        Parameters
+        ----------
+        dpath : str
+            Directory to restore from. Defaults to `~/.oemof/dumps`.
+        filename : str
+            Name of the dump. Defaults to `es_dump.oemof` or, if `columnar` is
+            `True`, to `es_dump.columnar`.
+        columnar : boolean
+            Set this to `True` to restore a dump created with
+            :meth:`dump(columnar=True) <dump>`. In this case the groupings of
+            this instance are kept and the sequences of the restored nodes,
+            flows and results are read-only views into the memory-mapped
+            array file, i.e. they are only read from disk when accessed.
         """
         logging.info(
             "Restoring attributes will overwrite existing attributes.")
@@ -180,9 +248,13 @@ class EnergySystem:
             dpath = os.path.join(os.path.expanduser("~"), '.oemof', 'dumps')
 
         if filename is None:
-            filename = 'es_dump.oemof'
+            filename = 'es_dump.columnar' if columnar else 'es_dump.oemof'
 
-        self.__dict__ = pickle.load(open(os.path.join(dpath, filename), "rb"))
+        if columnar:
+            restore_columnar(self, os.path.join(dpath, filename))
+        else:
+            self.__dict__ = pickle.load(
+                open(os.path.join(dpath, filename), "rb"))
         msg = ('Attributes restored from: {0}'.format(os.path.join(
             dpath, filename)))
         logging.debug(msg)
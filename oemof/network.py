@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import total_ordering
 from weakref import WeakKeyDictionary as WeKeDi, WeakSet as WeSe
 """
@@ -9,6 +11,49 @@ connected.
 """
 
 
+_UNSET = object()
+_registry = ContextVar("registry", default=_UNSET)
+
+
+@contextmanager
+def registry_scope(registry):
+    """ Use `registry` for all nodes and entities created inside the block.
+
+    The registry set via this context manager is local to the current thread
+    or :mod:`asyncio` task and takes precedence over the class level
+    :attr:`Node.registry` and :attr:`Entity.registry` attributes. This makes
+    it possible to populate several registries (usually :class:`EnergySystem
+    <oemof.energy_system.EnergySystem>` instances) concurrently without their
+    nodes leaking into each other. Passing `None` disables registration inside
+    the block.
+
+    Examples
+    --------
+    >>> class Registry(list):
+    ...     add = list.append
+    >>> first, second = Registry(), Registry()
+    >>> with registry_scope(first):
+    ...     n1 = Node(label="n1")
+    ...     with registry_scope(second):
+    ...         n2 = Node(label="n2")
+    ...     n3 = Node(label="n3")
+    >>> [n.label for n in first], [n.label for n in second]
+    (['n1', 'n3'], ['n2'])
+    """
+    token = _registry.set(registry)
+    try:
+        yield registry
+    finally:
+        _registry.reset(token)
+
+
+def _active_registry(cls):
+    """ Return the registry new instances of `cls` should be added to.
+    """
+    registry = _registry.get()
+    return cls.registry if registry is _UNSET else registry
+
+
 class _Edges:
     """ Internal utility class keeping track of known edges.
 
@@ -106,14 +151,24 @@ class Node:
     def __init__(self, *args, **kwargs):
         self._state = (args, kwargs)
         self.__setstate__(self._state)
-        if __class__.registry is not None:
-            __class__.registry.add(self)
+        registry = _active_registry(__class__)
+        if registry is not None:
+            registry.add(self)
 
     def __getstate__(self):
-        return self._state
+        # Flows added after construction, e.g. by `flow[a, b] = f`, aren't
+        # part of the initialization arguments, so the current ones replace
+        # them. Attributes set by subclasses aren't reconstructed from the
+        # initialization arguments either, so they are stored alongside.
+        args, kwargs = self._state
+        kwargs = dict(kwargs, inputs=self.inputs, outputs=dict(self.outputs))
+        return (args, kwargs, dict(getattr(self, '__dict__', {})))
 
     def __setstate__(self, state):
-        args, kwargs = state
+        args, kwargs = state[:2]
+        self._state = (args, kwargs)
+        if len(state) > 2 and state[2]:
+            self.__dict__.update(state[2])
         for optional in ['label']:
             if optional in kwargs:
                 setattr(self, '_' + optional, kwargs[optional])
@@ -211,7 +266,8 @@ class Entity:
         <oemof.core.energy_system.EnergySystem>` it automatically becomes the
         entity registry, i.e. all entities created are added to its
         :attr:`entities <oemof.core.energy_system.EnergySystem.entities>`
-        attribute on construction.
+        attribute on construction. A registry activated via
+        :func:`registry_scope` takes precedence over this attribute.
     """
     optimization_options = {}
 
@@ -232,8 +288,9 @@ class Entity:
         self.geo_data = kwargs.get("geo_data", None)
         self.regions = []
         self.add_regions(kwargs.get('regions', []))
-        if __class__.registry is not None:
-            __class__.registry.add(self)
+        registry = _active_registry(__class__)
+        if registry is not None:
+            registry.add(self)
 
         # TODO: @Gunni Yupp! Add docstring.
     def add_regions(self, regions):
@@ -3,6 +3,7 @@
 
 import os
 import logging
+import numpy as np
 import pandas as pd
 try:
     import matplotlib.pyplot as plt
@@ -11,6 +12,56 @@ except ImportError:
     logging.warning('Matplotlib could not be imported. Plotting will not work.')
 
 
+def result_rows(results):
+    r"""Classifies the entries of a solph result dictionary.
+
+    Yields one tuple `(bus_label, type, obj_label, values)` per time series
+    of `results`, where `type` is one of `'from_bus'`, `'to_bus'` or
+    `'other'`. These are the rows of a :class:`ResultsDataFrame` before they
+    are expanded along the time axis.
+
+    Parameters
+    ----------
+    results : dictionary
+        solph result object, e.g. :attr:`es.results`
+    """
+    for k, v in results.items():
+        if 'Bus' in str(k.__class__):
+            for kk, vv in v.items():
+                if k is kk:
+                    yield (k.label, 'other', 'duals', vv)
+                elif isinstance(kk, str):
+                    yield (k.label, 'from_bus', 'kk', vv)
+                else:
+                    yield (k.label, 'from_bus', kk.label, vv)
+        elif k in v.keys():
+            # self ref. components (results[component][component])
+            bus_label = list(k.outputs.keys())[0].label
+            for kk, vv in v.items():
+                if k is kk:
+                    yield (bus_label, 'other', k.label, vv)
+                else:
+                    # bus inputs (only self ref. components)
+                    yield (bus_label, 'to_bus', k.label,
+                           v.get(list(k.outputs.keys())[0]))
+        else:
+            for kk, vv in v.items():
+                # bus inputs (results[component][bus])
+                yield (kk.label, 'to_bus', k.label, vv)
+
+
+def _array(values):
+    r"""Converts a result sequence to an array, skipping the inference of
+    the dtype if it starts with a float.
+    """
+    if isinstance(next(iter(values), None), float):
+        try:
+            return np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+    return np.asarray(values)
+
+
 class ResultsDataFrame(pd.DataFrame):
     r"""Creates a multi-indexed pandas dataframe from a solph result object
     and holds methods to create subsets of the data.
@@ -43,81 +94,147 @@ class ResultsDataFrame(pd.DataFrame):
         http://pandas.pydata.org/pandas-docs/stable/advanced.html
 
     """
+    _metadata = ['_row_ranges', '_balance_cache']
+
     def __init__(self, **kwargs):
         # default values if not arguments are passed
         es = kwargs.get('energy_system')
 
-        rows_list = []
-        for k, v in es.results.items():
-            if 'Bus' in str(k.__class__):
-                for kk, vv in v.items():
-                    row = dict()
-                    row['bus_label'] = k.label
-                    if k is kk:
-                        row['type'] = 'other'
-                    else:
-                        row['type'] = 'from_bus'
-                    if k is kk:
-                        row['obj_label'] = 'duals'
-                    elif isinstance(kk, str):
-                        row['obj_label'] = 'kk'
-                    else:
-                        row['obj_label'] = kk.label
-                    row['datetime'] = es.timeindex
-                    row['val'] = vv
-                    rows_list.append(row)
-            else:
-                if k in v.keys():
-                    # self ref. components (results[component][component])
-                    for kk, vv in v.items():
-                        if k is kk:
-                            # self ref. comp. (results[component][component])
-                            row = dict()
-                            row['bus_label'] = list(k.outputs.keys())[0].label
-                            row['type'] = 'other'
-                            row['obj_label'] = k.label
-                            row['datetime'] = es.timeindex
-                            row['val'] = vv
-                            rows_list.append(row)
-                        else:
-                            # bus inputs (only self ref. components)
-                            row = dict()
-                            row['bus_label'] = list(k.outputs.keys())[0].label
-                            row['type'] = 'to_bus'
-                            row['obj_label'] = k.label
-                            row['datetime'] = es.timeindex
-                            row['val'] = v.get(list(k.outputs.keys())[0])
-                            rows_list.append(row)
-                else:
-                    for kk, vv in v.items():
-                        # bus inputs (results[component][bus])
-                        row = dict()
-                        row['bus_label'] = kk.label
-                        row['type'] = 'to_bus'
-                        row['obj_label'] = k.label
-                        row['datetime'] = es.timeindex
-                        row['val'] = vv
-                        rows_list.append(row)
-
-        # split date and value lists to tuples
-        tuples = [
-            (item['bus_label'], item['type'], item['obj_label'],
-             date, val)
-            for item in rows_list for date, val in zip(item['datetime'],
-                                                       item['val'])]
-
-        # create MultiIndex DataFrame
         index = ['bus_label', 'type', 'obj_label', 'datetime']
-
-        columns = index + ['val']
-
-        super().__init__(tuples, columns=columns)
-        self.set_index(index, inplace=True)
-        self.sort_index(inplace=True)
+        rows = list(result_rows(es.results))
+        if not rows:
+            super().__init__([], columns=index + ['val'])
+            self.set_index(index, inplace=True)
+            self.clear_cache()
+            return
+
+        # Build the index levels as categoricals from per row codes instead
+        # of per value tuples and sort the rows by them.
+        levels = [pd.Categorical([row[i] for row in rows]) for i in range(3)]
+        row_order = np.lexsort([level.codes for level in levels[::-1]])
+        keys = np.vstack([level.codes[row_order] for level in levels])
+        rows = [rows[i] for i in row_order]
+
+        # One block of consecutive values per row, cut to the length of the
+        # timeindex like `zip` would do.
+        values = [_array(row[3]) for row in rows]
+        lengths = np.array([min(len(v), len(es.timeindex)) for v in values])
+        values = np.concatenate([v[:n] for v, n in zip(values, lengths)])
+        if values.dtype == object:
+            values = pd.Series(values).infer_objects().values
+
+        codes = [np.repeat(key, lengths) for key in keys]
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(len(values)) - np.repeat(offsets, lengths)
+        timeindex = es.timeindex
+        if timeindex.is_monotonic_increasing and timeindex.is_unique:
+            if isinstance(timeindex, pd.DatetimeIndex):
+                timeindex = pd.DatetimeIndex(timeindex, freq=None)
+            datetimes = pd.Categorical.from_codes(positions,
+                                                  timeindex[:lengths.max()])
+            # The values of a row are already sorted by datetime, so the
+            # frame is sorted unless several rows share their labels.
+            unsorted = (keys[:, 1:] == keys[:, :-1]).all(axis=0).any()
+        else:
+            datetimes = pd.Categorical(timeindex.take(positions))
+            unsorted = True
+        codes.append(datetimes.codes)
+
+        if unsorted:
+            # `np.lexsort` is stable, just like `sort_index`, and sorts by
+            # the last key first.
+            order = np.lexsort(codes[::-1])
+            codes = [c[order] for c in codes]
+            values = values[order]
+        # The label levels are kept as categoricals, the datetimes as they
+        # are given.
+        multiindex = pd.MultiIndex(
+            levels=[pd.CategoricalIndex(l.categories) for l in levels] +
+            [datetimes.categories], codes=codes, names=index)
+
+        super().__init__({'val': values}, index=multiindex)
+        self.clear_cache()
+
+    def clear_cache(self):
+        r"""Drops the row range index and the cached bus balances.
+
+        Both are created on first use and dropped whenever the data is
+        changed through pandas, e.g. by `frame['val'] = 0` or `.loc`. Only
+        changes made to the underlying NumPy arrays directly require
+        calling this method.
+        """
+        self._row_ranges = None
+        self._balance_cache = {}
+
+    def _clear_item_cache(self):
+        # pandas calls this after every change of the data made through its
+        # interface, so the caches are dropped along with its own.
+        super()._clear_item_cache()
+        self.clear_cache()
+
+    def _ranges(self):
+        r"""Returns a dictionary mapping `(bus_label, type, obj_label)` to
+        the `(start, stop)` positions of its contiguous block of rows or
+        `None` if the index is not sorted.
+        """
+        if getattr(self, '_row_ranges', None) is None:
+            self._balance_cache = {}
+            self._row_ranges = {}
+            if len(self) and self.index.is_monotonic_increasing:
+                codes = np.vstack(self.index.codes[:3])
+                starts = np.flatnonzero(
+                    np.any(codes[:, 1:] != codes[:, :-1], axis=0)) + 1
+                starts = np.concatenate([[0], starts])
+                stops = np.concatenate([starts[1:], [len(self)]])
+                levels = self.index.levels[:3]
+                for start, stop in zip(starts, stops):
+                    key = tuple(level[c] for level, c in
+                                zip(levels, codes[:, start]))
+                    self._row_ranges[key] = (start, stop)
+            elif len(self):
+                self._row_ranges = False
+        return self._row_ranges or None
+
+    def _blocks(self, bus_label, type, obj_label):
+        r"""Returns the `(start, stop)` row ranges matching the selectors or
+        `None` if they can't be resolved using the row range index.
+        """
+        ranges = self._ranges()
+        if ranges is None:
+            return None
+        selectors = []
+        for level, selector in zip(self.index.levels[:3],
+                                   (bus_label, type, obj_label)):
+            if isinstance(selector, slice):
+                if selector != slice(None):
+                    return None
+                selectors.append(None)
+                continue
+            if isinstance(selector, (list, tuple, pd.Index, np.ndarray)):
+                codes = level.get_indexer(list(selector))
+                if (codes >= 0).all() and (np.diff(codes) <= 0).any():
+                    # `.loc` returns the rows in the requested order.
+                    return None
+            if isinstance(selector, (list, tuple, set, pd.Index, np.ndarray)):
+                selector = set(selector)
+            else:
+                selector = {selector}
+            missing = [l for l in selector if l not in level]
+            if missing:
+                raise KeyError(missing[0])
+            selectors.append(selector)
+        # Ranges are in index order, so the result is sorted like the frame.
+        return [r for key, r in ranges.items()
+                if all(s is None or k in s for k, s in zip(key, selectors))]
 
     def slice_by(self, **kwargs):
         r""" Method for slicing the ResultsDataFrame. A subset is returned.
 
+        Labels (or lists of labels in index order) are looked up in a
+        precomputed index of row ranges, so that selecting a single series
+        returns a slice of contiguous rows. Other selectors fall back to
+        `pd.IndexSlice`.
+
         Other Parameters
         ----------------
         bus_label : string
@@ -134,22 +251,42 @@ class ResultsDataFrame(pd.DataFrame):
         kwargs.setdefault('bus_label', slice(None))
         kwargs.setdefault('type', slice(None))
         kwargs.setdefault('obj_label', slice(None))
-        kwargs.setdefault(
-            'date_from', self.index.get_level_values('datetime')[0])
-        kwargs.setdefault(
-            'date_to', self.index.get_level_values('datetime')[-1])
-
-        # slicing
-        idx = pd.IndexSlice
-
-        subset = self.loc[idx[
-            kwargs['bus_label'],
-            kwargs['type'],
-            kwargs['obj_label'],
-            slice(pd.Timestamp(kwargs['date_from']),
-                  pd.Timestamp(kwargs['date_to']))], :]
-
-        return subset
+        # The date levels are sorted, so this is the whole time range.
+        dates = self.index.levels[3]
+        date_from = pd.Timestamp(kwargs.get('date_from', dates[0]))
+        date_to = pd.Timestamp(kwargs.get('date_to', dates[-1]))
+
+        blocks = self._blocks(
+            kwargs['bus_label'], kwargs['type'], kwargs['obj_label'])
+        if blocks is None:
+            # slicing
+            idx = pd.IndexSlice
+
+            subset = self.loc[idx[
+                kwargs['bus_label'],
+                kwargs['type'],
+                kwargs['obj_label'],
+                slice(date_from, date_to)], :]
+
+            return subset
+
+        if not blocks:
+            raise KeyError((kwargs['bus_label'], kwargs['type'],
+                            kwargs['obj_label'], slice(date_from, date_to)))
+        # Within a block the rows are sorted by time, so the date range is a
+        # contiguous part of it.
+        first = dates.searchsorted(date_from, side='left')
+        last = dates.searchsorted(date_to, side='right')
+        date_codes = self.index.codes[3]
+        positions = []
+        for start, stop in blocks:
+            block = date_codes[start:stop]
+            positions.append((start + block.searchsorted(first, 'left'),
+                              start + block.searchsorted(last, 'left')))
+        if len(positions) == 1:
+            return self.iloc[positions[0][0]:positions[0][1]]
+        return self.iloc[np.concatenate(
+            [np.arange(start, stop) for start, stop in positions])]
 
     def slice_unstacked(self, unstacklevel='obj_label',
                         formatted=False, **kwargs):
@@ -176,11 +313,37 @@ class ResultsDataFrame(pd.DataFrame):
         r"""Method for slicing the ResultsDataFrame. An balance around a bus
         with inputs, outputs and other values is returned.
 
+        The balance is assembled directly from the rows of the bus and
+        cached per bus until the data is changed, so repeated calls only
+        copy the cached frame.
+
         Parameters
         ----------
         bus_label : string
 
         """
+        if self._ranges() is None:
+            return self._slice_bus_balance(bus_label)
+        if bus_label not in self._balance_cache:
+            if bus_label not in self.index.levels[0]:
+                raise KeyError(bus_label)
+            blocks = [(key[2], start, stop)
+                      for key, (start, stop) in self._ranges().items()
+                      if key[0] == bus_label]
+            date_codes = self.index.codes[3]
+            used = np.unique(np.concatenate(
+                [date_codes[start:stop] for _, start, stop in blocks]))
+            data = np.full((len(used), len(blocks)), np.nan)
+            values = self['val'].values
+            for i, (_, start, stop) in enumerate(blocks):
+                rows = used.searchsorted(date_codes[start:stop])
+                data[rows, i] = values[start:stop]
+            self._balance_cache[bus_label] = pd.DataFrame(
+                data, columns=[label for label, _, _ in blocks],
+                index=self.index.levels[3].take(used).rename('datetime'))
+        return self._balance_cache[bus_label].copy()
+
+    def _slice_bus_balance(self, bus_label):
         dfs = []
         for l in self.index.levels[1]:
             df = self.slice_unstacked(bus_label=bus_label, type=l,
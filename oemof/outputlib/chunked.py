@@ -0,0 +1,326 @@
+# -*- coding: utf-8
+"""
+Streaming results to disk in a chunked, columnar format and slicing them
+lazily.
+
+The results of very large models don't have to be held in memory as a
+results dictionary and a :class:`ResultsDataFrame
+<oemof.outputlib.ResultsDataFrame>` at the same time. :func:`dump` writes one
+time series after the other into a directory containing
+
+    - `index.json`: the metadata index, i.e. the timeindex and the position
+      of every `(bus_label, type, obj_label)` series in the value stream as
+      well as the objective and the investment results,
+    - `chunk-00000.npy`, `chunk-00001.npy`, ...: the value stream, cut into
+      float64 arrays of a fixed size,
+    - `arrays.npy`: the numeric sequences found in labels and attributes,
+      stored like in a :mod:`columnar dump <oemof.columnar>`, if there are
+      any.
+
+:class:`ChunkedResults` reads the index and memory-maps only the chunks
+touched by a slice.
+
+Examples
+--------
+>>> import os, tempfile
+>>> import pandas as pd
+>>> path = os.path.join(tempfile.mkdtemp(), 'results')
+>>> timeindex = pd.date_range('1/1/2012', periods=3, freq='H')
+>>> with ChunkedWriter(path, timeindex, chunk_size=4) as writer:
+...     writer.add('bel', 'to_bus', 'pp', [1, 2, 3])
+...     writer.add('bel', 'from_bus', 'demand', [4, 5, 6])
+>>> sorted(f for f in os.listdir(path) if f.startswith('chunk'))
+['chunk-00000.npy', 'chunk-00001.npy']
+>>> results = ChunkedResults(path)
+>>> results.slice_by(obj_label='demand')['val'].tolist()
+[4.0, 5.0, 6.0]
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from oemof.columnar import (ARRAYS, ArrayWriter, _Decoder, _Encoder,
+                            _decode_timeindex, _encode_timeindex, open_arrays)
+from oemof.outputlib import ResultsDataFrame, result_rows
+
+
+INDEX = 'index.json'
+CHUNK = 'chunk-{:05d}.npy'
+CHUNK_SIZE = 2 ** 20
+VERSION = 1
+
+
+class ChunkedWriter:
+    r"""Writes result time series into fixed size chunks in the directory
+    `path`.
+
+    Only the current chunk is held in memory. The metadata index is written
+    by :meth:`close` or when leaving the `with` block.
+
+    Parameters
+    ----------
+    path : string
+        Directory to write to. It is created if it does not exist.
+    timeindex : pandas.DatetimeIndex
+        The timeindex of the results. Series are cut to its length.
+    chunk_size : int
+        Number of values per chunk file.
+    """
+    def __init__(self, path, timeindex, chunk_size=CHUNK_SIZE):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.timeindex = timeindex
+        self.chunk_size = chunk_size
+        self.series = []
+        self.attributes = {}
+        self._arrays = ArrayWriter()
+        self._encode = _Encoder([], self._arrays)
+        self._buffer = np.empty(chunk_size)
+        self._filled = 0
+        self._chunks = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, bus_label, type, obj_label, values):
+        r"""Append the time series `values` of the given row to the value
+        stream.
+        """
+        values = np.asarray(values, dtype=np.float64)[:len(self.timeindex)]
+        start = self._chunks * self.chunk_size + self._filled
+        self.series.append([self._encode(bus_label), type,
+                            self._encode(obj_label), start, len(values)])
+        while len(values):
+            n = min(len(values), self.chunk_size - self._filled)
+            self._buffer[self._filled:self._filled + n] = values[:n]
+            self._filled += n
+            values = values[n:]
+            if self._filled == self.chunk_size:
+                self._flush()
+
+    def _flush(self):
+        np.save(os.path.join(self.path, CHUNK.format(self._chunks)),
+                self._buffer[:self._filled])
+        self._chunks += 1
+        self._filled = 0
+
+    def close(self):
+        r"""Write the last chunk and the metadata index."""
+        if self._filled:
+            self._flush()
+        index = {'version': VERSION,
+                 'chunk_size': self.chunk_size,
+                 'chunks': self._chunks,
+                 'timeindex': _encode_timeindex(self.timeindex),
+                 'series': self.series,
+                 'attributes': self._encode(self.attributes),
+                 'arrays': ARRAYS if len(self._arrays) else None}
+        if len(self._arrays):
+            self._arrays.write(os.path.join(self.path, ARRAYS))
+        with open(os.path.join(self.path, INDEX), 'w') as f:
+            json.dump(index, f)
+
+
+def dump(results, path, timeindex=None, chunk_size=CHUNK_SIZE):
+    r"""Stream `results` to the directory `path`.
+
+    Parameters
+    ----------
+    results : dictionary or OperationalModel
+        A solph results dictionary, e.g. :attr:`es.results`, or a solved
+        :class:`OperationalModel <oemof.solph.models.OperationalModel>`. A
+        model is read through uncached :class:`LazyResults
+        <oemof.solph.models.LazyResults>`, so only one time series at a time
+        is held in memory.
+    path : string
+        Directory to write to.
+    timeindex : pandas.DatetimeIndex
+        Defaults to the timeindex of the model if a model is passed.
+    chunk_size : int
+        Number of values per chunk file.
+    """
+    if hasattr(results, '_result_keys'):
+        from oemof.solph.models import LazyResults
+        if timeindex is None:
+            timeindex = results.timeindex
+        results = LazyResults.from_model(results, cache=False)
+    with ChunkedWriter(path, timeindex, chunk_size=chunk_size) as writer:
+        for row in result_rows(results):
+            writer.add(*row)
+        for attribute in ['objective']:
+            if hasattr(results, attribute):
+                writer.attributes[attribute] = getattr(results, attribute)
+        if hasattr(results, 'investment'):
+            writer.attributes['investment'] = [
+                (i.label, o.label, value)
+                for (i, o), value in results.investment.items()]
+
+
+class ChunkedResults:
+    r"""Lazily reads results written by :func:`dump` or
+    :class:`ChunkedWriter` and provides the slicing methods of
+    :class:`ResultsDataFrame <oemof.outputlib.ResultsDataFrame>`.
+
+    Only the metadata index is read on creation. Slicing memory-maps the
+    chunks holding the selected series.
+
+    Parameters
+    ----------
+    path : string
+        Directory written by :func:`dump`.
+
+    Attributes
+    ----------
+    timeindex : pandas.DatetimeIndex
+    rows : pandas.DataFrame
+        One row per time series, indexed by `bus_label`, `type` and
+        `obj_label` and holding its `start` in the value stream and its
+        `length`.
+    objective : float
+        The objective value, if it was stored.
+    investment : dictionary
+        Investment results keyed by `(source label, target label)`, if they
+        were stored.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX)) as f:
+            index = json.load(f)
+        if index.get('version') != VERSION:
+            raise ValueError("Unsupported chunked results version: {}".format(
+                index.get('version')))
+        arrays = None
+        if index.get('arrays'):
+            arrays = open_arrays(os.path.join(path, index['arrays']))
+        decode = _Decoder([], arrays)
+        self.chunk_size = index['chunk_size']
+        self.timeindex = _decode_timeindex(index['timeindex'])
+        rows = pd.DataFrame(
+            [[decode(b), t, decode(o), start, length]
+             for b, t, o, start, length in index['series']],
+            columns=['bus_label', 'type', 'obj_label', 'start', 'length'])
+        self.rows = rows.set_index(
+            ['bus_label', 'type', 'obj_label']).sort_index()
+        attributes = decode(index['attributes'])
+        if 'objective' in attributes:
+            self.objective = attributes['objective']
+        if 'investment' in attributes:
+            self.investment = {(i, o): value
+                               for i, o, value in attributes['investment']}
+        self._chunks = {}
+
+    def _chunk(self, number):
+        if number not in self._chunks:
+            self._chunks[number] = np.load(
+                os.path.join(self.path, CHUNK.format(number)), mmap_mode='r')
+        return self._chunks[number]
+
+    def values(self, start, stop):
+        r"""Returns the values at positions `start` to `stop` of the value
+        stream, reading only the chunks covering them.
+        """
+        if stop <= start:
+            return np.empty(0)
+        first, last = start // self.chunk_size, (stop - 1) // self.chunk_size
+        parts = [self._chunk(n)[max(start - n * self.chunk_size, 0):
+                                stop - n * self.chunk_size]
+                 for n in range(first, last + 1)]
+        return np.array(parts[0]) if len(parts) == 1 else np.concatenate(parts)
+
+    def _select(self, bus_label, type, obj_label):
+        selectors = []
+        for level, selector in zip(self.rows.index.levels,
+                                   (bus_label, type, obj_label)):
+            if isinstance(selector, slice):
+                selectors.append(selector)
+                continue
+            if isinstance(selector, set):
+                # Sets have no order, so their labels are in index order.
+                selector = [l for l in level if l in selector]
+            elif not isinstance(selector, (list, tuple, pd.Index,
+                                           np.ndarray)):
+                selector = [selector]
+            selectors.append(list(selector))
+        # Lists select the series in the requested order, like `.loc` on a
+        # ResultsDataFrame.
+        rows = self.rows.loc[pd.IndexSlice[tuple(selectors)], :]
+        if rows.empty:
+            raise KeyError((bus_label, type, obj_label))
+        return rows
+
+    def slice_by(self, **kwargs):
+        r"""Returns a subset like :meth:`ResultsDataFrame.slice_by
+        <oemof.outputlib.ResultsDataFrame.slice_by>` does, reading only the
+        selected values from disk.
+
+        Other Parameters
+        ----------------
+        bus_label : string or list of strings
+        type : string or list of strings (to_bus/from_bus/other)
+        obj_label: string or list of strings
+        date_from : string
+            Start date selection e.g. "2016-01-01 00:00:00". If not set, the
+            whole time range is selected.
+        date_to : string
+            End date selection e.g. "2016-03-01 00:00:00". If not set, the
+            whole time range is selected.
+        """
+        rows = self._select(kwargs.get('bus_label', slice(None)),
+                            kwargs.get('type', slice(None)),
+                            kwargs.get('obj_label', slice(None)))
+        first = self.timeindex.searchsorted(
+            pd.Timestamp(kwargs.get('date_from', self.timeindex[0])), 'left')
+        last = self.timeindex.searchsorted(
+            pd.Timestamp(kwargs.get('date_to', self.timeindex[-1])), 'right')
+        keys, values, dates = [], [], []
+        for key, (start, length) in zip(rows.index, rows.values):
+            stop = min(length, last)
+            if stop <= first:
+                continue
+            keys.append((key, stop - first))
+            values.append(self.values(start + first, start + stop))
+            dates.append(self.timeindex[first:stop])
+        index = ['bus_label', 'type', 'obj_label', 'datetime']
+        if not keys:
+            return pd.DataFrame(
+                {'val': []}, index=pd.MultiIndex.from_arrays(
+                    [[]] * 4, names=index))
+        # The labels are categoricals of all labels, just like the levels of
+        # a ResultsDataFrame.
+        arrays = [pd.Categorical(
+            np.repeat(np.array([k[i] for k, _ in keys], dtype=object),
+                      [n for _, n in keys]), categories=level.rename(None))
+            for i, level in enumerate(self.rows.index.levels)]
+        arrays.append(dates[0].append(dates[1:]) if len(dates) > 1
+                      else dates[0])
+        return pd.DataFrame({'val': np.concatenate(values)},
+                            index=pd.MultiIndex.from_arrays(arrays,
+                                                            names=index))
+
+    slice_unstacked = ResultsDataFrame.slice_unstacked
+
+    def slice_bus_balance(self, bus_label):
+        r"""Returns the balance around the bus `bus_label` like
+        :meth:`ResultsDataFrame.slice_bus_balance
+        <oemof.outputlib.ResultsDataFrame.slice_bus_balance>` does.
+
+        Parameters
+        ----------
+        bus_label : string
+        """
+        rows = self._select(bus_label, slice(None), slice(None))
+        length = rows['length'].max()
+        data = np.full((length, len(rows)), np.nan)
+        for i, (start, n) in enumerate(rows.values):
+            data[:n, i] = self.values(start, start + n)
+        index = self.timeindex[:length]
+        if isinstance(index, pd.DatetimeIndex):
+            index = pd.DatetimeIndex(index, freq=None)
+        return pd.DataFrame(data, index=index.rename('datetime'),
+                            columns=list(rows.index.get_level_values(2)))
@@ -6,7 +6,8 @@ from oemof.solph.network import (Sink, Source, LinearTransformer, Storage, Bus,
                                  Flow, EnergySystem, LinearN1Transformer,
                                  VariableFractionTransformer)
 
-from oemof.solph.models import OperationalModel
+from oemof.solph.models import (ExpansionModel, OperationalModel,
+                                SegmentedModel)
 from oemof.solph.groupings import GROUPINGS
 from oemof.solph.options import (Investment, BinaryFlow, DiscreteFlow)
 from oemof.solph.inputlib.csv_tools import NodesFromCSV
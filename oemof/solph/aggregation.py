@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+Solving models on a coarser time resolution.
+
+Consecutive timesteps are merged into segments. :func:`aggregated` replaces
+the sequences of an energy system by their values per segment, i.e. means
+weighted by the time increments, so that a model with one timestep per
+segment can be built from it. :func:`segments` splits the timesteps into
+segments of equal length, while :func:`segment` merges consecutive timesteps
+with similar sequences into segments of varying length. A
+:class:`SegmentedModel <oemof.solph.models.SegmentedModel>` is built on the
+segments and gives its results for the timesteps of the energy system.
+
+:func:`coarse_to_fine` uses such a model to speed up the solution of the
+full model: decisions which the coarse solution already determines, like
+investments, are fixed in the full model, the storage levels are bounded to
+a band around the coarse trajectory and binary variables within periods in
+which a unit runs or stands still in the coarse solution are fixed. It is
+used by :meth:`OperationalModel.solve
+<oemof.solph.models.OperationalModel.solve>` if `solver='coarse-to-fine'`
+is given.
+"""
+
+from contextlib import contextmanager
+import heapq
+import logging
+
+import numpy as np
+
+from .network import Storage
+from .plumbing import sequence
+from .timeseries import sequences
+
+
+#: Attributes which are not averaged over a segment, see :func:`aggregated`.
+_LOSSES = ('capacity_loss',)
+_GRADIENTS = ('positive_gradient', 'negative_gradient')
+
+
+def segments(timesteps, factor):
+    """ Returns `timesteps` split into lists of `factor` consecutive
+    timesteps, the last one possibly being shorter.
+
+    Examples
+    --------
+    >>> segments(range(5), 2)
+    [[0, 1], [2, 3], [4]]
+    """
+    timesteps = list(timesteps)
+    return [timesteps[k:k + factor] for k in range(0, len(timesteps), factor)]
+
+
+def segment(es, n_segments=None, tolerance=None, timesteps=None,
+            timeincrement=None):
+    """ Merges consecutive timesteps with similar sequences into segments
+    of varying length.
+
+    The sequences of the energy system, scaled to the range from zero to
+    one, are compared. Starting with one segment per timestep, the two
+    neighbouring segments whose merger increases the sum of the squared
+    deviations of the scaled sequences from their means in the segments,
+    weighted by time increment, the least are merged until there are
+    `n_segments` segments left or the increase would exceed `tolerance`.
+
+    Parameters
+    ----------
+    es : :class:`EnergySystem <oemof.solph.network.EnergySystem>`
+    n_segments : int
+    tolerance : float
+        At least one of `n_segments` and `tolerance` has to be given.
+    timesteps : sequence
+        The timesteps to segment, by default those of the timeindex.
+    timeincrement : float or list of floats
+        The time increment of the timesteps, by default one.
+
+    Returns
+    -------
+    list
+        The timesteps of every segment.
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> import oemof.solph as solph
+    >>> es = solph.EnergySystem(
+    ...     timeindex=pd.date_range('1/1/2012', periods=6, freq='H'))
+    >>> demand = solph.Sink(label='demand')
+    >>> pv = solph.Source(label='pv', outputs={demand: solph.Flow(
+    ...     actual_value=[0, 0, 0.5, 0.6, 0, 0], nominal_value=1)})
+    >>> segment(es, n_segments=3)
+    [[0, 1], [2, 3], [4, 5]]
+    """
+    if n_segments is None and tolerance is None:
+        raise ValueError("Either n_segments or tolerance has to be given.")
+    timesteps = list(range(len(es.timeindex)) if timesteps is None
+                     else timesteps)
+    timeincrement = sequence(1 if timeincrement is None else timeincrement)
+    profiles = []
+    for obj, attribute, values in sequences(es):
+        values = [values[t] for t in timesteps]
+        if None in values:
+            continue
+        values = np.asarray(values, dtype=np.float64)
+        spread = values.max() - values.min()
+        if spread > 0:
+            profiles.append((values - values.min()) / spread)
+    profiles = (np.column_stack(profiles) if profiles
+                else np.zeros((len(timesteps), 0)))
+
+    # the segments form a linked list of their first positions
+    weights = {p: float(timeincrement[t]) for p, t in enumerate(timesteps)}
+    means = {p: profiles[p] for p in range(len(timesteps))}
+    following = {p: p + 1 for p in range(len(timesteps) - 1)}
+    preceding = {p + 1: p for p in range(len(timesteps) - 1)}
+
+    def cost(a, b):
+        return (weights[a] * weights[b] / (weights[a] + weights[b]) *
+                float(np.sum((means[a] - means[b]) ** 2)))
+
+    heap = [(cost(a, b), a, b) for a, b in following.items()]
+    heapq.heapify(heap)
+    count = len(timesteps)
+    while heap and (n_segments is None or count > n_segments):
+        increase, a, b = heapq.heappop(heap)
+        if following.get(a) != b or increase != cost(a, b):
+            # outdated by an earlier merger
+            continue
+        if tolerance is not None and increase > tolerance:
+            break
+        weight = weights[a] + weights[b]
+        means[a] = (means[a] * weights[a] + means[b] * weights[b]) / weight
+        weights[a] = weight
+        del following[a], preceding[b], weights[b], means[b]
+        if b in following:
+            following[a] = following.pop(b)
+            preceding[following[a]] = a
+            heapq.heappush(heap, (cost(a, following[a]), a, following[a]))
+        if a in preceding:
+            heapq.heappush(heap, (cost(preceding[a], a), preceding[a], a))
+        count -= 1
+    starts = sorted(weights) + [len(timesteps)]
+    return [timesteps[start:end] for start, end in zip(starts, starts[1:])]
+
+
+@contextmanager
+def aggregated(es, segments, timeincrement):
+    """ Replaces the sequences of the energy system `es` by their values per
+    segment while the context is active.
+
+    Sequences are averaged, weighted by the `timeincrement` of the timesteps.
+    The `capacity_loss` of a storage per segment is the loss compounded over
+    its timesteps and the gradients of flows are summed.
+
+    Parameters
+    ----------
+    es : :class:`EnergySystem <oemof.solph.network.EnergySystem>`
+    segments : list
+        The timesteps of every segment.
+    timeincrement : sequence
+        The time increment of every timestep.
+    """
+    saved = []
+
+    def replace(obj, attribute, values):
+        saved.append((obj, attribute, getattr(obj, attribute)))
+        setattr(obj, attribute, values)
+
+    weights = [np.array([timeincrement[t] for t in s], dtype=np.float64)
+               for s in segments]
+    for obj, attribute, values in list(sequences(es)):
+        if attribute in _LOSSES + _GRADIENTS:
+            continue
+        replace(obj, attribute, [
+            float(np.average([values[t] for t in s], weights=w))
+            if values[s[0]] is not None else None
+            for s, w in zip(segments, weights)])
+    for n in es.nodes:
+        if isinstance(n, Storage):
+            replace(n, 'capacity_loss', [
+                1 - float(np.prod([1 - n.capacity_loss[t] for t in s]))
+                for s in segments])
+        for f in n.outputs.values():
+            for attribute in _GRADIENTS:
+                values = getattr(f, attribute)
+                if values[0] is not None:
+                    replace(f, attribute,
+                            [sum(values[t] for t in s) for s in segments])
+    try:
+        yield es
+    finally:
+        for obj, attribute, values in reversed(saved):
+            setattr(obj, attribute, values)
+
+
+def coarse_model(model, segments, extend=None):
+    """ Returns a :class:`SegmentedModel <oemof.solph.models.SegmentedModel>`
+    of the energy system of `model` with one timestep per segment.
+
+    Parameters
+    ----------
+    model : :class:`OperationalModel <oemof.solph.models.OperationalModel>`
+    segments : list
+        Consecutive timesteps of `model`, e.g. as returned by
+        :func:`segments` or :func:`segment`.
+    extend : callable
+        Called with the coarse model to add the constraints which were added
+        to `model` after it was built.
+    """
+    from .models import OperationalModel, SegmentedModel
+    extra = model._constraint_groups[len(OperationalModel.CONSTRAINT_GROUPS):]
+    coarse = SegmentedModel(model.es, segments, constraint_groups=extra,
+                            timeindex=model.timeindex,
+                            timeincrement=model.timeincrement)
+    if extend is not None:
+        extend(coarse)
+    return coarse
+
+
+class _Restrictions:
+    """ Changes of the bounds of variables which can be undone.
+    """
+    def __init__(self):
+        self._saved = []
+
+    def _save(self, var):
+        self._saved.append((var, var.lb, var.ub, var.fixed, var.value))
+
+    def fix(self, var, value):
+        if not var.fixed:
+            self._save(var)
+            var.fix(value)
+
+    def bound(self, var, lb, ub):
+        if var.fixed:
+            return
+        self._save(var)
+        if var.lb is not None:
+            lb = max(lb, var.lb)
+        if var.ub is not None:
+            ub = min(ub, var.ub)
+        var.setlb(lb)
+        var.setub(max(lb, ub))
+
+    def __len__(self):
+        return len(self._saved)
+
+    def undo(self):
+        for var, lb, ub, fixed, value in reversed(self._saved):
+            var.setlb(lb)
+            var.setub(ub)
+            if not fixed:
+                var.unfix()
+            var.set_value(value, skip_validation=True)
+        self._saved = []
+
+
+def _warm_start(model, coarse, segments):
+    """ Sets the values of the flows, storage levels and binary states of
+    `model` to those of the `coarse` solution.
+    """
+    blocks = [('flow', model, coarse)]
+    for name in ('Storage', 'InvestmentStorage', 'BinaryFlow'):
+        variable = 'status' if name == 'BinaryFlow' else 'capacity'
+        if hasattr(getattr(model, name, None), variable):
+            blocks.append((variable, getattr(model, name),
+                           getattr(coarse, name)))
+    for variable, fine_block, coarse_block in blocks:
+        fine, rough = getattr(fine_block, variable), getattr(coarse_block,
+                                                             variable)
+        for index in rough:
+            k, value = index[-1], rough[index].value
+            if value is None:
+                continue
+            for t in segments[k]:
+                var = fine[index[:-1] + (t,)]
+                if not var.fixed:
+                    var.set_value(value, skip_validation=True)
+
+
+def _restrict(model, coarse, segments, storage_band, prune_binaries):
+    """ Restricts `model` using the `coarse` solution, see
+    :func:`coarse_to_fine`, and returns the :class:`_Restrictions`.
+    """
+    restrictions = _Restrictions()
+    for name in ('InvestmentFlow', 'InvestmentStorage'):
+        if hasattr(getattr(model, name, None), 'invest'):
+            invest = getattr(coarse, name).invest
+            for index, var in getattr(model, name).invest.items():
+                restrictions.fix(var, invest[index].value)
+
+    if storage_band is not None:
+        for name in ('Storage', 'InvestmentStorage'):
+            block = getattr(model, name, None)
+            if not hasattr(block, 'capacity'):
+                continue
+            levels = getattr(coarse, name).capacity
+            for n in (block.STORAGES if name == 'Storage'
+                      else block.INVESTSTORAGES):
+                nominal = (n.nominal_capacity if name == 'Storage'
+                           else block.invest[n].value)
+                band = storage_band * nominal
+                for k, s in enumerate(segments):
+                    ends = levels[n, k].value, levels[n, k - 1 if k else
+                                                      len(segments) - 1].value
+                    for t in s:
+                        restrictions.bound(block.capacity[n, t],
+                                           min(ends) - band, max(ends) + band)
+
+    if prune_binaries and hasattr(getattr(model, 'BinaryFlow', None),
+                                  'status'):
+        status = coarse.BinaryFlow.status
+        for i, o in model.BinaryFlow.BINARY_FLOWS:
+            values = [round(status[i, o, k].value)
+                      for k in range(len(segments))]
+            for k, s in enumerate(segments):
+                neighbours = values[max(k - 1, 0):k + 2]
+                if min(neighbours) == max(neighbours):
+                    for t in s:
+                        restrictions.fix(model.BinaryFlow.status[i, o, t],
+                                         values[k])
+    return restrictions
+
+
+def coarse_to_fine(model, factor=4, solver='scipy-highs', solver_io='lp',
+                   options=None, solve_kwargs=None, storage_band=None,
+                   prune_binaries=True, extend=None):
+    """ Solves `model` starting from the solution of a model with `factor`
+    times longer timesteps and loads the solution into it.
+
+    The full model is warm started with the coarse solution, i.e. the values
+    of its variables are set, which solvers use if e.g. `solve_kwargs`
+    contains `{'warmstart': True}`. Investments are fixed to the coarse
+    ones, the storage levels are bounded to `storage_band` times their
+    nominal capacity around the coarse levels at the ends of the segment and
+    binary states are fixed within segments whose neighbours have the same
+    coarse state. If the full model is infeasible with these restrictions,
+    it is solved again without them.
+
+    Parameters
+    ----------
+    model : :class:`OperationalModel <oemof.solph.models.OperationalModel>`
+    factor : int
+        The number of timesteps merged into one.
+    solver, solver_io :
+        The solver solving both models, see :meth:`OperationalModel.solve
+        <oemof.solph.models.OperationalModel.solve>`.
+    options : dictionary
+        The `cmdline_options` of the solver.
+    solve_kwargs : dictionary
+        The `solve_kwargs` of the solver.
+    storage_band : float
+        If `None`, the storage levels aren't bounded.
+    prune_binaries : boolean
+        Whether to fix binary states.
+    extend : callable
+        Called with the coarse model to add the constraints which were added
+        to `model` after it was built.
+
+    Returns
+    -------
+    The solver results of the full model.
+    """
+    from .cache import _succeeded
+    from .models import _solve
+    kwargs = {'cmdline_options': options or {},
+              'solve_kwargs': solve_kwargs or {}}
+    parts = segments(model.timesteps, factor)
+    coarse = coarse_model(model, parts, extend=extend)
+    if not _succeeded(_solve(coarse, solver, solver_io, **kwargs)):
+        logging.warning("The coarse model couldn't be solved, solving the " +
+                        "full model without restrictions.")
+        return _solve(model, solver, solver_io, **kwargs)
+    logging.info("Coarse objective with {} timesteps: {}".format(
+        len(parts), coarse.objective()))
+
+    _warm_start(model, coarse, parts)
+    restrictions = _restrict(model, coarse, parts, storage_band,
+                             prune_binaries)
+    results = _solve(model, solver, solver_io, **kwargs)
+    if restrictions and not _succeeded(results):
+        logging.warning("The restricted model is infeasible, solving it " +
+                        "again without the {} restrictions.".format(
+                            len(restrictions)))
+        restrictions.undo()
+        results = _solve(model, solver, solver_io, **kwargs)
+    return results
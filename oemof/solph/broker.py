@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+Running batches of scenarios through a work queue in a shared directory.
+
+A coordinator stores every energy system once using the :mod:`columnar
+format <oemof.columnar>` and submits jobs, i.e. an energy system together
+with parameter overrides, to a :class:`DirectoryBroker`. Workers on the same
+or on other machines sharing the directory, e.g. via a network file system,
+claim jobs, solve their :class:`OperationalModels
+<oemof.solph.models.OperationalModel>` and store the result sequences as
+compact arrays. The directory contains
+
+    - `systems/`: the energy systems,
+    - `pending/`, `running/`, `done/` and `failed/`: one JSON file per job,
+      which is moved between these directories by atomic renames, so every
+      job is claimed by exactly one worker,
+    - `results/`: one `.npz` file per completed job.
+
+Failed jobs are retried up to `max_attempts` times. Completed jobs are
+checkpoints: submitting them again does nothing, so an interrupted batch can
+simply be submitted and worked on again.
+
+Examples
+--------
+>>> import tempfile
+>>> import pandas as pd
+>>> import oemof.solph as solph
+>>> es = solph.EnergySystem(
+...     timeindex=pd.date_range('1/1/2012', periods=2, freq='H'))
+>>> demand = solph.Sink(label='demand')
+>>> pv = solph.Source(label='pv', outputs={demand: solph.Flow(
+...     actual_value=[1, 2], nominal_value=1, fixed=True, variable_costs=3)})
+>>> broker = DirectoryBroker(tempfile.mkdtemp())
+>>> broker.add_system('base', es)
+>>> for costs in [1, 2]:
+...     broker.submit('costs-{}'.format(costs), 'base',
+...                   overrides={('pv', 'demand'): {'variable_costs': costs}},
+...                   solve_kwargs={'solver': 'scipy-highs'})
+True
+True
+>>> work(broker.path)
+2
+>>> [broker.result(job)['objective'] for job in ['costs-1', 'costs-2']]
+[3.0, 6.0]
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from oemof.columnar import (_decode_timeindex, _encode_timeindex,
+                            dump as dump_columnar,
+                            restore as restore_columnar)
+from oemof.network import Entity, Node
+from .models import OperationalModel
+from .network import EnergySystem
+from .plumbing import sequence
+from .timeseries import SEQUENCE_ATTRIBUTES
+
+
+STATES = ('pending', 'running', 'done', 'failed')
+
+
+class DirectoryBroker:
+    """ A job queue in the directory `path`.
+
+    Parameters
+    ----------
+    path : str
+        The directory, which is created if it doesn't exist.
+    max_attempts : int
+        Number of times a job is run before it is moved to `failed/`.
+    """
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        for directory in ('systems', 'results') + STATES:
+            os.makedirs(os.path.join(path, directory), exist_ok=True)
+
+    def _file(self, state, job_id):
+        return os.path.join(self.path, state, job_id + '.json')
+
+    def _write(self, target, write):
+        """ Writes a file using `write(path)` and moves it to `target` once
+        it is complete.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.tmp-')
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _write_job(self, state, job):
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump(job, f)
+        self._write(self._file(state, job['id']), write)
+
+    def add_system(self, name, es):
+        """ Stores the energy system `es` under `name`, unless there already
+        is one.
+        """
+        target = os.path.join(self.path, 'systems', name)
+        if os.path.exists(target):
+            return
+        tmp = tempfile.mkdtemp(dir=self.path, prefix='.tmp-')
+        dump_columnar(es, tmp)
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            # stored by another coordinator in the meantime
+            shutil.rmtree(tmp)
+
+    def submit(self, job_id, system, overrides=None, model_kwargs=None,
+               solve_kwargs=None):
+        """ Adds a job solving the energy system `system` with `overrides`.
+
+        Returns `False` if the job is already known, e.g. because it was
+        completed before.
+
+        Parameters
+        ----------
+        job_id : str
+            A name unique within the batch, which is used as file name.
+        system : str
+            The name of an energy system added by :meth:`add_system`.
+        overrides : dictionary
+            Maps the label of a node or the `(source label, target label)`
+            tuple of a flow to a dictionary of attributes to set, e.g.
+            `{('pp', 'bel'): {'variable_costs': 50}}`. Sequence attributes
+            can be given as scalars or lists.
+        model_kwargs : dictionary
+            Keyword arguments of the :class:`OperationalModel
+            <oemof.solph.models.OperationalModel>`.
+        solve_kwargs : dictionary
+            Keyword arguments of :meth:`OperationalModel.solve
+            <oemof.solph.models.OperationalModel.solve>`, e.g. the `solver`.
+        """
+        if any(os.path.exists(self._file(state, job_id))
+               for state in STATES):
+            return False
+        job = {'id': job_id, 'system': system,
+               'overrides': [[list(key) if isinstance(key, tuple) else [key],
+                              attribute, value]
+                             for key, attributes in (overrides or {}).items()
+                             for attribute, value in attributes.items()],
+               'model_kwargs': model_kwargs or {},
+               'solve_kwargs': solve_kwargs or {},
+               'attempts': 0, 'errors': []}
+        self._write_job('pending', job)
+        return True
+
+    def claim(self):
+        """ Moves the next pending job to `running/` and returns it, or
+        returns `None` if there is none.
+        """
+        for name in sorted(os.listdir(os.path.join(self.path, 'pending'))):
+            pending = os.path.join(self.path, 'pending', name)
+            running = os.path.join(self.path, 'running', name)
+            try:
+                # the modification time tells when the job was claimed
+                os.utime(pending)
+                os.rename(pending, running)
+            except FileNotFoundError:
+                # claimed by another worker
+                continue
+            with open(running) as f:
+                return json.load(f)
+        return None
+
+    def complete(self, job, objective, keys, values, timeindex=None):
+        """ Stores the results of `job` and moves it to `done/`.
+        """
+        def write(path):
+            with open(path, 'wb') as f:
+                np.savez(f, objective=objective, values=values,
+                         keys=np.array(json.dumps(keys)),
+                         timeindex=np.array(json.dumps(
+                             _encode_timeindex(timeindex))))
+        self._write(os.path.join(self.path, 'results', job['id'] + '.npz'),
+                    write)
+        os.replace(self._file('running', job['id']),
+                   self._file('done', job['id']))
+
+    def fail(self, job, error):
+        """ Records the `error` of `job` and moves it back to `pending/` or,
+        after `max_attempts`, to `failed/`.
+        """
+        job = dict(job, attempts=job['attempts'] + 1,
+                   errors=job['errors'] + [error])
+        state = 'pending' if job['attempts'] < self.max_attempts else 'failed'
+        # The job is moved rather than copied, so a worker claiming it again
+        # right away can't lose it to the removal of the running copy.
+        self._write_job('running', job)
+        os.replace(self._file('running', job['id']),
+                   self._file(state, job['id']))
+
+    def requeue(self, timeout):
+        """ Moves jobs claimed more than `timeout` seconds ago, e.g. by a
+        worker which crashed, back to `pending/` and returns their ids.
+        """
+        requeued = []
+        now = time.time()
+        for name in os.listdir(os.path.join(self.path, 'running')):
+            running = os.path.join(self.path, 'running', name)
+            try:
+                if now - os.path.getmtime(running) > timeout:
+                    os.rename(running,
+                              os.path.join(self.path, 'pending', name))
+                    requeued.append(name[:-len('.json')])
+            except FileNotFoundError:
+                continue
+        return requeued
+
+    def jobs(self, state):
+        """ Returns the ids of the jobs in `state`, i.e. 'pending',
+        'running', 'done' or 'failed'.
+        """
+        return sorted(name[:-len('.json')] for name in
+                      os.listdir(os.path.join(self.path, state))
+                      if name.endswith('.json'))
+
+    def job(self, job_id):
+        """ Returns the job `job_id`, including its `attempts` and `errors`.
+        """
+        for state in STATES:
+            try:
+                with open(self._file(state, job_id)) as f:
+                    return dict(json.load(f), state=state)
+            except FileNotFoundError:
+                continue
+        raise KeyError(job_id)
+
+    def result(self, job_id):
+        """ Returns the results of the completed job `job_id` as a dictionary
+        with the `objective` and the `sequences`, a
+        :class:`pandas.DataFrame` with one column per result sequence keyed
+        by `(source label, target label)` and indexed by the timeindex of
+        the energy system.
+        """
+        with np.load(os.path.join(self.path, 'results',
+                                  job_id + '.npz')) as data:
+            keys = [tuple(k) for k in json.loads(str(data['keys']))]
+            objective = float(data['objective'])
+            values = data['values']
+            timeindex = _decode_timeindex(json.loads(str(data['timeindex'])))
+        if timeindex is not None and len(timeindex) != values.shape[1]:
+            timeindex = None
+        columns = pd.MultiIndex.from_tuples(keys, names=['source', 'target'])
+        return {'objective': objective,
+                'sequences': pd.DataFrame(values.T, index=timeindex,
+                                          columns=columns)}
+
+    def load_system(self, name):
+        """ Returns the energy system stored as `name`, leaving the global
+        registries untouched.
+        """
+        registries = Node.registry, Entity.registry
+        try:
+            es = EnergySystem()
+        finally:
+            Node.registry, Entity.registry = registries
+        return restore_columnar(es, os.path.join(self.path, 'systems', name))
+
+
+def _override(es, overrides):
+    nodes = {str(n.label): n for n in es.nodes}
+    for key, attribute, value in overrides:
+        if len(key) == 1:
+            obj = nodes[str(key[0])]
+        else:
+            obj = nodes[str(key[0])].outputs[nodes[str(key[1])]]
+        for cls, attributes in SEQUENCE_ATTRIBUTES.items():
+            if isinstance(obj, cls) and attribute in attributes:
+                value = sequence(value)
+        setattr(obj, attribute, value)
+
+
+def run(broker, job):
+    """ Solves the model of `job` and returns its objective, the keys of the
+    result sequences as `[source label, target label]` lists, the sequences
+    as a two dimensional array and the timeindex.
+    """
+    es = broker.load_system(job['system'])
+    _override(es, job['overrides'])
+    om = OperationalModel(es, **job['model_kwargs'])
+    om.solve(**job['solve_kwargs'])
+    keys, values = [], []
+    for i, targets in es.results.items():
+        for o, series in targets.items():
+            keys.append([str(i.label), str(o.label)])
+            values.append(np.asarray(series, dtype=np.float64))
+    return (es.results.objective, keys,
+            np.array(values).reshape(len(values), -1), om.timeindex)
+
+
+def work(path, max_jobs=None, max_attempts=3):
+    """ Works on the jobs of the broker in `path` until there are no pending
+    jobs left or `max_jobs` were run and returns the number of jobs run.
+
+    A job raising an exception is :meth:`failed <DirectoryBroker.fail>`
+    with the representation of the exception as error.
+    """
+    broker = DirectoryBroker(path, max_attempts=max_attempts)
+    count = 0
+    while max_jobs is None or count < max_jobs:
+        job = broker.claim()
+        if job is None:
+            break
+        count += 1
+        try:
+            results = run(broker, job)
+        except Exception as e:
+            broker.fail(job, repr(e))
+        else:
+            broker.complete(job, *results)
+    return count
+
+
+def run_workers(path, processes=None, max_attempts=3):
+    """ Runs :func:`work` in `processes` local processes, defaulting to one
+    per processor, and returns the number of jobs run.
+    """
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(processes) as executor:
+        return sum(executor.map(work, [path] * processes, [None] * processes,
+                                [max_attempts] * processes))
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Reusing the solutions of models which were solved before.
+
+A :class:`ResultCache` identifies a model by a fingerprint of its
+:class:`StandardForm <oemof.solph.matrix.StandardForm>`, i.e. the constraint
+matrix, the bounds and the objective, together with the solver and its
+options. If a model with the same fingerprint was solved before, the stored
+solution, duals and reduced costs are loaded into the model instead of
+calling the solver. The cache is used by :meth:`OperationalModel.solve
+<oemof.solph.models.OperationalModel.solve>` if the `cache` argument is
+given.
+
+Examples
+--------
+>>> import pandas as pd
+>>> import oemof.solph as solph
+>>> es = solph.EnergySystem(
+...     timeindex=pd.date_range('1/1/2012', periods=2, freq='H'))
+>>> demand = solph.Sink(label='demand')
+>>> pv = solph.Source(label='pv', outputs={demand: solph.Flow(
+...     actual_value=[1, 2], nominal_value=1, fixed=True, variable_costs=3)})
+>>> cache = ResultCache()
+>>> for run in range(2):
+...     om = solph.OperationalModel(es)
+...     result = om.solve(solver='scipy-highs', cache=cache)
+>>> cache.hits, cache.misses, es.results.objective
+(1, 1, 9)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pyomo.environ as po
+from pyomo.opt import TerminationCondition
+from scipy.optimize import OptimizeResult
+
+from .matrix import StandardForm
+
+
+class ResultCache:
+    """ Solutions of models keyed by their fingerprint.
+
+    Parameters
+    ----------
+    path : str
+        Directory storing one `.npz` file per solution, which is created if
+        it doesn't exist. Without one, the solutions are kept in memory.
+
+    Attributes
+    ----------
+    hits : int
+        The number of solves answered from the cache.
+    misses : int
+        The number of solves which called the solver.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self._memory = {}
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(form, **settings):
+        """ Returns a hash of the :class:`StandardForm
+        <oemof.solph.matrix.StandardForm>` `form` and the `settings`, which
+        have to be encodable as JSON, using their representation otherwise.
+        """
+        digest = hashlib.sha256()
+        A = form.A.tocsr()
+        A.sort_indices()
+        for array in (np.array(A.shape), A.indptr, A.indices, A.data,
+                      form.c, np.array([form.offset, form.sense]),
+                      form.row_lb, form.row_ub, form.lb, form.ub,
+                      form.integrality):
+            array = np.ascontiguousarray(array)
+            digest.update(array.dtype.str.encode())
+            digest.update(array.tobytes())
+        digest.update(json.dumps(settings, sort_keys=True,
+                                 default=repr).encode())
+        return digest.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, key):
+        """ Returns the solution stored as `key` as a dictionary of arrays
+        with the keys 'x', 'fun', 'duals' and 'reduced_costs', or `None`.
+        """
+        if self.path is None:
+            return self._memory.get(key)
+        try:
+            with np.load(self._file(key)) as data:
+                return {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, solution):
+        """ Stores the `solution`, a dictionary of arrays as returned by
+        :meth:`get`, as `key`.
+        """
+        if self.path is None:
+            self._memory[key] = solution
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **solution)
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def solve(self, model, solver, solver_io, **kwargs):
+        """ Loads the solution of `model` from the cache or solves it like
+        :meth:`OperationalModel.solve
+        <oemof.solph.models.OperationalModel.solve>` does and stores the
+        solution if the solver found one.
+
+        Returns the solver results or, on a hit, a
+        :class:`scipy.optimize.OptimizeResult` with the loaded solution and
+        `cached` set to `True`.
+        """
+        from .models import _solve
+        form = StandardForm(model)
+        suffixes = [name for name in ('dual', 'rc')
+                    if isinstance(getattr(model, name, None), po.Suffix)]
+        key = self.fingerprint(
+            form, solver=solver, solver_io=solver_io, suffixes=suffixes,
+            cmdline_options=kwargs.get('cmdline_options', {}),
+            solve_kwargs=kwargs.get('solve_kwargs', {}))
+
+        solution = self.get(key)
+        if solution is not None:
+            self.hits += 1
+            result = OptimizeResult(
+                success=True, status=0, message="Loaded from cache.",
+                cached=True, x=solution['x'], fun=float(solution['fun']),
+                duals=solution['duals'],
+                reduced_costs=solution['reduced_costs'])
+            form.load(model, result)
+            return result
+
+        self.misses += 1
+        results = _solve(model, solver, solver_io, **kwargs)
+        x = [var.value for var in form.variables]
+        if _succeeded(results) and None not in x:
+            solution = {'x': np.array(x, dtype=np.float64),
+                        'fun': np.array(po.value(
+                            next(model.component_data_objects(
+                                po.Objective, active=True))))}
+            for name, components, attribute in [
+                    ('dual', form.constraints, 'duals'),
+                    ('rc', form.variables, 'reduced_costs')]:
+                suffix = getattr(model, name, None)
+                solution[attribute] = np.array(
+                    [suffix.get(component, 0.0) for component in components]
+                    if name in suffixes else [], dtype=np.float64)
+            self.put(key, solution)
+        return results
+
+
+def _succeeded(results):
+    """ Whether `results`, either pyomo's solver results or a
+    :class:`scipy.optimize.OptimizeResult`, contain an optimal solution.
+    """
+    if isinstance(results, OptimizeResult):
+        return bool(results.success)
+    return (results.solver.termination_condition ==
+            TerminationCondition.optimal)
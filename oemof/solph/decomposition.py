@@ -0,0 +1,919 @@
+# -*- coding: utf-8 -*-
+"""
+Decomposition solvers for models which are too large to be solved as a whole.
+
+:func:`benders` solves investment models by Benders decomposition. The
+investment variables are kept in a master problem while the operation is
+split into subproblems covering consecutive chunks of timesteps, e.g. one
+weather year each, which are solved in parallel for fixed investments. The
+duals of the subproblems yield the cuts added to the master problem.
+
+:func:`separable` solves models without constraints linking different
+timesteps, e.g. market clearing without storages, as independent chunks of
+timesteps in parallel. :func:`temporal_coupling` tells what prevents this.
+
+:func:`solve_components` solves the weakly connected :func:`components` of
+an energy system, e.g. countries without interconnections, as separate models
+in parallel.
+
+:func:`lagrangian` solves unit commitment problems by Lagrangian relaxation
+of the constraints coupling the units, usually the bus balances, and solves
+the mixed integer problems of the units independently and in parallel.
+
+The decomposition works on the :class:`StandardForm
+<oemof.solph.matrix.StandardForm>` of a model and uses the HiGHS solvers of
+SciPy, so it needs SciPy 1.9 or newer.
+"""
+
+from collections import UserDict
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+
+import numpy as np
+import pyomo.environ as po
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.optimize import Bounds, LinearConstraint, OptimizeResult, milp
+
+from oemof.network import Entity, Node
+from . import matrix
+from .matrix import StandardForm, linprog_ranged
+from .network import EnergySystem, Storage
+
+
+def _timestep(component, timesteps):
+    """ Returns the timestep indexing the variable or constraint `component`
+    or `None` if it isn't indexed by a timestep.
+    """
+    index = component.index()
+    if isinstance(index, tuple):
+        index = index[-1] if index else None
+    return index if isinstance(index, int) and index in timesteps else None
+
+
+def time_chunks(timesteps, chunks):
+    """ Returns a list of lists of consecutive timesteps.
+
+    Parameters
+    ----------
+    timesteps : sequence
+        All timesteps of a model.
+    chunks : int or iterable
+        Either the number of chunks of (nearly) equal length to create or
+        the chunks themselves, which are returned as lists.
+
+    Examples
+    --------
+    >>> time_chunks(range(7), 3)
+    [[0, 1, 2], [3, 4], [5, 6]]
+    >>> time_chunks(range(7), [range(4), range(4, 7)])
+    [[0, 1, 2, 3], [4, 5, 6]]
+    """
+    if isinstance(chunks, int):
+        return [list(part) for part in np.array_split(list(timesteps), chunks)]
+    return [list(part) for part in chunks]
+
+
+def temporal_coupling(es):
+    """ Returns what links the timesteps of a model of the energy system
+    `es` as a list of `(obj, attribute)` tuples.
+
+    `obj` is either a node, e.g. a :class:`Storage
+    <oemof.solph.network.Storage>` whose content links consecutive
+    timesteps, or the `(source, target)` tuple of a flow with e.g. a
+    `positive_gradient`, a `summed_max` or an `investment`, which applies to
+    all timesteps. Startup and shutdown costs of a :class:`BinaryFlow
+    <oemof.solph.options.BinaryFlow>` are reported as `'binary'`.
+
+    Examples
+    --------
+    >>> from oemof.solph import EnergySystem, Flow, Sink, Source
+    >>> es = EnergySystem()
+    >>> sink = Sink(label='demand')
+    >>> source = Source(label='pp', outputs={sink: Flow(summed_max=10,
+    ...                                               nominal_value=2)})
+    >>> [(i.label, o.label, attribute)
+    ...  for (i, o), attribute in temporal_coupling(es)]
+    [('pp', 'demand', 'summed_max')]
+    """
+    coupling = [(n, 'storage') for n in es.nodes if isinstance(n, Storage)]
+    for (i, o), f in sorted(es.flows().items(),
+                            key=lambda item: (str(item[0][0]),
+                                              str(item[0][1]))):
+        for attribute in ('positive_gradient', 'negative_gradient'):
+            values = getattr(f, attribute, None)
+            if values is not None and values[0] is not None:
+                coupling.append(((i, o), attribute))
+        for attribute in ('summed_max', 'summed_min', 'investment'):
+            if getattr(f, attribute, None) is not None:
+                coupling.append(((i, o), attribute))
+        binary = getattr(f, 'binary', None)
+        if binary is not None and any(
+                getattr(binary, a) is not None
+                for a in ('startup_costs', 'shutdown_costs',
+                          'minimum_uptime', 'minimum_downtime')):
+            coupling.append(((i, o), 'binary'))
+    return coupling
+
+
+#: The subproblems held by a worker process of :class:`_Shards`, keyed by
+#: their positions.
+_SUBPROBLEMS = {}
+
+
+def _initialize(subproblems):
+    global _SUBPROBLEMS
+    _SUBPROBLEMS = subproblems
+
+
+def _batch(function, calls):
+    return [function(*args) for args in calls]
+
+
+class _Shards:
+    """ Worker processes each holding one shard of the `subproblems`.
+
+    Every subproblem is sent to one process only, once, when the process
+    starts. Afterwards only the arguments changing between iterations are
+    sent, so no process holds the whole problem.
+    """
+    def __init__(self, subproblems, max_workers=None):
+        n = max(1, min(max_workers or os.cpu_count() or 1, len(subproblems)))
+        self._executors = [
+            ProcessPoolExecutor(1, initializer=_initialize, initargs=(
+                {k: s for k, s in enumerate(subproblems) if k % n == j},))
+            for j in range(n)]
+
+    def map(self, function, *iterables):
+        """ Returns the list of `function(k, ...)` for every subproblem `k`,
+        with the arguments taken from the `iterables` like :func:`map` does.
+        The first of them has to be `range(len(subproblems))`.
+        """
+        calls = list(zip(*iterables))
+        n = len(self._executors)
+        futures = [executor.submit(_batch, function, calls[j::n])
+                   for j, executor in enumerate(self._executors)]
+        shards = [future.result() for future in futures]
+        return [shards[k % n][k // n] for k in range(len(calls))]
+
+    def shutdown(self):
+        for executor in self._executors:
+            executor.shutdown()
+
+
+def _solve_form(k, options, duals):
+    return _SUBPROBLEMS[k].solve(options, duals=duals)
+
+
+def separable(model, chunks=None, options=None, max_workers=None):
+    """ Solves `model` as independent chunks of timesteps in parallel and
+    loads the solution into it.
+
+    This needs an energy system without :func:`temporal_coupling`. If there
+    is any, the model is solved as a whole by :func:`matrix.solve
+    <oemof.solph.matrix.solve>`.
+
+    Parameters
+    ----------
+    model : OperationalModel
+    chunks : int or iterable
+        The chunks of timesteps to solve separately, see
+        :func:`time_chunks`. Defaults to one chunk per processor.
+    options : dictionary
+        Options passed on to HiGHS, see :meth:`StandardForm.solve
+        <oemof.solph.matrix.StandardForm.solve>`.
+    max_workers : int
+        Number of processes solving chunks in parallel. Defaults to the
+        number of processors. With `1` the chunks are solved one after
+        another in this process.
+
+    Returns
+    -------
+    scipy.optimize.OptimizeResult
+        With the attributes `x`, `fun`, `success`, `message` and, if the
+        model has a `dual` or an `rc` suffix, `duals` and `reduced_costs`.
+        The solution is only loaded if all chunks were solved.
+    """
+    coupling = temporal_coupling(model.es)
+    if coupling:
+        logging.info("Solving the model as a whole, as its timesteps are " +
+                     "linked by {}.".format(coupling[0][1]))
+        return matrix.solve(model, options)
+
+    form = StandardForm(model)
+    if chunks is None:
+        chunks = min(os.cpu_count() or 1, len(model.TIMESTEPS))
+    chunks = [part for part in time_chunks(model.TIMESTEPS, chunks) if part]
+    timesteps = set(model.TIMESTEPS)
+    chunk_of = {t: k for k, part in enumerate(chunks) for t in part}
+    columns = np.array([chunk_of.get(_timestep(v, timesteps), -1)
+                        for v in form.variables], dtype=int)
+    if (columns < 0).any():
+        raise ValueError("Variable {} isn't indexed by a timestep.".format(
+            form.variables[np.flatnonzero(columns < 0)[0]].name))
+    A = form.A.tocoo()
+    highest = np.full(len(form.constraints), -1)
+    lowest = np.full(len(form.constraints), len(chunks))
+    np.maximum.at(highest, A.row, columns[A.col])
+    np.minimum.at(lowest, A.row, columns[A.col])
+    if (lowest != highest).any():
+        raise ValueError("Constraint {} couples several time chunks.".format(
+            form.constraints[np.flatnonzero(lowest != highest)[0]].name))
+
+    subproblems = [form.restrict(np.flatnonzero(highest == k),
+                                 np.flatnonzero(columns == k))
+                   for k in range(len(chunks))]
+    duals = any(isinstance(getattr(model, name, None), po.Suffix)
+                for name in ('dual', 'rc'))
+    if max_workers == 1:
+        results = [s.solve(options, duals=duals) for s in subproblems]
+    else:
+        shards = _Shards(subproblems, max_workers)
+        try:
+            results = shards.map(
+                _solve_form, range(len(subproblems)),
+                [options] * len(subproblems), [duals] * len(subproblems))
+        finally:
+            shards.shutdown()
+
+    failed = [r for r in results if r.x is None]
+    outcome = OptimizeResult(success=not failed, x=None, nit=len(chunks))
+    if failed:
+        outcome.message = failed[0].message
+        logging.warning("{} did not find a solution: {}".format(
+            matrix.SOLVER, outcome.message))
+        return outcome
+    outcome.message = results[0].message
+    outcome.x = np.empty(len(form.variables))
+    if duals:
+        outcome.duals = np.empty(len(form.constraints))
+        outcome.reduced_costs = np.empty(len(form.variables))
+    for s, result in zip(subproblems, results):
+        outcome.x[s.variables] = result.x
+        if duals:
+            outcome.duals[s.constraints] = result.duals
+            outcome.reduced_costs[s.variables] = result.reduced_costs
+    outcome.fun = form.sense * (float(form.c @ outcome.x) + form.offset)
+    form.load(model, outcome)
+    return outcome
+
+
+def components(es):
+    """ Returns the weakly connected components of the energy system `es`,
+    i.e. the sets of nodes linked by flows in either direction, as lists of
+    nodes, largest first.
+
+    Examples
+    --------
+    >>> from oemof.solph import EnergySystem, Sink, Source
+    >>> es = EnergySystem()
+    >>> de, fr = Sink(label='de'), Sink(label='fr')
+    >>> pp = Source(label='pp', outputs={de: None})
+    >>> [[n.label for n in part] for part in components(es)]
+    [['de', 'pp'], ['fr']]
+    """
+    nodes = list(es.nodes)
+    position = {id(n): k for k, n in enumerate(nodes)}
+    edges = np.array([(position[id(i)], position[id(o)])
+                      for i, o in es.flows()], dtype=int).reshape(-1, 2)
+    graph = sparse.coo_matrix(
+        (np.ones(len(edges)), (edges[:, 0], edges[:, 1])),
+        shape=(len(nodes), len(nodes)))
+    _, labels = connected_components(graph, directed=True,
+                                     connection='weak')
+    parts = [[n for n, label in zip(nodes, labels) if label == k]
+             for k in range(labels.max() + 1 if nodes else 0)]
+    return sorted(parts, key=len, reverse=True)
+
+
+def _subsystem(nodes, timeindex):
+    """ Returns an energy system with the `nodes` and the `timeindex`,
+    leaving the global registries untouched.
+    """
+    registries = Node.registry, Entity.registry
+    try:
+        return EnergySystem(entities=list(nodes), timeindex=timeindex)
+    finally:
+        Node.registry, Entity.registry = registries
+
+
+def _solve_component(nodes, timeindex, model_kwargs, solve_kwargs):
+    """ Builds and solves the model of the energy system `nodes` and returns
+    its objective, its results keyed by the positions of the nodes in
+    `nodes`, so that they survive pickling, and the solver results.
+    """
+    from .models import OperationalModel
+    position = {id(n): k for k, n in enumerate(nodes)}
+    sub = _subsystem(nodes, timeindex)
+    model_kwargs = dict(model_kwargs)
+    duals = model_kwargs.pop('duals', False)
+    om = OperationalModel(sub, **model_kwargs)
+    if duals:
+        om.receive_duals()
+    solver_results = om.solve(**solve_kwargs)
+    results = {(position[id(i)], position[id(o)]): values
+               for i, targets in sub.results.items()
+               for o, values in targets.items()}
+    investment = {(position[id(i)], position[id(o)]): value
+                  for (i, o), value in sub.results.investment.items()}
+    return sub.results.objective, results, investment, solver_results
+
+
+def solve_components(es, max_workers=None, model_kwargs=None, **kwargs):
+    r""" Solves the :func:`components` of the energy system `es` as separate
+    :class:`OperationalModels <oemof.solph.models.OperationalModel>` in
+    parallel and stores the merged results as :attr:`es.results`.
+
+    Every model is built from an energy system holding the nodes of one
+    component with the default groupings of solph. Components without flows
+    are skipped.
+
+    Parameters
+    ----------
+    es : :class:`EnergySystem <oemof.solph.network.EnergySystem>`
+    max_workers : int
+        Number of processes building and solving models in parallel.
+        Defaults to the number of processors. With `1` the components are
+        solved one after another in this process.
+    model_kwargs : dictionary
+        Keyword arguments of the :class:`OperationalModels
+        <oemof.solph.models.OperationalModel>`. With `duals=True` the duals
+        are received as well.
+    \**kwargs :
+        Passed on to :meth:`OperationalModel.solve
+        <oemof.solph.models.OperationalModel.solve>`, e.g. `solver`.
+
+    Returns
+    -------
+    list
+        The solver results of every component, which are also stored as
+        :attr:`es.results.solver`.
+    """
+    parts = [nodes for nodes in components(es)
+             if any(n.outputs for n in nodes)]
+    model_kwargs = model_kwargs or {}
+    if max_workers == 1:
+        outcomes = [_solve_component(nodes, es.timeindex, model_kwargs,
+                                     kwargs)
+                    for nodes in parts]
+    else:
+        with ProcessPoolExecutor(max_workers) as executor:
+            outcomes = list(executor.map(
+                _solve_component, parts, [es.timeindex] * len(parts),
+                [model_kwargs] * len(parts), [kwargs] * len(parts)))
+
+    results = UserDict()
+    results.objective = 0
+    results.investment = UserDict()
+    results.solver = []
+    for nodes, (objective, values, investment, solver_results) in zip(
+            parts, outcomes):
+        results.objective += objective
+        for (i, o), series in values.items():
+            results.setdefault(nodes[i], UserDict())[nodes[o]] = series
+        results.investment.update(
+            ((nodes[i], nodes[o]), value)
+            for (i, o), value in investment.items())
+        results.solver.append(solver_results)
+    es.results = results
+    return results.solver
+
+
+class _Subproblem:
+    """ The operational part of a model for one chunk of timesteps.
+
+    The columns of the subproblem are its own variables followed by the
+    `linking` variables of the master problem, whose bounds are fixed to the
+    values proposed by the master problem.
+    """
+    def __init__(self, form, rows, columns, linking):
+        A = form.A[rows]
+        self.rows = rows
+        self.columns = columns
+        self.linking = linking
+        self.A = sparse.hstack([A[:, columns], A[:, linking]], format='csr')
+        self.c = np.concatenate([form.c[columns], np.zeros(len(linking))])
+        self.row_lb = form.row_lb[rows]
+        self.row_ub = form.row_ub[rows]
+        self.lb = form.lb[columns]
+        self.ub = form.ub[columns]
+        self.linking_lb = form.lb[linking]
+        self.linking_ub = form.ub[linking]
+
+    def bound(self, options):
+        """ Returns a lower bound of the objective value of the subproblem
+        for all values of the linking variables within their bounds.
+        """
+        result, _ = linprog_ranged(
+            self.c, self.A, self.row_lb, self.row_ub,
+            np.concatenate([self.lb, self.linking_lb]),
+            np.concatenate([self.ub, self.linking_ub]), options)
+        return result.fun if result.status == 0 else -np.inf
+
+    def solve(self, y, options):
+        """ Solves the subproblem for the values `y` of the linking
+        variables.
+
+        Returns a tuple `(optimal, value, gradient, x, duals)`. If the
+        subproblem is infeasible, `optimal` is `False` and `value` and
+        `gradient` describe the sum of the constraint violations, which is
+        used as a feasibility cut.
+        """
+        n = len(self.columns)
+        lb = np.concatenate([self.lb, y])
+        ub = np.concatenate([self.ub, y])
+        result, duals = linprog_ranged(self.c, self.A, self.row_lb,
+                                       self.row_ub, lb, ub, options)
+        if result.status == 0:
+            return (True, result.fun, self._gradient(result, n),
+                    result.x[:n], duals)
+        if result.status != 2:
+            raise ValueError("Subproblem could not be solved: {}".format(
+                result.message))
+        # Elastic version of the subproblem, minimizing the violations.
+        m = self.A.shape[0]
+        identity = sparse.identity(m, format='csr')
+        result, _ = linprog_ranged(
+            np.concatenate([np.zeros(len(self.c)), np.ones(2 * m)]),
+            sparse.hstack([self.A, identity, -identity], format='csr'),
+            self.row_lb, self.row_ub,
+            np.concatenate([lb, np.zeros(2 * m)]),
+            np.concatenate([ub, np.full(2 * m, np.inf)]), options)
+        return False, result.fun, self._gradient(result, n), None, None
+
+    def _gradient(self, result, n):
+        # The derivative of the objective with respect to the fixed values
+        # of the linking variables.
+        return (result.lower.marginals + result.upper.marginals)[
+            n:n + len(self.linking)]
+
+
+def _solve_subproblem(k, y, options):
+    return _SUBPROBLEMS[k].solve(y, options)
+
+
+def _bound_subproblem(k, options):
+    return _SUBPROBLEMS[k].bound(options)
+
+
+class _Partition:
+    """ Assigns the columns and rows of `form` to the master problem (chunk
+    `-1`) or to one of the time `chunks`.
+
+    Columns which aren't indexed by a timestep, i.e. the investments, belong
+    to the master problem. So do columns referenced by constraints of another
+    chunk, like the storage capacity at the end of a chunk, which links it to
+    the next one.
+    """
+    def __init__(self, form, model, chunks):
+        timesteps = set(model.TIMESTEPS)
+        chunk_of = {t: k for k, part in enumerate(chunks) for t in part}
+        columns = np.array([chunk_of.get(_timestep(v, timesteps), -1)
+                            for v in form.variables], dtype=int)
+        rows = np.array([chunk_of.get(_timestep(c, timesteps), -1)
+                         for c in form.constraints], dtype=int)
+
+        A = form.A.tocoo()
+        cross = ((rows[A.row] >= 0) & (columns[A.col] >= 0) &
+                 (columns[A.col] != rows[A.row]))
+        columns[np.unique(A.col[cross])] = -1
+
+        local = columns[A.col] >= 0
+        highest = np.full(len(rows), -1)
+        lowest = np.full(len(rows), len(chunks))
+        np.maximum.at(highest, A.row[local], columns[A.col[local]])
+        np.minimum.at(lowest, A.row[local], columns[A.col[local]])
+        coupling = (highest >= 0) & (lowest != highest)
+        if coupling.any():
+            raise ValueError("Constraint {} couples several time chunks.".format(
+                form.constraints[np.flatnonzero(coupling)[0]].name))
+        if form.integrality[columns >= 0].any():
+            raise ValueError("Benders decomposition needs continuous " +
+                             "operational variables.")
+        self.columns = columns
+        self.rows = highest
+
+
+def _converged(lower, upper, tolerance):
+    return (np.isfinite(upper) and
+            upper - lower <= tolerance * max(1, abs(upper)))
+
+
+def benders(model, chunks=None, options=None, max_workers=None, tolerance=1e-6,
+            max_iterations=100):
+    r""" Solves `model` by Benders decomposition and loads the solution into
+    it.
+
+    The master problem contains all variables which aren't indexed by a
+    timestep, i.e. the `invest` variables of :class:`InvestmentFlow
+    <oemof.solph.blocks.InvestmentFlow>` and :class:`InvestmentStorage
+    <oemof.solph.blocks.InvestmentStorage>`, together with the variables
+    linking consecutive chunks, like storage capacities at the chunk
+    boundaries. For fixed values of these, the operation of each chunk is an
+    independent linear program. Its objective value and the derivatives with
+    respect to the master variables form an optimality cut, or a feasibility
+    cut if the chunk is infeasible.
+
+    Parameters
+    ----------
+    model : OperationalModel
+    chunks : int or iterable
+        The number of chunks of consecutive timesteps to create or the chunks
+        themselves, see :func:`time_chunks`. Defaults to one chunk per
+        processor.
+    options : dictionary
+        Options passed on to HiGHS, see :meth:`StandardForm.solve
+        <oemof.solph.matrix.StandardForm.solve>`.
+    max_workers : int
+        Number of processes solving subproblems in parallel. Defaults to the
+        number of processors. With `1` the subproblems are solved one after
+        another in this process.
+    tolerance : float
+        The relative gap between the upper and the lower bound of the
+        objective at which to stop.
+    max_iterations : int
+        Number of master problems to solve at most.
+
+    Returns
+    -------
+    scipy.optimize.OptimizeResult
+        With the attributes `x`, `fun`, `duals` (of the constraints belonging
+        to a chunk, `0` for all others), `lower_bound`, `upper_bound`, `nit`
+        and `success`, which is `True` if the tolerance was reached. The best
+        solution found is loaded into `model` in any case.
+    """
+    form = StandardForm(model)
+    if chunks is None:
+        chunks = min(os.cpu_count() or 1, len(model.TIMESTEPS))
+    chunks = [part for part in time_chunks(model.TIMESTEPS, chunks) if part]
+    partition = _Partition(form, model, chunks)
+    options = dict(options or {})
+    options.pop('mip_rel_gap', None)
+
+    master = np.flatnonzero(partition.columns == -1)
+    position = np.full(len(form.variables), -1)
+    position[master] = np.arange(len(master))
+    subproblems = []
+    for k in range(len(chunks)):
+        rows = np.flatnonzero(partition.rows == k)
+        used = np.unique(form.A[rows].indices)
+        subproblems.append(_Subproblem(
+            form, rows, np.flatnonzero(partition.columns == k),
+            used[partition.columns[used] == -1]))
+    master_rows = np.flatnonzero(partition.rows == -1)
+    A_master = form.A[master_rows][:, master]
+
+    n, K = len(master), len(subproblems)
+    cuts, cut_lb = [], []
+    best = (np.inf, None, None)
+    lower = -np.inf
+
+    executor = None if max_workers == 1 else _Shards(subproblems, max_workers)
+    iteration = 0
+    try:
+        # The cost estimates of the chunks are bounded by their optimum for
+        # free linking variables, or fixed to zero until they get a cut if
+        # there is no such bound.
+        if executor is None:
+            theta_lb = np.array([s.bound(options) for s in subproblems])
+        else:
+            theta_lb = np.array(executor.map(
+                _bound_subproblem, range(K), [options] * K))
+        has_cut = np.isfinite(theta_lb)
+        for iteration in range(1, max_iterations + 1):
+            # master problem: investments and one cost estimate per chunk
+            A = sparse.vstack(
+                [sparse.hstack([A_master, sparse.csr_matrix((len(master_rows),
+                                                              K))])] + cuts,
+                format='csr')
+            theta_lb = np.where(has_cut, theta_lb, 0)
+            result = milp(
+                np.concatenate([form.c[master], np.ones(K)]),
+                integrality=np.concatenate([form.integrality[master],
+                                            np.zeros(K)]),
+                bounds=Bounds(np.concatenate([form.lb[master], theta_lb]),
+                              np.concatenate([form.ub[master],
+                                              np.where(has_cut, np.inf, 0)])),
+                constraints=LinearConstraint(
+                    A, np.concatenate([form.row_lb[master_rows], cut_lb]),
+                    np.concatenate([form.row_ub[master_rows],
+                                    np.full(len(cut_lb), np.inf)])),
+                options=options)
+            if result.x is None:
+                raise ValueError("Master problem could not be solved: " +
+                                 result.message)
+            y = result.x[:n]
+            if has_cut.all():
+                lower = max(lower, result.fun)
+
+            ys = [y[position[s.linking]] for s in subproblems]
+            if executor is None:
+                solutions = [s.solve(y_k, options)
+                             for s, y_k in zip(subproblems, ys)]
+            else:
+                solutions = executor.map(_solve_subproblem, range(K), ys,
+                                         [options] * K)
+
+            upper = form.c[master] @ y
+            for k, (optimal, value, gradient, _, _) in enumerate(solutions):
+                link = position[subproblems[k].linking]
+                row = sparse.csr_matrix(
+                    (-gradient, (np.zeros(len(link), dtype=int), link)),
+                    shape=(1, n + K)).tolil()
+                if optimal:
+                    # theta_k >= value + gradient * (y - y_j)
+                    row[0, n + k] = 1
+                    if not has_cut[k]:
+                        has_cut[k], theta_lb[k] = True, -np.inf
+                    upper += value
+                else:
+                    # 0 >= violation + gradient * (y - y_j)
+                    upper = np.inf
+                cuts.append(row.tocsr())
+                cut_lb.append(value - gradient @ ys[k])
+            if upper < best[0]:
+                best = (upper, y, solutions)
+            logging.info("Benders iteration {}: {} <= objective <= {}".format(
+                iteration, lower, best[0]))
+            if _converged(lower, best[0], tolerance):
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    upper, y, solutions = best
+    result = OptimizeResult(
+        success=_converged(lower, upper, tolerance),
+        nit=iteration, lower_bound=form.sense * (lower + form.offset),
+        upper_bound=form.sense * (upper + form.offset), x=None)
+    if y is None:
+        result.message = "No feasible solution found."
+        logging.warning("Benders decomposition: " + result.message)
+        return result
+    x = np.zeros(len(form.variables))
+    duals = np.zeros(len(form.constraints))
+    x[master] = y
+    for s, (_, _, _, xs, ds) in zip(subproblems, solutions):
+        x[s.columns] = xs
+        duals[s.rows] = form.sense * ds
+    result.x, result.duals = x, duals
+    result.fun = form.sense * (upper + form.offset)
+    result.message = ("Converged." if result.success else
+                      "Iteration limit reached.")
+    form.load(model, result)
+    return result
+
+
+class _Unit:
+    """ One independent part of a model once the coupling constraints are
+    relaxed, e.g. a unit with its status variables.
+    """
+    def __init__(self, form, rows, columns, big):
+        self.rows = rows
+        self.columns = columns
+        self.A = form.A[rows][:, columns]
+        self.row_lb = form.row_lb[rows]
+        self.row_ub = form.row_ub[rows]
+        self.lb = np.maximum(form.lb[columns], -big)
+        self.ub = np.minimum(form.ub[columns], big)
+        self.integrality = form.integrality[columns]
+
+    def solve(self, c, options):
+        """ Returns the optimal values of the columns for the costs `c`.
+        """
+        result = milp(c, integrality=self.integrality,
+                      bounds=Bounds(self.lb, self.ub),
+                      constraints=LinearConstraint(self.A, self.row_lb,
+                                                   self.row_ub),
+                      options=options)
+        if result.x is None:
+            raise ValueError("Unit could not be solved: " + result.message)
+        return result.x
+
+
+def _solve_unit(k, c, options):
+    return _SUBPROBLEMS[k].solve(c, options)
+
+
+def _coupling_rows(form, constraints):
+    """ Returns a boolean mask of the rows of `form` belonging to the
+    `constraints`, given as indexed or scalar constraint components.
+    """
+    ids = set()
+    for constraint in constraints:
+        values = (constraint.values() if constraint.is_indexed()
+                  else [constraint])
+        ids.update(id(c) for c in values)
+    return np.array([id(c) in ids for c in form.constraints], dtype=bool)
+
+
+def _units(form, coupling):
+    """ Returns the connected parts of `form` without the `coupling` rows
+    as a list of `(rows, columns)` and the columns in no other row.
+    """
+    rows = np.flatnonzero(~coupling)
+    A = form.A[rows].tocoo()
+    m, n = len(rows), len(form.variables)
+    graph = sparse.coo_matrix((np.ones(len(A.data)), (A.row, m + A.col)),
+                              shape=(m + n, m + n))
+    _, labels = connected_components(graph, directed=False)
+    used = np.zeros(n, dtype=bool)
+    used[A.col] = True
+    row_labels, column_labels = labels[:m], labels[m:]
+    units = [(rows[row_labels == label],
+              np.flatnonzero(used & (column_labels == label)))
+             for label in np.unique(row_labels)]
+    return units, np.flatnonzero(~used)
+
+
+def lagrangian(model, relax=None, options=None, max_workers=None,
+               tolerance=1e-4, max_iterations=100, repair_interval=10,
+               big=1e6):
+    r""" Solves `model` by Lagrangian relaxation and loads the best feasible
+    solution found into it.
+
+    The `relax`\ ed constraints, by default the balances of the buses, are
+    moved into the objective, weighted by multipliers (prices). The
+    remaining model falls apart into independent units, e.g. the flows of
+    one :class:`BinaryFlow <oemof.solph.options.BinaryFlow>` together with
+    its status variables, whose small mixed integer problems are solved in
+    parallel. The multipliers start at the duals of the linear relaxation
+    of the model and are updated by subgradient steps. Feasible solutions
+    are repaired from the unit solutions by fixing the integer variables
+    and solving the remaining linear program of the whole model.
+
+    Parameters
+    ----------
+    model : OperationalModel
+    relax : list
+        The constraints to relax, e.g. `[om.Bus.balance]`.
+    options : dictionary
+        Options passed on to HiGHS, see :meth:`StandardForm.solve
+        <oemof.solph.matrix.StandardForm.solve>`.
+    max_workers : int
+        Number of processes solving units in parallel. Defaults to the
+        number of processors. With `1` the units are solved one after another
+        in this process.
+    tolerance : float
+        The relative gap between the best feasible solution and the best
+        lower bound at which to stop.
+    max_iterations : int
+        Number of subgradient steps at most.
+    repair_interval : int
+        Number of subgradient steps after which a feasible solution is
+        repaired from the current unit solutions.
+    big : float
+        Bound used for unbounded variables in the units, so that the relaxed
+        problem stays bounded. Iterations in which a variable reaches it
+        only update the multipliers, as their objective values aren't lower
+        bounds.
+
+    Returns
+    -------
+    scipy.optimize.OptimizeResult
+        With the attributes `x`, `fun`, `duals` (of the repair problem),
+        `multipliers`, `lower_bound`, `upper_bound`, `nit` and `success`,
+        which is `True` if the tolerance was reached.
+    """
+    form = StandardForm(model)
+    if relax is None:
+        if not hasattr(getattr(model, 'Bus', None), 'balance'):
+            raise ValueError("The model has no bus balances to relax.")
+        relax = [model.Bus.balance]
+    coupling = _coupling_rows(form, relax)
+    options = dict(options or {})
+    lp_options = {k: v for k, v in options.items() if k != 'mip_rel_gap'}
+
+    R = form.A[coupling]
+    r_lb, r_ub = form.row_lb[coupling], form.row_ub[coupling]
+    units, free = _units(form, coupling)
+    subproblems = [_Unit(form, rows, columns, big)
+                   for rows, columns in units]
+    free_lb = np.maximum(form.lb[free], -big)
+    free_ub = np.minimum(form.ub[free], big)
+    integer = form.integrality.astype(bool)
+
+    # warm start with the duals of the linear relaxation
+    relaxation, duals = linprog_ranged(form.c, form.A, form.row_lb,
+                                       form.row_ub, form.lb, form.ub,
+                                       lp_options)
+    if relaxation.status != 0:
+        raise ValueError("Linear relaxation could not be solved: " +
+                         relaxation.message)
+    y = duals[coupling]
+    lower, upper = relaxation.fun, np.inf
+    best = None
+
+    # integer variables at integral values in the linear relaxation
+    rounded = np.round(relaxation.x)
+    integral = integer & (np.abs(relaxation.x - rounded) < 1e-6)
+
+    def fix(x, columns):
+        return (np.where(columns, x, form.lb), np.where(columns, x, form.ub))
+
+    def repair(x):
+        x = np.where(integer, np.round(x), x)
+        result, duals = linprog_ranged(form.c, form.A, form.row_lb,
+                                       form.row_ub, *fix(x, integer),
+                                       lp_options)
+        if result.status == 0:
+            return result, duals
+        # Keep the commitments on which the units and the linear relaxation
+        # agree and optimize the other integer variables.
+        lb, ub = fix(x, integral & (x == rounded) & (x != 0))
+        restricted = milp(form.c, integrality=form.integrality,
+                          bounds=Bounds(lb, ub),
+                          constraints=LinearConstraint(form.A, form.row_lb,
+                                                       form.row_ub),
+                          options=options)
+        if restricted.x is None:
+            return None, None
+        x = np.where(integer, np.round(restricted.x), restricted.x)
+        result, duals = linprog_ranged(form.c, form.A, form.row_lb,
+                                       form.row_ub, *fix(x, integer),
+                                       lp_options)
+        return (result, duals) if result.status == 0 else (None, None)
+
+    executor = None if max_workers == 1 else _Shards(subproblems, max_workers)
+    iteration, x = 0, relaxation.x
+    try:
+        step = 2.0
+        stalled = 0
+        for iteration in range(1, max_iterations + 1):
+            c = form.c - R.T @ y
+            x = np.empty(len(form.variables))
+            costs = [c[s.columns] for s in subproblems]
+            if executor is None:
+                solutions = [s.solve(c_k, options)
+                             for s, c_k in zip(subproblems, costs)]
+            else:
+                solutions = executor.map(
+                    _solve_unit, range(len(subproblems)), costs,
+                    [options] * len(subproblems))
+            for s, x_k in zip(subproblems, solutions):
+                x[s.columns] = x_k
+            x[free] = np.where(c[free] < 0, free_ub, free_lb)
+
+            activity = R @ x
+            value = c @ x + np.where(y > 0, y * r_lb, y * r_ub).sum()
+            # A variable at `big` instead of its infinite bound means that
+            # the relaxed problem is unbounded, so `value` is no bound.
+            bounded = not (np.isinf(form.lb) & (x <= -big) |
+                           np.isinf(form.ub) & (x >= big)).any()
+            if bounded and value > lower + 1e-9 * max(1, abs(lower)):
+                lower, stalled = value, 0
+            else:
+                stalled += 1
+                if stalled >= 5:
+                    step, stalled = step / 2, 0
+
+            if best is None or iteration % repair_interval == 0:
+                result, repaired = repair(x)
+                if result is not None and result.fun < upper:
+                    upper, best = result.fun, (result, repaired)
+            logging.info(
+                "Lagrangian iteration {}: {} <= objective <= {}".format(
+                    iteration, lower, upper))
+            if _converged(lower, upper, tolerance):
+                break
+
+            g = np.where(y > 0, r_lb - activity,
+                         np.where(y < 0, r_ub - activity,
+                                  np.clip(activity, r_lb, r_ub) - activity))
+            if not g.any():
+                break
+            target = (upper if np.isfinite(upper)
+                      else value + 0.05 * max(1, abs(value)))
+            y = y + step * max(target - value, 0) / (g @ g) * g
+            # multipliers of one-sided constraints keep their sign
+            y = np.where(np.isinf(r_lb), np.minimum(y, 0), y)
+            y = np.where(np.isinf(r_ub), np.maximum(y, 0), y)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if not np.isfinite(upper):
+        result, repaired = repair(x)
+        if result is not None:
+            upper, best = result.fun, (result, repaired)
+
+    outcome = OptimizeResult(
+        success=_converged(lower, upper, tolerance), nit=iteration,
+        lower_bound=form.sense * (lower + form.offset),
+        upper_bound=form.sense * (upper + form.offset),
+        multipliers=form.sense * y, x=None)
+    if best is None:
+        outcome.message = "No feasible solution found."
+        logging.warning("Lagrangian relaxation: " + outcome.message)
+        return outcome
+    result, repaired = best
+    outcome.x = result.x
+    outcome.fun = form.sense * (result.fun + form.offset)
+    outcome.duals = form.sense * repaired
+    outcome.reduced_costs = form.sense * (result.lower.marginals +
+                                          result.upper.marginals)
+    outcome.message = ("Converged." if outcome.success else
+                       "Iteration limit reached.")
+    form.load(model, outcome)
+    return outcome
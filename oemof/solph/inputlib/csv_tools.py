@@ -1,8 +1,15 @@
 # -*- coding: utf-8 -*-
 
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import csv
+import hashlib
+import numpy as np
 import pandas as pd
 import os
 import logging
+import pickle
 from oemof import network
 from ..options import BinaryFlow, Investment
 from ..plumbing import sequence
@@ -12,7 +19,7 @@ from ..network import (Bus, Source, Sink, Flow, LinearTransformer, Storage)
 def NodesFromCSV(file_nodes_flows, file_nodes_flows_sequences,
                  delimiter=',', additional_classes=None,
                  additional_seq_attributes=None,
-                 additional_flow_attributes=None):
+                 additional_flow_attributes=None, cache=False):
     """ Creates nodes with their respective flows and sequences from
     a pre-defined CSV structure. An example has been provided in the
     development examples
@@ -34,6 +41,11 @@ def NodesFromCSV(file_nodes_flows, file_nodes_flows_sequences,
     additional_flow_attributes : iterable
         List of string with attributes that shall be recognized inside the
         csv file and set as flow attribute
+    cache : boolean
+        If `True`, the parsed contents of both files are stored in a binary
+        cache file next to `file_nodes_flows` (with the suffix `.cache`) and
+        are read from there as long as the modification time or the hash of
+        both files is unchanged. Default: `False`
 
     """
     # Check attributes for None values
@@ -45,15 +57,15 @@ def NodesFromCSV(file_nodes_flows, file_nodes_flows_sequences,
         additional_flow_attributes = list()
 
     # dataframe creation and manipulation
-    nodes_flows = pd.read_csv(file_nodes_flows, sep=delimiter)
-    nodes_flows_seq = pd.read_csv(file_nodes_flows_sequences, sep=delimiter,
-                                  header=None)
-    nodes_flows_seq.dropna(axis=0, how='all', inplace=True)
-    nodes_flows_seq.drop(0, axis=1, inplace=True)
-    nodes_flows_seq = nodes_flows_seq.transpose()
-    nodes_flows_seq.set_index([0, 1, 2, 3, 4], inplace=True)
-    nodes_flows_seq.columns = range(0, len(nodes_flows_seq.columns))
-    nodes_flows_seq = nodes_flows_seq.astype(float)
+    if cache:
+        columns, rows, keys, data = _read_cached(
+            file_nodes_flows, file_nodes_flows_sequences, delimiter)
+    else:
+        columns, rows = _read_nodes_flows(file_nodes_flows, delimiter)
+        keys, data = _read_sequences(file_nodes_flows_sequences, delimiter)
+    sequences = {}
+    for column, key in enumerate(keys):
+        sequences.setdefault(key, data[:, column])
 
     # class dictionary for dynamic instantiation
     classes = {'Source': Source, 'Sink': Sink,
@@ -71,206 +83,273 @@ def NodesFromCSV(file_nodes_flows, file_nodes_flows_sequences,
     # attributes of different classes
     flow_attrs = list(vars(Flow()).keys()) + additional_flow_attributes
     bus_attrs = vars(Bus()).keys()
-
-    # iteration over dataframe rows to create objects
+    invest_attrs = vars(Investment()).keys()
+    binary_attrs = vars(BinaryFlow()).keys()
+
+    # resolve the columns to node and flow attributes once, instead of
+    # checking every attribute of every row
+    # for the check below we use all flow_attrs except investment
+    # because for storages investment needs to be set as a node
+    # attribute (and a flow attribute)
+    node_columns = [c for c in columns
+                    if c not in flow_attrs or c == 'investment'
+                    if c not in ('class', 'label', 'source', 'target',
+                                 'conversion_factors')]
+    flow_columns = [c for c in flow_attrs if c in columns]
+
+    def value(row, attr):
+        """ Returns the scalar or sequence value of `attr` in `row`.
+        """
+        if row[attr] == 'seq':
+            return sequences[row['class'], row['label'], row['source'],
+                             row['target'], attr]
+        if attr in seq_attributes:
+            return sequence(float(row[attr]))
+        return row[attr]
+
+    # iteration over rows to create objects
     nodes = {}
-    for i, r in nodes_flows.iterrows():
+    for i, row in enumerate(rows):
 
         # check if current line holds valid data or is just for visual purposes
         # e.g. a blank line or a line that contains data explanations
-        if isinstance(r['class'], str) and r['class'] in classes.keys():
+        if not (isinstance(row.get('class'), str) and
+                row['class'] in classes.keys()):
+            continue
+
+        # create node if not existent and set attributes
+        # (attributes must be placed either in the first line or in all
+        #  lines of multiple node entries (flows) in csv file)
+        try:
+            node = nodes.get(row['label'])
+            if node is None:
+                node = classes[row['class']](label=row['label'])
+            for attr in node_columns:
+                if attr not in row:
+                    continue
+                # again from investment storage the next lines are a little
+                # hacky as we need to create an solph.options.Investment()
+                # object
+                if (row[attr] != 'seq' and isinstance(node, Storage) and
+                        attr == 'investment'):
+                    setattr(node, attr, Investment())
+                    for iattr in invest_attrs:
+                        if iattr in row.keys() and row[attr]:
+                            setattr(node.investment, iattr, row[iattr])
+                # for all 'normal' attributes
+                else:
+                    setattr(node, attr, value(row, attr))
+        except:
+            print('Error with node creation in line', i+2, 'in csv file.')
+            print('Label:', row['label'])
+            raise
+
+        # create flow and set attributes
+        try:
+            flow = Flow()
+            for attr in flow_columns:
+                if attr in row.keys() and row[attr]:
+                    setattr(flow, attr, value(row, attr))
+                    # this block is only for binary flows!
+                    if attr == 'binary' and row[attr] is True:
+                        # create binary object for flow
+                        setattr(flow, attr, BinaryFlow())
+                        for battr in binary_attrs:
+                            if battr in row.keys():
+                                setattr(flow.binary, battr, row[battr])
+                    # this block is only for investment flows!
+                    if attr == 'investment' and row[attr] is True:
+                        # set the flows of the storage to Investment
+                        # without attributes, as costs etc are set at the
+                        # node
+                        setattr(flow, attr, Investment())
+                        if not isinstance(node, Storage):
+                            for iattr in invest_attrs:
+                                if iattr in row.keys():
+                                    setattr(flow.investment, iattr,
+                                            row[iattr])
+        except:
+            print('Error with flow creation in line', i+2, 'in csv file.')
+            print('Label:', row['label'])
+            raise
+
+        # create an input entry for the current line
+        try:
+            if row['label'] == row['target']:
+                if row['source'] not in nodes.keys():
+                    nodes[row['source']] = Bus(label=row['source'])
+                    for attr in bus_attrs:
+                        if attr in row.keys() and row[attr] is not None:
+                            setattr(nodes[row['source']], attr, row[attr])
+                inputs = {nodes[row['source']]: flow}
+            else:
+                inputs = {}
+        except:
+            print('Error with input creation in line', i+2, 'in csv file.')
+            print('Label:', row['label'])
+            raise
+
+        # create an output entry for the current line
+        try:
+            if row['label'] == row['source']:
+                if row['target'] not in nodes.keys():
+                    nodes[row['target']] = Bus(label=row['target'])
+                    for attr in bus_attrs:
+                        if attr in row.keys() and row[attr] is not None:
+                            setattr(nodes[row['target']], attr, row[attr])
+                outputs = {nodes[row['target']]: flow}
+            else:
+                outputs = {}
+        except:
+            print('Error with output creation in line', i+2,
+                  'in csv file.')
+            print('Label:', row['label'])
+            raise
+
+        # create a conversion_factor entry for the current line
+        try:
+            if row['target'] and 'conversion_factors' in row:
+                conversion_factors = {
+                    nodes[row['target']]: sequence(
+                        value(row, 'conversion_factors') if
+                        row['conversion_factors'] == 'seq' else
+                        float(row['conversion_factors']))}
+            else:
+                conversion_factors = {}
+        except:
+            print('Error with conversion factor creation in line', i+2,
+                  'in csv file.')
+            print('Label:', row['label'])
+            raise
+
+        # add node to dict and assign attributes depending on
+        # if there are multiple lines per node or not
+        try:
+            for source, f in inputs.items():
+                network.flow[source, node] = f
+            for target, f in outputs.items():
+                network.flow[node, target] = f
+            if node.label in nodes.keys():
+                if not isinstance(node, Bus):
+                    node.conversion_factors.update(conversion_factors)
+            else:
+                if not isinstance(node, Bus):
+                    node.conversion_factors = conversion_factors
+                    nodes[node.label] = node
+        except:
+            print('Error adding node to dict in line', i+2, 'in csv file.')
+            print('Label:', row['label'])
+            raise
 
-            # drop NaN values from series
-            r = r.dropna()
-            # save column labels and row values in dict
-            row = dict(zip(r.index.values, r.values))
+    return nodes
 
-            # create node if not existent and set attributes
-            # (attributes must be placed either in the first line or in all
-            #  lines of multiple node entries (flows) in csv file)
-            try:
-                if row['class'] in classes.keys():
-                    node = nodes.get(row['label'])
-                    if node is None:
-                        node = classes[row['class']](label=row['label'])
-                # for the if check below we use all flow_attrs except
-                # investment
-                # because for storages investment needs to be set as a node
-                # attribute (and a flow attribute)
-                flow_attrs_ = [i for i in flow_attrs if i != 'investment']
-                for attr in row.keys():
-                    if (attr not in flow_attrs_ and
-                       attr not in ('class', 'label', 'source', 'target',
-                                    'conversion_factors')):
-                            if row[attr] != 'seq':
-                                if attr in seq_attributes:
-                                    row[attr] = sequence(float(row[attr]))
-                                # again from investment storage the next lines
-                                # are a little hacky as we need to create an
-                                # solph.options.Investment() object
-                                if (isinstance(node, Storage) and
-                                        attr == 'investment'):
-                                    setattr(node, attr, Investment())
-                                    invest_attrs = vars(Investment()).keys()
-                                    for iattr in invest_attrs:
-                                        if iattr in row.keys() and row[attr]:
-                                            setattr(node.investment,
-                                                    iattr, row[iattr])
-                                # for all 'normal' attributes
-                                else:
-                                    setattr(node, attr, row[attr])
-
-                            else:
-                                seq = nodes_flows_seq.loc[row['class'],
-                                                          row['label'],
-                                                          row['source'],
-                                                          row['target'],
-                                                          attr]
-                                if attr in seq_attributes:
-                                    seq = [i for i in seq]
-                                    seq = sequence(seq)
-                                else:
-                                    seq = [i for i in seq.values]
-                                setattr(node, attr, seq)
-            except:
-                print('Error with node creation in line', i+2, 'in csv file.')
-                print('Label:', row['label'])
-                raise
-
-            # create flow and set attributes
-            try:
-                flow = Flow()
-                for attr in flow_attrs:
-                    if attr in row.keys() and row[attr]:
-                        if row[attr] != 'seq':
-                            if attr in seq_attributes:
-                                row[attr] = sequence(float(row[attr]))
-                            setattr(flow, attr, row[attr])
-                        if row[attr] == 'seq':
-                            seq = nodes_flows_seq.loc[row['class'],
-                                                      row['label'],
-                                                      row['source'],
-                                                      row['target'],
-                                                      attr]
-                            if attr in seq_attributes:
-                                seq = [i for i in seq]
-                                seq = sequence(seq)
-                            else:
-                                seq = [i for i in seq.values]
-                            setattr(flow, attr, seq)
-                        # this block is only for binary flows!
-                        if attr == 'binary' and row[attr] is True:
-                            # create binary object for flow
-                            setattr(flow, attr, BinaryFlow())
-                            binary_attrs = vars(BinaryFlow()).keys()
-                            for battr in binary_attrs:
-                                if battr in row.keys() and row[attr]:
-                                    setattr(flow.binary, battr, row[battr])
-                        # this block is only for investment flows!
-                        if attr == 'investment' and row[attr] is True:
-                            if isinstance(node, Storage):
-                                # set the flows of the storage to Investment as
-                                # without attributes, as costs etc are set at
-                                # the node
-                                setattr(flow, attr, Investment())
-                            else:
-                                # create binary object for flow
-                                setattr(flow, attr, Investment())
-                                invest_attrs = vars(Investment()).keys()
-                                for iattr in invest_attrs:
-                                    if iattr in row.keys() and row[attr]:
-                                        setattr(flow.investment, iattr,
-                                                row[iattr])
-            except:
-                print('Error with flow creation in line', i+2, 'in csv file.')
-                print('Label:', row['label'])
-                raise
-
-            # create an input entry for the current line
-            try:
-                if row['label'] == row['target']:
-                    if row['source'] not in nodes.keys():
-                        nodes[row['source']] = Bus(label=row['source'])
-                        for attr in bus_attrs:
-                            if attr in row.keys() and row[attr] is not None:
-                                setattr(nodes[row['source']], attr, row[attr])
-                    inputs = {nodes[row['source']]: flow}
-                else:
-                    inputs = {}
-            except:
-                print('Error with input creation in line', i+2, 'in csv file.')
-                print('Label:', row['label'])
-                raise
 
-            # create an output entry for the current line
-            try:
-                if row['label'] == row['source']:
-                    if row['target'] not in nodes.keys():
-                        nodes[row['target']] = Bus(label=row['target'])
-                        for attr in bus_attrs:
-                            if attr in row.keys() and row[attr] is not None:
-                                setattr(nodes[row['target']], attr, row[attr])
-                    outputs = {nodes[row['target']]: flow}
-                else:
-                    outputs = {}
-            except:
-                print('Error with output creation in line', i+2,
-                      'in csv file.')
-                print('Label:', row['label'])
-                raise
-
-            # create a conversion_factor entry for the current line
-            try:
-                if row['target'] and 'conversion_factors' in row:
-                    if row['conversion_factors'] == 'seq':
-                        seq = nodes_flows_seq.loc[row['class'],
-                                                  row['label'],
-                                                  row['source'],
-                                                  row['target'],
-                                                  'conversion_factors']
-                        seq = [i for i in seq]
-                        seq = sequence(seq)
-                        conversion_factors = {nodes[row['target']]: seq}
-                    else:
-                        conversion_factors = \
-                            {nodes[row['target']]:
-                                sequence(float(row['conversion_factors']))}
-                else:
-                    conversion_factors = {}
-            except:
-                print('Error with conversion factor creation in line', i+2,
-                      'in csv file.')
-                print('Label:', row['label'])
-                raise
-
-            # add node to dict and assign attributes depending on
-            # if there are multiple lines per node or not
-            try:
-                for source, f in inputs.items():
-                    network.flow[source, node] = f
-                for target, f in outputs.items():
-                    network.flow[node, target] = f
-                if node.label in nodes.keys():
-                    if not isinstance(node, Bus):
-                        node.conversion_factors.update(conversion_factors)
-                else:
-                    if not isinstance(node, Bus):
-                        node.conversion_factors = conversion_factors
-                        nodes[node.label] = node
-            except:
-                print('Error adding node to dict in line', i+2, 'in csv file.')
-                print('Label:', row['label'])
-                raise
+def _read_nodes_flows(file_nodes_flows, delimiter=','):
+    """ Reads a CSV file containing nodes and flows and returns its column
+    names and its rows as dictionaries without NaN values.
+    """
+    nodes_flows = pd.read_csv(file_nodes_flows, sep=delimiter)
+    columns = list(nodes_flows.columns)
+    values = nodes_flows.values
+    valid = nodes_flows.notnull().values
+    rows = [{c: v for c, v, ok in zip(columns, vs, oks) if ok}
+            for vs, oks in zip(values, valid)]
+    return columns, rows
 
-    return nodes
+
+def _read_sequences(file_nodes_flows_sequences, delimiter=','):
+    """ Reads a CSV file containing sequences and returns the headers
+    `(class, label, source, target, attribute)` of its columns together with
+    one column major array holding the values below them.
+
+    All columns are parsed in one go, so the columns of the array can be
+    used as sequences without copying them.
+    """
+    header = pd.read_csv(file_nodes_flows_sequences, sep=delimiter,
+                         header=None, nrows=5, dtype=str)
+    data = pd.read_csv(file_nodes_flows_sequences, sep=delimiter,
+                       header=None, skiprows=5)
+    data.dropna(axis=0, how='all', inplace=True)
+    data = np.asfortranarray(data.drop(0, axis=1).to_numpy(dtype=float))
+    return list(zip(*header.values[:, 1:])), data
 
 
-def merge_csv_files(path=None, output_path=None, write=True):
+def _fingerprint(path):
+    """ Returns the modification time and the SHA1 hash of a file.
+    """
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2 ** 20), b''):
+            sha1.update(block)
+    return os.path.getmtime(path), sha1.hexdigest()
+
+
+def _read_cached(file_nodes_flows, file_nodes_flows_sequences, delimiter):
+    """ Returns the parsed contents of both files like
+    :func:`_read_nodes_flows` and :func:`_read_sequences` do, using the cache
+    file next to `file_nodes_flows` if it is still valid.
+
+    The cache is valid if it was created from the same files with the same
+    delimiter and the files either have the recorded modification times or,
+    if they have been touched, the recorded hashes.
+    """
+    cache_file = file_nodes_flows + '.cache'
+    files = [os.path.abspath(f)
+             for f in (file_nodes_flows, file_nodes_flows_sequences)]
+    mtimes = [os.path.getmtime(f) for f in files]
+
+    cached = None
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                cached = pickle.load(f)
+        except Exception as e:
+            logging.warning('Could not read cache file {0}: {1}'.format(
+                cache_file, e))
+    if (cached is not None and cached['files'] == files and
+            cached['delimiter'] == delimiter):
+        if cached['mtimes'] == mtimes:
+            return cached['contents']
+        fingerprints = [_fingerprint(f) for f in files]
+        if cached['hashes'] == [h for _, h in fingerprints]:
+            cached['mtimes'] = mtimes
+            _write_cache(cache_file, cached)
+            return cached['contents']
+    else:
+        fingerprints = [_fingerprint(f) for f in files]
+
+    logging.info('Parsing {0} and {1}.'.format(*files))
+    columns, rows = _read_nodes_flows(file_nodes_flows, delimiter)
+    keys, data = _read_sequences(file_nodes_flows_sequences, delimiter)
+    contents = (columns, rows, keys, data)
+    _write_cache(cache_file, {'files': files, 'delimiter': delimiter,
+                              'mtimes': [m for m, _ in fingerprints],
+                              'hashes': [h for _, h in fingerprints],
+                              'contents': contents})
+    return contents
+
+
+def _write_cache(cache_file, cached):
+    try:
+        with open(cache_file, 'wb') as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as e:
+        logging.warning('Could not write cache file {0}: {1}'.format(
+            cache_file, e))
+
+
+def merge_csv_files(path=None, output_path=None, write=True, stream=False,
+                    max_workers=None, chunksize=10000):
     """
     Merge csv files from a specified directory. All files with 'seq' will be
     merged and all other files. Make sure that no other csv-files than the ones
     to be merged are inside the specified directory.
 
+    The headers of all sequence files are checked for duplicates before any
+    data is read. The files are read in a thread pool and concatenated once.
+    A `ValueError` is raised if a file is empty or if there are no sequence
+    files to be written.
+
     Parameters
     ----------
     path: str
@@ -279,38 +358,102 @@ def merge_csv_files(path=None, output_path=None, write=True):
         Path where the merged files are written to (default is `path` above)
     write : boolean
         Indicating if new, merged dataframes should be written to csv
+    stream : boolean
+        If `True`, the merged files are written chunk by chunk without
+        holding the input files in memory and the names of the written files
+        are returned instead of the dataframes. This requires all sequence
+        files to have the same index. Default: `False`
+    max_workers : int
+        Number of threads used to read the files. Defaults to the default of
+        :class:`concurrent.futures.ThreadPoolExecutor`.
+    chunksize : int
+        Number of lines read from each file at once if `stream` is `True`.
 
     Returns
     -------
-    Tuple of dataframes (nodes_flows, nodes_flows_seq)
+    Tuple of dataframes (nodes_flows, nodes_flows_seq) or, if `stream` is
+    `True`, tuple of the names of the written files.
     """
     if output_path is None:
         output_path = path
 
-    files = [f for f in os.listdir(path) if f.endswith('.csv')]
-
-    nodes_flows = pd.DataFrame()
-    nodes_flows_seq = pd.DataFrame()
-
-    for f in files:
-        if 'seq' in f:
-            tmp_df = pd.read_csv(os.path.join(path, f), index_col=[0],
-                                 header=[0, 1, 2, 3, 4])
-            nodes_flows_seq = pd.concat([nodes_flows_seq, tmp_df], axis=1)
-        else:
-            tmp_df = pd.read_csv(os.path.join(path, f))
-            nodes_flows = pd.concat([nodes_flows, tmp_df])
+    files = [os.path.join(path, f) for f in os.listdir(path)
+             if f.endswith('.csv')]
+    seq_files = [f for f in files if 'seq' in os.path.basename(f)]
+    files = [f for f in files if 'seq' not in os.path.basename(f)]
+
+    def read_seq(f, **kwargs):
+        return pd.read_csv(f, index_col=[0], header=[0, 1, 2, 3, 4],
+                           **kwargs)
+
+    def read_header(f, lines):
+        with open(f, newline='') as csvfile:
+            header = list(islice(csv.reader(csvfile), lines))
+        if not header:
+            raise ValueError('The csv-file {} is empty.'.format(f))
+        return header
+
+    if not seq_files and (write or stream):
+        raise ValueError('There are no seq-csvfiles to merge in {}.'.format(
+            path))
+
+    # validate the headers before reading any data, skipping the index column
+    headers = [list(zip(*read_header(f, 5)))[1:] for f in seq_files]
+    columns = [c for f in files for c in read_header(f, 1)[0]]
+    counts = Counter(c for h in headers for c in h)
+    duplicates = sorted(c for c, n in counts.items() if n > 1)
+    if duplicates or not all(len(c) == 5 for h in headers for c in h):
+        raise ValueError('Columns of merge seq-csvfile is not Multiindex.'
+                         'Did you use unique column-headers across all '
+                         'files? Duplicates: {}'.format(duplicates))
+
+    nodes_flows_file = os.path.join(output_path, 'merged_nodes_flows.csv')
+    nodes_flows_seq_file = os.path.join(output_path,
+                                        'merged_nodes_flows_seq.csv')
+
+    if stream:
+        # the union of all columns in order of appearance, like pd.concat
+        columns = list(dict.fromkeys(columns))
+        with open(nodes_flows_file, 'w') as out:
+            header = True
+            for f in files:
+                for chunk in pd.read_csv(f, chunksize=chunksize):
+                    chunk.reindex(columns=columns).to_csv(
+                        out, index=False, header=header)
+                    header = False
+        with open(nodes_flows_seq_file, 'w') as out, \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+            readers = [read_seq(f, chunksize=chunksize) for f in seq_files]
+            try:
+                header = True
+                while readers:
+                    chunks = list(executor.map(lambda r: next(r, None),
+                                               readers))
+                    if all(c is None for c in chunks):
+                        break
+                    if any(c is None for c in chunks) or not all(
+                            c.index.equals(chunks[0].index) for c in chunks):
+                        raise ValueError(
+                            'The sequence files must have the same index to '
+                            'be merged with stream=True.')
+                    pd.concat(chunks, axis=1).to_csv(out, header=header)
+                    header = False
+            finally:
+                for reader in readers:
+                    reader.close()
+        return nodes_flows_file, nodes_flows_seq_file
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        seq_frames = list(executor.map(read_seq, seq_files))
+        frames = list(executor.map(pd.read_csv, files))
+
+    nodes_flows = pd.concat(frames) if frames else pd.DataFrame()
+    nodes_flows_seq = (pd.concat(seq_frames, axis=1) if seq_frames
+                       else pd.DataFrame())
 
     if write is True:
-        nodes_flows.to_csv(os.path.join(output_path,
-                                        'merged_nodes_flows.csv'), index=False)
-        if isinstance(nodes_flows_seq.columns, pd.MultiIndex):
-            nodes_flows_seq.to_csv(os.path.join(output_path,
-                                   'merged_nodes_flows_seq.csv'))
-        else:
-            raise ValueError('Columns of merge seq-csvfile is not Multiindex.'
-                             'Did you use unique column-headers across all '
-                             'files?')
+        nodes_flows.to_csv(nodes_flows_file, index=False)
+        nodes_flows_seq.to_csv(nodes_flows_seq_file)
 
     return nodes_flows, nodes_flows_seq
 
@@ -325,6 +468,8 @@ def resample_sequence(seq_base_file=None, output_path=None,
     are expected to have a timeindex column that can be parsed by
     pandas, with entries like: '2014-01-01 00:00:00+00:00'
 
+    The file is only parsed once and coarser resolutions are derived from
+    finer ones, see :func:`resample_pyramid`.
 
     Parameters
     ----------
@@ -357,30 +502,13 @@ def resample_sequence(seq_base_file=None, output_path=None,
 
     seq_path, seq_file = os.path.split(seq_base_file)
 
-    # read the file and parse the dates from the first column (index 0)
-    seq = pd.read_csv(os.path.join(seq_path, seq_file),
-                      header=header, parse_dates=[0])
-
-    # store the first column name for reuse
-    first_col = seq.columns[0]
-    # set the index as datetimeindex from column with parsed dates
-    seq.index = seq[first_col]
-    # set timeindex
-
-    # convert columns to numeric values, except the datetimecolumn, but!
-    # which we keep for reuse
-    for col in seq:
-        if col == first_col:
-            seq[col] = -999999
-        else:
-            seq[col] = seq[col].astype(float)
+    first_col, seq = _read_sequence_file(seq_base_file, header)
+    pyramid = resample_pyramid(seq, samples)
 
     for s in samples:
-        # resample dataframes
-        seq_sampled = seq.resample(s).mean()
-        # assign the resampled datetimeindex values to the first columns,
-        # replacing the -999999
-        seq_sampled[first_col] = seq_sampled.index
+        seq_sampled = pyramid[s]
+        # put the resampled datetimeindex values into the first column
+        seq_sampled.insert(0, first_col, seq_sampled.index)
         if file_prefix is None:
             file_prefix = seq_file.split('seq')[0]
             logging.info('Setting filename prefix to: {}'.format(file_prefix))
@@ -389,3 +517,146 @@ def resample_sequence(seq_base_file=None, output_path=None,
         logging.info('Writing sample file to {0}.'.format(filename))
         seq_sampled.to_csv(filename, index=False)
     return seq_sampled
+
+
+def _read_sequence_file(seq_base_file, header=[0, 1, 2, 3, 4]):
+    """ Reads a sequence file with a timeindex in the first column and
+    returns the name of that column and the remaining columns as floats,
+    indexed by the parsed dates.
+    """
+    # read the file and parse the dates from the first column (index 0)
+    seq = pd.read_csv(seq_base_file, header=header, parse_dates=[0])
+    # store the first column name for reuse
+    first_col = seq.columns[0]
+    # set the index as datetimeindex from column with parsed dates
+    seq.index = seq.pop(first_col)
+    return first_col, seq.astype(float)
+
+
+def resample_pyramid(seq, samples):
+    """ Resamples `seq` to all rates in `samples` at once, returning the
+    same means as `seq.resample(rate).mean()` would.
+
+    Sums and counts of every resolution are derived from the finest already
+    computed resolution that nests into it, e.g. '4H' from '2H' and 'D' from
+    '4H', instead of from `seq`. Rates which aren't a multiple of a finer
+    one are derived from `seq`.
+
+    Parameters
+    ----------
+    seq : pandas.DataFrame
+        Sequences indexed by a DatetimeIndex.
+    samples : list
+        List of strings with the resampling rates e.g. ['4H', '2H']. See
+        `pandas.DataFrame.resample` method for more information on format.
+
+    Returns
+    -------
+    dict
+        Resampled DataFrames keyed by rate.
+
+    Examples
+    --------
+    >>> seq = pd.DataFrame({'a': range(8)},
+    ...                    index=pd.date_range('1/1/2012', periods=8,
+    ...                                        freq='H'))
+    >>> pyramid = resample_pyramid(seq, ['4H', '2H'])
+    >>> pyramid['2H']['a'].tolist()
+    [0.5, 2.5, 4.5, 6.5]
+    >>> pyramid['4H']['a'].tolist()
+    [1.5, 5.5]
+    """
+    def nanos(rate):
+        offset = pd.tseries.frequencies.to_offset(rate)
+        return getattr(offset, 'nanos', None) if isinstance(
+            offset, pd.offsets.Tick) else None
+
+    # finest first, so coarser rates can be derived from finer ones
+    rates = sorted(set(samples), key=lambda r: (nanos(r) is None,
+                                                nanos(r) or 0))
+    values = seq.values.astype(float)
+    missing = np.isnan(values)
+    if missing.any():
+        base = (np.where(missing, 0, values), (~missing).astype(float))
+    else:
+        # without missing values all columns have the same counts
+        base = (values, np.ones(len(values)))
+    base = (seq.index,) + base
+
+    levels = {}
+    pyramid = {}
+    for rate in rates:
+        index, sums, counts = base
+        n = nanos(rate)
+        for finer in reversed(list(levels)):
+            if n is not None and nanos(finer) and n % nanos(finer) == 0:
+                index, sums, counts = levels[finer]
+                break
+        # the number of (finer) rows in each bin, including empty bins
+        sizes = pd.Series(np.ones(len(index)), index=index).resample(
+            rate).count()
+        coarse = [_bin_sums(a, sizes.values) for a in (sums, counts)]
+        levels[rate] = (sizes.index,) + tuple(coarse)
+        sums, counts = coarse
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / (counts if counts.ndim == 2 else counts[:, None])
+        pyramid[rate] = pd.DataFrame(means, index=sizes.index,
+                                     columns=seq.columns)
+    return pyramid
+
+
+def _bin_sums(a, sizes):
+    """ Sums up consecutive rows of `a` in bins of the given `sizes`.
+    """
+    k = sizes.max()
+    if (sizes[1:-1] == k).all():
+        # Regular bins, possibly except for the first and the last one, are
+        # summed up by padding them to the same size and reshaping.
+        pad = (k - sizes[0], k - sizes[-1]) if len(sizes) > 1 else (0, 0)
+        if any(pad):
+            a = np.pad(a, [pad] + [(0, 0)] * (a.ndim - 1))
+        return a.reshape((len(sizes), k) + a.shape[1:]).sum(axis=1)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    filled = sizes > 0
+    sums = np.zeros((len(sizes),) + a.shape[1:])
+    sums[filled] = np.add.reduceat(a, starts[filled], axis=0)
+    return sums
+
+
+def write_pyramid(pyramid, output_path, file_prefix='', file_suffix='_seq'):
+    """ Writes the resampled sequences of a pyramid as binary `.npz` files
+    named `file_prefix+rate+file_suffix+'.npz'` and returns their names.
+
+    Every file holds the `values` as one float array, the `timeindex` as
+    nanoseconds since the epoch (UTC) and the `columns` as an array of
+    strings. Use :func:`read_pyramid_level` to read them.
+    """
+    os.makedirs(output_path, exist_ok=True)
+    filenames = {}
+    for rate, seq in pyramid.items():
+        filenames[rate] = os.path.join(output_path,
+                                       file_prefix + rate + file_suffix +
+                                       '.npz')
+        columns = [c if isinstance(c, tuple) else (c,) for c in seq.columns]
+        np.savez(filenames[rate], values=seq.values,
+                 timeindex=seq.index.asi8,
+                 tz=str(getattr(seq.index, 'tz', None) or ''),
+                 columns=np.array(columns, dtype=str))
+    return filenames
+
+
+def read_pyramid_level(filename):
+    """ Reads a file written by :func:`write_pyramid` into a DataFrame.
+    """
+    with np.load(filename) as data:
+        timeindex = pd.DatetimeIndex(data['timeindex'])
+        tz = str(data['tz'])
+        if tz:
+            timeindex = timeindex.tz_localize('UTC').tz_convert(tz)
+        columns = [tuple(c) for c in data['columns']]
+        if all(len(c) == 1 for c in columns):
+            columns = pd.Index([c for c, in columns])
+        else:
+            columns = pd.MultiIndex.from_tuples(columns)
+        return pd.DataFrame(data['values'], index=timeindex,
+                            columns=columns)
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Sparse matrix form of solph models and an in-process solver backend using the
+HiGHS solvers shipped with SciPy.
+
+:class:`StandardForm` collects the linear constraints of all active blocks of
+a model into one sparse matrix. :func:`solve` passes it to
+:func:`scipy.optimize.linprog` or, if the model has integer variables, to
+:func:`scipy.optimize.milp` and loads the solution, the duals and the reduced
+costs directly into the model. No problem file is written and no solver
+process is started.
+
+This module needs SciPy 1.9 or newer. It is used by
+:meth:`OperationalModel.solve <oemof.solph.models.OperationalModel.solve>`
+if `solver='scipy-highs'` is given.
+"""
+
+import logging
+
+import numpy as np
+import pyomo.environ as po
+from pyomo.repn import generate_standard_repn
+from scipy import sparse
+from scipy.optimize import (Bounds, LinearConstraint, OptimizeResult, linprog,
+                            milp)
+
+
+#: The name of the solver backend implemented by this module.
+SOLVER = 'scipy-highs'
+
+#: The violation up to which constraints without variables are satisfied.
+TOL = 1e-9
+
+
+def linprog_ranged(c, A, row_lb, row_ub, lb, ub, options=None):
+    r""" Solves the linear program
+
+    .. math::
+        \min c^T x, \quad row\_lb \le A x \le row\_ub, \quad
+        lb \le x \le ub
+
+    with :func:`scipy.optimize.linprog` and returns the result together with
+    the duals of the rows, i.e. the derivatives of the objective with respect
+    to their bounds.
+    """
+    eq = row_lb == row_ub
+    upper = ~eq & np.isfinite(row_ub)
+    lower = ~eq & np.isfinite(row_lb)
+    A_ub = sparse.vstack([A[upper], -A[lower]], format='csr')
+    result = linprog(
+        c, A_ub=A_ub if A_ub.shape[0] else None,
+        b_ub=np.concatenate([row_ub[upper], -row_lb[lower]]),
+        A_eq=A[eq] if eq.any() else None, b_eq=row_lb[eq],
+        bounds=np.column_stack([lb, ub]), method='highs', options=options)
+    duals = np.zeros(A.shape[0])
+    if result.status == 0:
+        if eq.any():
+            duals[eq] = result.eqlin.marginals
+        if A_ub.shape[0]:
+            marginals = result.ineqlin.marginals
+            duals[upper] += marginals[:upper.sum()]
+            duals[lower] -= marginals[upper.sum():]
+    return result, duals
+
+
+class StandardForm:
+    r""" The linear program of a pyomo model in matrix form:
+
+    .. math::
+        \min c^T x + offset, \quad row\_lb \le A x \le row\_ub, \quad
+        lb \le x \le ub
+
+    Maximization problems are stored as minimization of the negated
+    objective, see :attr:`sense`. Fixed variables are treated as constants.
+    Constraints left without variables aren't stored as rows, a
+    :class:`ValueError` is raised if one of them is violated.
+
+    Parameters
+    ----------
+    model : pyomo.core.ConcreteModel
+        A model with exactly one active, linear objective and only linear
+        constraints, e.g. an :class:`OperationalModel
+        <oemof.solph.models.OperationalModel>`.
+
+    Attributes
+    ----------
+    variables : list
+        The variables, one per column.
+    constraints : list
+        The constraints, one per row.
+    c : numpy.ndarray
+    offset : float
+    A : scipy.sparse.csr_matrix
+    row_lb, row_ub, lb, ub : numpy.ndarray
+        Infinite bounds are given as `-numpy.inf` and `numpy.inf`.
+    integrality : numpy.ndarray
+        `1` for integer variables, `0` for continuous ones.
+    sense : int
+        `1` if the model is minimized, `-1` if it is maximized.
+    """
+    def __init__(self, model):
+        objectives = list(model.component_data_objects(po.Objective,
+                                                       active=True))
+        if len(objectives) != 1:
+            raise ValueError("Expected one active objective, found {}.".format(
+                len(objectives)))
+        objective = objectives[0]
+        self.sense = -1 if objective.sense == po.maximize else 1
+
+        self.variables = []
+        columns = {}
+
+        def column(var):
+            if id(var) not in columns:
+                columns[id(var)] = len(self.variables)
+                self.variables.append(var)
+            return columns[id(var)]
+
+        repn = self._repn(objective.expr, objective)
+        c = {column(v): coef for v, coef in zip(repn.linear_vars,
+                                                repn.linear_coefs)}
+        self.offset = self.sense * float(po.value(repn.constant))
+
+        self.constraints = []
+        rows, cols, coefs, row_lb, row_ub = [], [], [], [], []
+        for con in model.component_data_objects(po.Constraint, active=True):
+            repn = self._repn(con.body, con)
+            constant = float(po.value(repn.constant))
+            if not repn.linear_vars:
+                if (con.has_lb() and constant < po.value(con.lower) - TOL or
+                        con.has_ub() and constant > po.value(con.upper) + TOL):
+                    raise ValueError("{} is violated by the constant {}."
+                                     .format(con.name, constant))
+                continue
+            row = len(self.constraints)
+            self.constraints.append(con)
+            rows.extend([row] * len(repn.linear_vars))
+            cols.extend(column(v) for v in repn.linear_vars)
+            coefs.extend(repn.linear_coefs)
+            row_lb.append(po.value(con.lower) - constant
+                          if con.has_lb() else -np.inf)
+            row_ub.append(po.value(con.upper) - constant
+                          if con.has_ub() else np.inf)
+
+        n = len(self.variables)
+        self.c = np.zeros(n)
+        for j, coef in c.items():
+            self.c[j] += self.sense * coef
+        self.A = sparse.csr_matrix(
+            (np.asarray(coefs, dtype=np.float64), (rows, cols)),
+            shape=(len(self.constraints), n))
+        self.row_lb = np.asarray(row_lb, dtype=np.float64)
+        self.row_ub = np.asarray(row_ub, dtype=np.float64)
+        self.lb = np.array([-np.inf if v.lb is None else v.lb
+                            for v in self.variables], dtype=np.float64)
+        self.ub = np.array([np.inf if v.ub is None else v.ub
+                            for v in self.variables], dtype=np.float64)
+        self.integrality = np.array([int(v.is_integer() or v.is_binary())
+                                     for v in self.variables], dtype=np.uint8)
+
+    @staticmethod
+    def _repn(expr, component):
+        repn = generate_standard_repn(expr, compute_values=True)
+        if not repn.is_linear():
+            raise ValueError("{} is not linear.".format(component.name))
+        return repn
+
+    def _linprog(self, lb, ub, options):
+        return linprog_ranged(self.c, self.A, self.row_lb, self.row_ub, lb, ub,
+                              options)
+
+    def restrict(self, rows, columns):
+        """ Returns the problem made of the `rows` and `columns` at the given
+        positions only.
+
+        The rows must not reference other columns. The :attr:`variables` and
+        :attr:`constraints` of the restricted problem are the positions in
+        this one and its :attr:`offset` is zero.
+        """
+        form = object.__new__(StandardForm)
+        form.sense = self.sense
+        form.offset = 0.0
+        form.variables = list(columns)
+        form.constraints = list(rows)
+        form.c = self.c[columns]
+        form.A = self.A[rows][:, columns]
+        form.row_lb, form.row_ub = self.row_lb[rows], self.row_ub[rows]
+        form.lb, form.ub = self.lb[columns], self.ub[columns]
+        form.integrality = self.integrality[columns]
+        return form
+
+    def solve(self, options=None, duals=True):
+        """ Solves the problem and returns the
+        :class:`scipy.optimize.OptimizeResult` with the additional attributes
+        `duals` and `reduced_costs` if `duals` is `True`.
+
+        The duals of a mixed integer problem are those of the linear problem
+        obtained by fixing the integer variables to their optimal values. If
+        that problem can't be solved, a warning is logged and the duals are
+        left out.
+
+        Parameters
+        ----------
+        options : dictionary
+            Options passed on to HiGHS, e.g. `time_limit`, `presolve` or
+            `mip_rel_gap`.
+        duals : boolean
+            Whether to compute the duals and reduced costs.
+        """
+        options = dict(options or {})
+        if not self.variables:
+            # Everything is fixed, so there is nothing left to solve.
+            return OptimizeResult(
+                success=True, status=0, message="No free variables.",
+                x=np.empty(0), fun=self.sense * self.offset,
+                duals=np.zeros(0), reduced_costs=np.zeros(0))
+        if not self.integrality.any():
+            options.pop('mip_rel_gap', None)
+            result, dual_values = self._linprog(self.lb, self.ub, options)
+            x = result.x
+        else:
+            result = milp(self.c, integrality=self.integrality,
+                          bounds=Bounds(self.lb, self.ub),
+                          constraints=LinearConstraint(self.A, self.row_lb,
+                                                       self.row_ub),
+                          options=options)
+            x = result.x
+            if x is not None:
+                x = np.where(self.integrality, np.round(x), x)
+            if x is not None and duals:
+                options.pop('mip_rel_gap', None)
+                fixed = self.integrality.astype(bool)
+                relaxed, dual_values = self._linprog(
+                    np.where(fixed, x, self.lb), np.where(fixed, x, self.ub),
+                    options)
+                if relaxed.status == 0:
+                    result.lower, result.upper = relaxed.lower, relaxed.upper
+                else:
+                    logging.warning(
+                        "No duals, the linear problem with fixed integer " +
+                        "variables failed: {}".format(relaxed.message))
+                    duals = False
+        result.x = x
+        if x is not None:
+            result.fun = self.sense * (float(self.c @ x) + self.offset)
+            if duals:
+                result.duals = self.sense * dual_values
+                result.reduced_costs = self.sense * (
+                    result.lower.marginals + result.upper.marginals)
+        return result
+
+    def load(self, model, result):
+        """ Loads the solution in `result`, as returned by :meth:`solve`, into
+        `model`.
+
+        The duals and reduced costs are loaded if the model has importing
+        :class:`~pyomo.core.base.suffix.Suffix` components named `dual` and
+        `rc`, e.g. after calling :meth:`OperationalModel.receive_duals
+        <oemof.solph.models.OperationalModel.receive_duals>`.
+
+        Variables which appear neither in a constraint nor in the objective
+        are set to their lower bound, their upper bound or zero.
+        """
+        for var, value in zip(self.variables, result.x):
+            var.set_value(float(value), skip_validation=True)
+        columns = {id(var) for var in self.variables}
+        for var in model.component_data_objects(po.Var, active=True):
+            if id(var) not in columns and not var.fixed:
+                value = var.lb if var.lb is not None else var.ub
+                var.set_value(0 if value is None else value,
+                              skip_validation=True)
+        for name, components, attribute in [
+                ('dual', self.constraints, 'duals'),
+                ('rc', self.variables, 'reduced_costs')]:
+            suffix = getattr(model, name, None)
+            if (isinstance(suffix, po.Suffix) and suffix.import_enabled() and
+                    hasattr(result, attribute)):
+                for component, value in zip(components,
+                                            getattr(result, attribute)):
+                    suffix[component] = float(value)
+
+
+def solve(model, options=None):
+    """ Solves `model` in-process with HiGHS and loads the solution into it.
+
+    Duals and reduced costs are only computed if the model has a `dual` or a
+    `rc` :class:`~pyomo.core.base.suffix.Suffix`.
+
+    Parameters
+    ----------
+    model : pyomo.core.ConcreteModel
+        E.g. an :class:`OperationalModel
+        <oemof.solph.models.OperationalModel>`.
+    options : dictionary
+        Options passed on to HiGHS, see :meth:`StandardForm.solve`.
+
+    Returns
+    -------
+    scipy.optimize.OptimizeResult
+        The solution is only loaded if `success` is `True`. Otherwise a
+        warning containing the solver `message` is logged.
+    """
+    form = StandardForm(model)
+    duals = any(isinstance(getattr(model, name, None), po.Suffix)
+                for name in ('dual', 'rc'))
+    result = form.solve(options, duals=duals)
+    if result.success:
+        form.load(model, result)
+    else:
+        logging.warning("{} did not find a solution: {}".format(
+            SOLVER, result.message))
+    return result
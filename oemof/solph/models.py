@@ -5,10 +5,12 @@
 
 from collections import UserDict, UserList
 from itertools import groupby
+import numpy as np
 import pyomo.environ as po
 from pyomo.opt import SolverFactory
 from pyomo.core.plugins.transform.relax_integrality import RelaxIntegrality
 from oemof.solph import blocks
+from oemof.tools.economics import annuity
 from .network import Storage
 from .options import Investment
 from .plumbing import sequence
@@ -19,14 +21,435 @@ from .plumbing import sequence
 #
 # #############################################################################
 
-# TODO: Add an nice capacity expansion model ala temoa/osemosys ;)
+class LazyResults(UserDict):
+    """ A results dictionary whose values are created on first access.
+
+    It has the same interface as the dictionary returned by
+    :meth:`OperationalModel.results`, i.e. :attr:`results[s][t]` holds the
+    time series attached to the edge from `s` to `t`, but a time series is
+    only pulled from the solved model when it is accessed for the first
+    time. Accessed values are kept, so the model is only queried once per
+    time series.
+
+    Pickling or copying a lazy results dictionary materializes it into a
+    plain nested :class:`UserDict` first.
+
+    Parameters
+    ----------
+    keys : dictionary
+        The (ordered) keys of the dictionary. Only the keys are used.
+    load : callable
+        Called with a key to create the value for that key.
+    cache : boolean
+        Whether to keep the values once they are loaded (default). Without
+        caching every access loads the value again, which keeps the memory
+        footprint small if every value is only needed once, e.g. when
+        streaming the results to disk.
+
+    Examples
+    --------
+    >>> results = LazyResults(dict.fromkeys('ab'), lambda key: key * 2)
+    >>> results.data
+    {}
+    >>> results['b']
+    'bb'
+    >>> results.data
+    {'b': 'bb'}
+    >>> list(results.items())
+    [('a', 'aa'), ('b', 'bb')]
+    """
+    def __init__(self, keys, load, cache=True):
+        super().__init__()
+        self._keys = dict.fromkeys(keys)
+        self._load = load
+        self._cache = cache
+
+    @classmethod
+    def from_model(cls, model, cache=True):
+        """ Create lazy results for the solved `model`, an instance of
+        :class:`OperationalModel`.
+
+        The objective and the (scalar) investment results are attached
+        eagerly, just like :meth:`OperationalModel.results` does.
+        """
+        keys = model._result_keys()
+
+        def row(i):
+            return cls(keys[i], lambda o: model._result(i, o), cache=cache)
+
+        results = cls(keys, row, cache=cache)
+        results.objective = model.objective()
+        results.investment = UserDict(model._investment_results())
+        return results
+
+    def __getitem__(self, key):
+        if key in self.data:
+            return self.data[key]
+        if key not in self._keys:
+            raise KeyError(key)
+        value = self._load(key)
+        if self._cache:
+            self.data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._keys[key] = None
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self._keys[key]
+        self.data.pop(key, None)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def materialize(self):
+        """ Return the results as nested :class:`UserDicts <UserDict>` with
+        all values loaded, including the attributes of this object.
+        """
+        result = UserDict()
+        vars(result).update((k, v) for k, v in vars(self).items()
+                            if k not in ('data', '_keys', '_load', '_cache'))
+        for key, value in self.items():
+            if isinstance(value, LazyResults):
+                value = value.materialize()
+            result[key] = value
+        return result
+
+    def __reduce_ex__(self, protocol):
+        return (UserDict, (), vars(self.materialize()))
+
+
+def _solve(model, solver, solver_io, **kwargs):
+    """ Solves `model` as described by :meth:`OperationalModel.solve` and
+    returns the solver results.
+    """
+    solve_kwargs = kwargs.get('solve_kwargs', {})
+    solver_cmdline_options = kwargs.get("cmdline_options", {})
+
+    if solver == 'scipy-highs':
+        from . import matrix
+        unknown = sorted(set(solve_kwargs) - {'tee'})
+        if unknown:
+            raise ValueError(
+                "'scipy-highs' doesn't accept the solve_kwargs {}, HiGHS "
+                "options are given as cmdline_options.".format(unknown))
+        options = dict(solver_cmdline_options)
+        if 'tee' in solve_kwargs:
+            options.setdefault('disp', bool(solve_kwargs['tee']))
+        return matrix.solve(model, options=options)
+    if solver == 'benders':
+        from . import decomposition
+        return decomposition.benders(
+            model, options=solver_cmdline_options, **solve_kwargs)
+    if solver == 'separable':
+        from . import decomposition
+        return decomposition.separable(
+            model, options=solver_cmdline_options, **solve_kwargs)
+    if solver == 'lagrangian':
+        from . import decomposition
+        return decomposition.lagrangian(
+            model, options=solver_cmdline_options, **solve_kwargs)
+    if solver == 'coarse-to-fine':
+        from . import aggregation
+        return aggregation.coarse_to_fine(
+            model, options=solver_cmdline_options, **solve_kwargs)
+
+    opt = SolverFactory(solver, solver_io=solver_io)
+    # set command line options
+    options = opt.options
+    for k in solver_cmdline_options:
+        options[k] = solver_cmdline_options[k]
+
+    results = opt.solve(model, **solve_kwargs)
+
+    model.solutions.load_from(results)
+    return results
+
+
+def _solve_or_load(model, solver, solver_io, **kwargs):
+    """ Solves `model` like :func:`_solve` or, if a `cache` is given and the
+    model was solved before, loads its solution from the cache.
+    """
+    cache = kwargs.get('cache')
+    if cache is None:
+        return _solve(model, solver, solver_io, **kwargs)
+    from .cache import ResultCache
+    if not isinstance(cache, ResultCache):
+        cache = ResultCache(cache)
+    return cache.solve(model, solver, solver_io, **kwargs)
 
 
 class ExpansionModel(po.ConcreteModel):
-    """ An energy system model for optimized capacity expansion.
+    """ An energy system model for optimized capacity expansion over several
+    investment periods.
+
+    Every investment period is operated on a representative timeindex like
+    an :class:`OperationalModel`, which is added as the sub-block
+    :attr:`em.operation[period]`. Its `invest` variables, i.e. the nominal
+    values of the flows and storages with an :class:`Investment
+    <oemof.solph.options.Investment>`, become the capacities installed in
+    that period. They are the sum of the existing capacity and the capacities
+    built in earlier periods (vintages) which haven't reached the end of
+    their `lifetime` yet. The `minimum` and `maximum` of an investment bound
+    the installed capacity of every period.
+
+    All costs are discounted to the `base_year`. The operational costs of a
+    period are scaled from its representative timeindex to one year by its
+    weight and are paid in every year of the period. Capacities built in a
+    period cost the :func:`annuity <oemof.tools.economics.annuity>` of their
+    `capex`, or their `ep_costs` if no `capex` is given, in every year of
+    their lifetime within the model horizon.
+
+    Parameters
+    ----------
+    es : EnergySystem object
+    periods : list of int
+        The first years of the investment periods in ascending order. A
+        period lasts until the next one starts.
+    timeindex : pandas.DatetimeIndex or dictionary
+        The representative timeindex of every period, either one for all
+        periods or a dictionary keyed by period. Defaults to the timeindex
+        of `es`.
+    weights : numeric or dictionary
+        The factor scaling the operational costs of the representative
+        timeindex of every period to one year, e.g. `52` for one
+        representative week. Defaults to `1`.
+    end : int
+        The first year after the model horizon. Defaults to the last period
+        plus the length of the period before it, or plus one year if there
+        is only one period.
+    discount_rate : float
+        Defaults to `0`.
+    base_year : int
+        The year costs are discounted to. Defaults to the first period.
+    myopic : boolean
+        If `True`, :meth:`solve` doesn't optimize all periods at once with
+        perfect foresight but one period after another, each period knowing
+        only the capacities built before. This creates a sequence of small
+        models instead of a large one.
+    installed : dictionary
+        Maps `(i, o)`, the key of a flow or, with `i` being `o`, of a
+        storage, to a list of `(vintage, capacity)` pairs built before the
+        first period.
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> from oemof.solph import EnergySystem, Flow, Sink, Source
+    >>> es = EnergySystem(
+    ...     timeindex=pd.date_range('1/1/2020', periods=2, freq='H'))
+    >>> market = Sink(label='market')
+    >>> pv = Source(label='pv', outputs={market: Flow(
+    ...     actual_value=[0.5, 1], fixed=True, variable_costs=-2,
+    ...     investment=Investment(maximum=5, capex=20, lifetime=10))})
+    >>> em = ExpansionModel(es, periods=[2020, 2030], end=2040)
+    >>> em.solve(solver='scipy-highs').success
+    True
+    >>> es.results.investment[pv, market, 2020]
+    5.0
+    >>> es.results.investment[pv, market, 2030]
+    5.0
+    >>> round(es.results.objective, 6)
+    -100.0
     """
-    def __init__(self):
+    def __init__(self, es, periods, **kwargs):
         super().__init__()
+        self.name = kwargs.get('name', 'ExpansionModel')
+        self.es = es
+        self.periods = list(periods)
+        self.discount_rate = kwargs.get('discount_rate', 0)
+        self.base_year = kwargs.get('base_year', self.periods[0])
+        if 'end' in kwargs:
+            self.end = kwargs['end']
+        elif len(self.periods) > 1:
+            self.end = 2 * self.periods[-1] - self.periods[-2]
+        else:
+            self.end = self.periods[-1] + 1
+        timeindex = kwargs.get('timeindex', es.timeindex)
+        self.timeindex = (timeindex if isinstance(timeindex, dict) else
+                          dict.fromkeys(self.periods, timeindex))
+        weights = kwargs.get('weights', 1)
+        self.weights = (weights if isinstance(weights, dict) else
+                        dict.fromkeys(self.periods, weights))
+        self.myopic = kwargs.get('myopic', False)
+        self.installed = kwargs.get('installed', {})
+
+        # The storages' flows are bound to their capacities, so only the
+        # storages are tracked.
+        storages = [n for n in es.nodes if isinstance(n, Storage) and
+                    isinstance(n.investment, Investment)]
+        linked = {k for n in storages
+                  for k in [(i, n) for i in n.inputs] +
+                  [(n, o) for o in n.outputs]}
+        self.investments = {(i, o): f.investment
+                            for (i, o), f in es.flows().items()
+                            if isinstance(f.investment, Investment) and
+                            (i, o) not in linked}
+        self.investments.update({(n, n): n.investment for n in storages})
+
+        if not self.myopic:
+            self._create()
+
+    def _years(self, period):
+        periods = self.periods + [self.end]
+        return range(period, periods[periods.index(period) + 1])
+
+    def _discount(self, years):
+        return sum((1 + self.discount_rate) ** -(y - self.base_year)
+                   for y in years)
+
+    def _alive(self, key, vintage, period):
+        lifetime = self.investments[key].lifetime
+        return vintage <= period and (lifetime is None or
+                                      period < vintage + lifetime)
+
+    def _annual_costs(self, key):
+        investment = self.investments[key]
+        if investment.capex is None:
+            return investment.ep_costs
+        if investment.lifetime is None:
+            raise ValueError("Missing lifetime for annualizing capex!")
+        wacc = (self.discount_rate if investment.wacc is None
+                else investment.wacc)
+        if wacc == 0:
+            return investment.capex / investment.lifetime
+        return annuity(investment.capex, investment.lifetime, wacc)
+
+    def _vintage_costs(self, key, vintage):
+        """ The discounted costs of one unit of capacity of `key` built in
+        `vintage` during the periods of this model.
+        """
+        lifetime = self.investments[key].lifetime
+        last = self.end if lifetime is None else min(vintage + lifetime,
+                                                     self.end)
+        return self._annual_costs(key) * self._discount(
+            range(max(vintage, self.periods[0]), last))
+
+    def _capacity(self, i, o, period):
+        """ The variable holding the capacity of `(i, o)` in `period`.
+        """
+        block = self.operation[period]
+        if i is o:
+            return block.InvestmentStorage.invest[i]
+        return block.InvestmentFlow.invest[i, o]
+
+    def _create(self):
+        self.PERIODS = po.Set(initialize=self.periods, ordered=True)
+        self.INVESTMENTS = po.Set(initialize=list(self.investments),
+                                  ordered=True, dimen=2)
+
+        self.operation = {}
+        for p in self.periods:
+            block = OperationalModel(self.es, timeindex=self.timeindex[p],
+                                     name='operation_{}'.format(p))
+            self.add_component('operation_{}'.format(p), block)
+            block.objective.deactivate()
+            self.operation[p] = block
+
+        # capacity built at the beginning of a period
+        self.invest = po.Var(self.INVESTMENTS, self.PERIODS,
+                             within=po.NonNegativeReals)
+
+        def _capacity_rule(model, i, o, p):
+            """Rule definition connecting the capacity installed in a period
+            to the vintages available in it.
+            """
+            expr = self.investments[i, o].existing
+            expr += sum(c for v, c in self.installed.get((i, o), [])
+                        if self._alive((i, o), v, p))
+            expr += sum(self.invest[i, o, v] for v in self.periods
+                        if self._alive((i, o), v, p))
+            return self._capacity(i, o, p) == expr
+        self.capacity = po.Constraint(self.INVESTMENTS, self.PERIODS,
+                                      rule=_capacity_rule)
+
+        # ######################## Objective ##################################
+        expr = 0
+        for p, block in self.operation.items():
+            # Only the costs of operating the representative timeindex are
+            # scaled to one year, fixed costs are annual already.
+            investment_costs = sum(getattr(b, 'investment_costs', 0)
+                                   for b in [block.InvestmentFlow,
+                                             block.InvestmentStorage])
+            fixed_costs = sum(getattr(getattr(block, name, None),
+                                      'fixed_costs', 0)
+                              for name in ['Flow', 'Storage', 'InvestmentFlow',
+                                           'InvestmentStorage'])
+            expr += self._discount(self._years(p)) * (
+                self.weights[p] * (block.objective.expr - investment_costs -
+                                   fixed_costs) + fixed_costs)
+        for (i, o), vintages in self.installed.items():
+            expr += sum(c * self._vintage_costs((i, o), v)
+                        for v, c in vintages if v >= self.base_year)
+        for i, o in self.INVESTMENTS:
+            for v in self.periods:
+                expr += self.invest[i, o, v] * self._vintage_costs((i, o), v)
+        self.objective = po.Objective(sense=po.minimize, expr=expr)
+
+    def results(self):
+        """ Returns the results of all investment periods.
+
+        The dictionary maps every period to the results of its operation,
+        as returned by :meth:`OperationalModel.results`. The attribute
+        :attr:`investment` maps `(i, o, period)` to the capacity built in a
+        period and :attr:`capacity` to the capacity installed in a period.
+        The total discounted costs are stored as :attr:`objective`.
+        """
+        result = UserDict((p, block.results())
+                          for p, block in self.operation.items())
+        result.objective = self.objective()
+        result.investment = {(i, o, p): self.invest[i, o, p].value
+                             for i, o in self.INVESTMENTS
+                             for p in self.periods}
+        result.capacity = {(i, o, p): self._capacity(i, o, p).value
+                           for i, o in self.INVESTMENTS
+                           for p in self.periods}
+        return result
+
+    def solve(self, solver='glpk', solver_io='lp', **kwargs):
+        r""" Solves the model and stores the :meth:`results` as
+        :attr:`es.results`.
+
+        Takes the same arguments as :meth:`OperationalModel.solve`, except for
+        `lazy_results`, and returns the solver results. In myopic mode a
+        list containing the solver results of every period is returned.
+        """
+        if not self.myopic:
+            results = _solve(self, solver, solver_io, **kwargs)
+            self.es.results = self.results()
+            self.es.results.solver = results
+            return results
+
+        installed = {k: list(v) for k, v in self.installed.items()}
+        combined = UserDict()
+        combined.objective = 0
+        combined.investment, combined.capacity = {}, {}
+        self.models, solver_results = [], []
+        for p in self.periods:
+            model = ExpansionModel(
+                self.es, [p], timeindex={p: self.timeindex[p]},
+                weights={p: self.weights[p]}, end=self._years(p)[-1] + 1,
+                discount_rate=self.discount_rate, base_year=self.base_year,
+                installed=installed)
+            solver_results.append(_solve(model, solver, solver_io, **kwargs))
+            result = model.results()
+            combined[p] = result[p]
+            combined.objective += result.objective
+            combined.investment.update(result.investment)
+            combined.capacity.update(result.capacity)
+            for (i, o, v), value in result.investment.items():
+                installed.setdefault((i, o), []).append((v, value))
+            self.models.append(model)
+        self.es.results = combined
+        self.es.results.solver = solver_results
+        return solver_results
 
 
 class OperationalModel(po.ConcreteModel):
@@ -54,7 +477,9 @@ class OperationalModel(po.ConcreteModel):
         If type is 'float', will be converted internally to
         solph.plumbing.Sequence() object for time dependent time increment.
         If a list is provided this list will be taken. Default is calculated
-        from timeindex if provided.
+        from the frequency of the timeindex, so it has to be given for a
+        timeindex without frequency, e.g. one with timesteps of different
+        length.
 
     **The following sets are created:**
 
@@ -107,8 +532,12 @@ class OperationalModel(po.ConcreteModel):
         self.es = es
         self.timeindex = kwargs.get('timeindex', es.timeindex)
         self.timesteps = kwargs.get('timesteps', range(len(self.timeindex)))
-        self.timeincrement = kwargs.get('timeincrement',
-                                        self.timeindex.freq.nanos / 3.6e12)
+        self.timeincrement = kwargs.get('timeincrement')
+        if self.timeincrement is None:
+            if self.timeindex.freq is None:
+                raise ValueError("The timeindex has no frequency, so the " +
+                                 "timeincrement has to be given.")
+            self.timeincrement = self.timeindex.freq.nanos / 3.6e12
 
         # convert to sequence object for time dependent timeincrement
         self.timeincrement = sequence(self.timeincrement)
@@ -273,45 +702,63 @@ class OperationalModel(po.ConcreteModel):
         # TODO: Make the results dictionary a proper object?
         result = UserDict()
         result.objective = self.objective()
-        investment = UserDict()
-        for i, o in self.flows:
+        for i, targets in self._result_keys().items():
+            result[i] = UserDict((o, self._result(i, o)) for o in targets)
+        result.investment = UserDict(self._investment_results())
 
-            result[i] = result.get(i, UserDict())
-            result[i][o] = UserList([self.flow[i, o, t].value
-                                     for t in self.TIMESTEPS])
+        return result
 
+    def _result_keys(self):
+        """ Returns an ordered dictionary mapping every source of the results
+        dictionary to a dictionary of its targets, without any values.
+        """
+        keys = {}
+        for i, o in self.flows:
+            keys.setdefault(i, {})[o] = None
             if isinstance(i, Storage):
-                if i.investment is None:
-                    result[i][i] = UserList(
-                        [self.Storage.capacity[i, t].value
-                         for t in self.TIMESTEPS])
-                else:
-                    result[i][i] = UserList(
-                        [self.InvestmentStorage.capacity[i, t].value
-                         for t in self.TIMESTEPS])
+                keys[i][i] = None
+        # add results of dual variables for balanced buses
+        if hasattr(self, "dual") and hasattr(self.Bus, "balance"):
+            for bus, _ in sorted(self.Bus.balance.keys()):
+                keys.setdefault(bus, {})[bus] = None
+        return keys
+
+    def _result(self, i, o):
+        """ Returns the result time series attached to the edge from `i` to
+        `o`, i.e. the flow, the storage capacity or the shadow prices of a
+        bus.
+        """
+        if i is o and isinstance(i, Storage):
+            if i.investment is None:
+                result = UserList([self.Storage.capacity[i, t].value
+                                   for t in self.TIMESTEPS])
+            else:
+                result = UserList([self.InvestmentStorage.capacity[i, t].value
+                                   for t in self.TIMESTEPS])
+            if any(isinstance(self.flows[i, t].investment, Investment)
+                   for t in i.outputs if (i, t) in self.flows):
+                result.invest = self.InvestmentStorage.invest[i].value
+            return result
+        if i is o:
+            return [self.dual[self.Bus.balance[i, t]]
+                    for t in self.TIMESTEPS]
+        result = UserList([self.flow[i, o, t].value for t in self.TIMESTEPS])
+        if isinstance(self.flows[i, o].investment, Investment):
+            result.invest = self.InvestmentFlow.invest[i, o].value
+        return result
 
+    def _investment_results(self):
+        """ Returns a dictionary mapping `(i, o)` to the optimized investment
+        of the flow from `i` to `o` and `(i, i)` to the optimized investment
+        into the capacity of storage `i`.
+        """
+        investment = {}
+        for i, o in self.flows:
             if isinstance(self.flows[i, o].investment, Investment):
-                setattr(result[i][o], 'invest',
-                        self.InvestmentFlow.invest[i, o].value)
                 investment[(i, o)] = self.InvestmentFlow.invest[i, o].value
                 if isinstance(i, Storage):
-                    setattr(result[i][i], 'invest',
-                            self.InvestmentStorage.invest[i].value)
                     investment[(i, i)] = self.InvestmentStorage.invest[i].value
-        # add results of dual variables for balanced buses
-        if hasattr(self, "dual"):
-            # grouped = [(b1, [(b1, 0), (b1, 1)]), (b2, [(b2, 0), (b2, 1)])]
-            grouped = groupby(sorted(self.Bus.balance.iterkeys()),
-                              lambda pair: pair[0])
-
-            for bus, timesteps in grouped:
-                result[bus] = result.get(bus, UserDict())
-                result[bus][bus] = [self.dual[self.Bus.balance[bus, t]]
-                                    for _, t in timesteps]
-
-        result.investment = investment
-
-        return result
+        return investment
 
     def solve(self, solver='glpk', solver_io='lp', **kwargs):
         r""" Takes care of communication with solver to solve the model.
@@ -319,7 +766,20 @@ class OperationalModel(po.ConcreteModel):
         Parameters
         ----------
         solver : string
-            solver to be used e.g. "glpk","gurobi","cplex"
+            solver to be used e.g. "glpk","gurobi","cplex" or "scipy-highs"
+            to solve the model in-process with the HiGHS solvers of SciPy,
+            see :mod:`oemof.solph.matrix`, "separable" to solve chunks of
+            timesteps of a model without :func:`temporal coupling
+            <oemof.solph.decomposition.temporal_coupling>` in parallel
+            with :func:`~oemof.solph.decomposition.separable`, "benders" to
+            solve an investment model by :func:`Benders decomposition
+            <oemof.solph.decomposition.benders>` or "lagrangian" to solve a
+            unit commitment model by :func:`Lagrangian relaxation
+            <oemof.solph.decomposition.lagrangian>`. These return a
+            :class:`scipy.optimize.OptimizeResult` instead of pyomo's
+            solver results. "coarse-to-fine" solves a model with longer
+            timesteps first and uses its solution to restrict the model,
+            see :func:`~oemof.solph.aggregation.coarse_to_fine`.
         solver_io : string
             pyomo solver interface file format: "lp","python","nl", etc.
         \**kwargs : keyword arguments
@@ -330,34 +790,66 @@ class OperationalModel(po.ConcreteModel):
         solve_kwargs : dict
             Other arguments for the pyomo.opt.SolverFactory.solve() method
             Example : {"tee":True}
+            For "scipy-highs" only "tee" is accepted, which shows the log of
+            HiGHS. For "benders" the arguments of
+            :func:`~oemof.solph.decomposition.benders`, e.g.
+            {"chunks": 4, "max_workers": 4}, and for "separable",
+            "lagrangian" and "coarse-to-fine" those of the respective
+            functions, e.g. {"factor": 4, "solver": "cbc"}.
         cmdline_options : dict
             Dictionary with command line options for solver e.g.
             {"mipgap":"0.01"} results in "--mipgap 0.01"
             {"interior":" "} results in "--interior"
             Gurobi solver takes numeric parameter values such as
             {"method": 2}
+            For "scipy-highs" these are HiGHS options such as
+            {"time_limit": 60, "mip_rel_gap": 0.01}
+        lazy_results : boolean
+            If `True`, :attr:`es.results` is a :class:`LazyResults` object
+            which only pulls the time series accessed from the model instead
+            of the whole dictionary created by :meth:`results`.
+            Default: `False`
+        cache : str or :class:`ResultCache <oemof.solph.cache.ResultCache>`
+            If given, a model identical to one solved before with the same
+            solver options isn't solved again but its stored solution is
+            loaded. A string is the directory of the cache.
 
         """
-        solve_kwargs = kwargs.get('solve_kwargs', {})
-        solver_cmdline_options = kwargs.get("cmdline_options", {})
+        results = _solve_or_load(self, solver, solver_io, **kwargs)
+        self._store_results(results, **kwargs)
+        return results
 
-        opt = SolverFactory(solver, solver_io=solver_io)
-        # set command line options
-        options = opt.options
-        for k in solver_cmdline_options:
-            options[k] = solver_cmdline_options[k]
+    async def solve_async(self, solver='glpk', solver_io='lp', pool=None,
+                          **kwargs):
+        r""" Solves the model like :meth:`solve` but without blocking the
+        event loop.
 
-        results = opt.solve(self, **solve_kwargs)
+        The model is solved in a thread of the `pool`, and at most as many
+        solvers as the `pool` allows run at the same time.
 
-        self.solutions.load_from(results)
+        Parameters
+        ----------
+        pool : :class:`SolverPool <oemof.solph.solverpool.SolverPool>`
+            Defaults to :func:`default_pool()
+            <oemof.solph.solverpool.default_pool>`.
 
+        The other arguments are the same as for :meth:`solve`.
+        """
+        from .solverpool import default_pool
+        pool = pool or default_pool()
+        results = await pool.solve(self, solver, solver_io, **kwargs)
+        self._store_results(results, **kwargs)
+        return results
+
+    def _store_results(self, results, **kwargs):
         # storage optimization results in result dictionary of energysystem
-        self.es.results = self.results()
+        if kwargs.get('lazy_results', False):
+            self.es.results = LazyResults.from_model(self)
+        else:
+            self.es.results = self.results()
         self.es.results.objective = self.objective()
         self.es.results.solver = results
 
-        return results
-
     def relax_problem(self):
         """ Relaxes integer variables to reals of optimization model self
         """
@@ -365,3 +857,100 @@ class OperationalModel(po.ConcreteModel):
         relaxer._apply_to(self)
 
         return self
+
+
+class SegmentedModel(OperationalModel):
+    """ An :class:`OperationalModel` with one timestep per segment of
+    consecutive timesteps of the energy system, whose results are given for
+    the timesteps of the energy system.
+
+    The model is built on the start times of the segments, with the total
+    time increment of a segment and the sequences averaged over it, see
+    :func:`aggregated <oemof.solph.aggregation.aggregated>`. The flows of a
+    segment are the results of all its timesteps, storage levels are
+    interpolated linearly between the ends of the segments and the shadow
+    prices of buses are distributed by time increment.
+
+    Parameters
+    ----------
+    es : EnergySystem object
+    segments : list
+        Lists of consecutive timesteps covering the timeindex, e.g. as
+        returned by :func:`segment <oemof.solph.aggregation.segment>`.
+    timeindex : pandas DatetimeIndex
+        The timeindex of the energy system, which the segments refer to.
+    timeincrement : float or list of floats
+        The time increment of the timesteps of the energy system, by
+        default calculated from the frequency of the timeindex.
+
+    The other arguments are those of :class:`OperationalModel`, except for
+    `timesteps`.
+
+    Attributes
+    ----------
+    segments : list
+    full_timeindex : pandas DatetimeIndex
+    full_timeincrement : sequence
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> import oemof.solph as solph
+    >>> es = solph.EnergySystem(
+    ...     timeindex=pd.date_range('1/1/2012', periods=4, freq='H'))
+    >>> demand = solph.Sink(label='demand')
+    >>> pv = solph.Source(label='pv', outputs={demand: solph.Flow(
+    ...     actual_value=[1, 1, 1, 3], nominal_value=1, fixed=True,
+    ...     variable_costs=3)})
+    >>> om = SegmentedModel(es, [[0, 1, 2], [3]])
+    >>> list(om.timeincrement[:2])
+    [3.0, 1.0]
+    >>> result = om.solve(solver='scipy-highs')
+    >>> list(es.results[pv][demand]), es.results.objective
+    ([1.0, 1.0, 1.0, 3.0], 18.0)
+    """
+    def __init__(self, es, segments, **kwargs):
+        from .aggregation import aggregated
+        segments = [list(s) for s in segments]
+        timeindex = kwargs.pop('timeindex', es.timeindex)
+        timeincrement = kwargs.pop('timeincrement', None)
+        if timeincrement is None:
+            if timeindex.freq is None:
+                raise ValueError("The timeindex has no frequency, so the " +
+                                 "timeincrement has to be given.")
+            timeincrement = timeindex.freq.nanos / 3.6e12
+        timeincrement = sequence(timeincrement)
+        with aggregated(es, segments, timeincrement):
+            super().__init__(
+                es, timeindex=timeindex[[s[0] for s in segments]],
+                timesteps=range(len(segments)),
+                timeincrement=[sum(timeincrement[t] for t in s)
+                               for s in segments], **kwargs)
+        self.segments = segments
+        self.full_timeindex = timeindex
+        self.full_timeincrement = timeincrement
+
+    def _result(self, i, o):
+        """ Returns the result time series attached to the edge from `i` to
+        `o` for the timesteps of the energy system.
+        """
+        segmented = super()._result(i, o)
+        result = UserList()
+        if i is o and isinstance(i, Storage):
+            previous = segmented[-1]
+            for k, s in enumerate(self.segments):
+                shares = np.cumsum([self.full_timeincrement[t] for t in s])
+                shares /= shares[-1]
+                result.extend(previous + (segmented[k] - previous) * shares)
+                previous = segmented[k]
+            result.data = [float(v) for v in result.data]
+        elif i is o:
+            for k, s in enumerate(self.segments):
+                result.extend(segmented[k] * self.full_timeincrement[t] /
+                              self.timeincrement[k] for t in s)
+        else:
+            for k, s in enumerate(self.segments):
+                result.extend([segmented[k]] * len(s))
+        if hasattr(segmented, 'invest'):
+            result.invest = segmented.invest
+        return result
@@ -14,12 +14,33 @@ class Investment:
     ep_costs : float
         Equivalent periodical costs for the investment, if period is one
         year these costs are equal to the equivalent annual costs.
+    capex : float
+        Capital expenditure per unit of capacity. Only used by the
+        :class:`ExpansionModel <oemof.solph.models.ExpansionModel>`, which
+        turns it into annual costs using :func:`oemof.tools.economics.annuity`
+        instead of using `ep_costs`.
+    lifetime : int
+        Number of years a capacity built by the :class:`ExpansionModel
+        <oemof.solph.models.ExpansionModel>` is available. Defaults to
+        `None`, i.e. capacities are never decommissioned.
+    wacc : float
+        Weighted average cost of capital used to annualize `capex`. Defaults
+        to the discount rate of the :class:`ExpansionModel
+        <oemof.solph.models.ExpansionModel>`.
+    existing : float
+        Capacity which is already installed in every investment period of an
+        :class:`ExpansionModel <oemof.solph.models.ExpansionModel>`.
 
     """
-    def __init__(self, maximum=float('+inf'), minimum=0, ep_costs=0):
+    def __init__(self, maximum=float('+inf'), minimum=0, ep_costs=0,
+                 capex=None, lifetime=None, wacc=None, existing=0):
         self.maximum = maximum
         self.minimum = minimum
         self.ep_costs = ep_costs
+        self.capex = capex
+        self.lifetime = lifetime
+        self.wacc = wacc
+        self.existing = existing
 
 
 class BinaryFlow:
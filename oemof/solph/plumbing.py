@@ -63,16 +63,27 @@ class _Sequence(UserList):
         self.default = kwargs["default"]
         super().__init__(*args)
 
+    def _writable(self):
+        if not isinstance(self.data, list):
+            # The data may be a read-only view, e.g. into a memory-mapped
+            # file, which is only copied once it has to change.
+            self.data = list(self.data)
+
+    def _grow(self, key):
+        self._writable()
+        self.data.extend([self.default] * (key - len(self.data) + 1))
+
     def __getitem__(self, key):
         try:
             return self.data[key]
         except IndexError:
-            self.data.extend([self.default] * (key - len(self.data) + 1))
+            self._grow(key)
             return self.data[key]
 
     def __setitem__(self, key, value):
+        self._writable()
         try:
             self.data[key] = value
         except IndexError:
-            self.data.extend([self.default] * (key - len(self.data) + 1))
+            self._grow(key)
             self.data[key] = value
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Solving long time horizons window by window, with checkpoints to resume
+interrupted runs.
+
+:class:`RollingHorizon` solves one :class:`OperationalModel
+<oemof.solph.models.OperationalModel>` per window of consecutive timesteps.
+The storage levels and the states of :class:`BinaryFlows
+<oemof.solph.options.BinaryFlow>` at the end of a window are the initial
+values of the next one. After every window the progress is written to a
+:class:`Checkpoint`, so a run which was interrupted, e.g. because its machine
+was pre-empted, continues with the first window which wasn't completed.
+
+Examples
+--------
+>>> import os, tempfile
+>>> import pandas as pd
+>>> import oemof.solph as solph
+>>> es = solph.EnergySystem(
+...     timeindex=pd.date_range('1/1/2012', periods=4, freq='H'))
+>>> demand = solph.Sink(label='demand')
+>>> pv = solph.Source(label='pv', outputs={demand: solph.Flow(
+...     actual_value=[1, 2, 3, 4], nominal_value=1, fixed=True)})
+>>> path = os.path.join(tempfile.mkdtemp(), 'run.npz')
+>>> horizon = RollingHorizon(es, window=2, checkpoint=path,
+...                          solver='scipy-highs')
+>>> horizon.run(max_windows=1)
+False
+>>> horizon = RollingHorizon(es, window=2, checkpoint=path,
+...                          solver='scipy-highs')
+>>> horizon.checkpoint.position, horizon.run()
+(1, True)
+>>> list(es.results[pv][demand])
+[1.0, 2.0, 3.0, 4.0]
+"""
+
+from collections import UserDict, UserList
+import json
+import os
+import tempfile
+
+import numpy as np
+import pyomo.environ as po
+
+from .models import OperationalModel
+from .network import Storage
+
+
+def _replace(path, write):
+    """ Writes the file `path` using `write(f)` on a binary file object,
+    replacing an existing one only once the new one is complete.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+class Checkpoint:
+    """ The progress of a driver solving one model after another, stored in
+    the compact binary `.npz` file `path`.
+
+    The result sequences of every completed unit are stored in a `.npy` file
+    of their own next to it, e.g. `run.0.npy` for `run.npz`, so saving only
+    writes those of the new units. An existing checkpoint is loaded on
+    creation.
+
+    Attributes
+    ----------
+    position : int
+        The number of completed units, e.g. windows.
+    objective : float
+        The sum of the objective values of the completed units.
+    keys : list
+        `[source label, target label]` of every result sequence.
+    parts : list
+        The result sequences of every completed unit as a
+        :class:`numpy.ndarray` with one row per key.
+    state : dictionary
+        Values carried over to the next unit, which have to be encodable as
+        JSON.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.position = 0
+        self.objective = 0.0
+        self.keys = []
+        self.parts = []
+        self.state = {}
+        self._saved = 0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    @property
+    def values(self):
+        """ The result sequences of all completed units, one row per key.
+        """
+        if not self.parts:
+            return np.empty((len(self.keys), 0))
+        return np.hstack(self.parts)
+
+    def _part(self, number):
+        return '{}.{}.npy'.format(os.path.splitext(self.path)[0], number)
+
+    def load(self):
+        """ Reads the checkpoint from :attr:`path`.
+        """
+        with np.load(self.path) as data:
+            self.position = int(data['position'])
+            self.objective = float(data['objective'])
+            self.keys = json.loads(str(data['keys']))
+            self.state = json.loads(str(data['state']))
+        self.parts = [np.load(self._part(number), mmap_mode='r')
+                      for number in range(self.position)]
+        self._saved = len(self.parts)
+
+    def save(self):
+        """ Writes the result sequences of the units completed since the
+        last save and then the checkpoint to :attr:`path`, replacing the
+        previous one only once it is complete.
+        """
+        for number in range(self._saved, len(self.parts)):
+            _replace(self._part(number),
+                     lambda f: np.save(f, self.parts[number]))
+        _replace(self.path, lambda f: np.savez(
+            f, position=self.position, objective=self.objective,
+            keys=np.array(json.dumps(self.keys)),
+            state=np.array(json.dumps(self.state))))
+        self._saved = len(self.parts)
+
+
+class RollingHorizon:
+    """ Solves the energy system `es` window by window.
+
+    Within a window, storages start with the level at the end of the
+    previous window and end freely. In the first window, storages with an
+    `initial_capacity` start with it while the others are cyclic, as in an
+    :class:`OperationalModel <oemof.solph.models.OperationalModel>` of the
+    whole horizon. Binary flows start with the status at the end of the
+    previous window or with their `initial_status`.
+
+    Attributes which couple all timesteps, like `summed_max`, apply to every
+    window separately. Investments and storages with several inputs or
+    outputs aren't supported.
+
+    Parameters
+    ----------
+    es : :class:`EnergySystem <oemof.solph.network.EnergySystem>`
+    window : int
+        Number of timesteps per window. The last window may be shorter.
+    checkpoint : str
+        Name of the :class:`Checkpoint` file. Without one, the progress is
+        only kept in memory.
+    model_kwargs : dictionary
+        Further keyword arguments of the models, e.g. `timeincrement`.
+    \\**kwargs :
+        Passed on to :meth:`OperationalModel.solve
+        <oemof.solph.models.OperationalModel.solve>`, e.g. `solver`.
+
+    Attributes
+    ----------
+    checkpoint : :class:`Checkpoint`
+    windows : list
+        The timesteps of every window.
+    """
+    def __init__(self, es, window, checkpoint=None, model_kwargs=None,
+                 **kwargs):
+        if any(f.investment is not None for f in es.flows().values()):
+            raise ValueError("Investments can't be optimized window by " +
+                             "window.")
+        if any(isinstance(n, Storage) and
+               (len(n.inputs) > 1 or len(n.outputs) > 1) for n in es.nodes):
+            raise ValueError("Storages with several inputs or outputs " +
+                             "aren't supported.")
+        self.es = es
+        self.model_kwargs = model_kwargs or {}
+        self.solve_kwargs = kwargs
+        steps = len(es.timeindex)
+        self.windows = [range(start, min(start + window, steps))
+                        for start in range(0, steps, window)]
+        self.checkpoint = Checkpoint(checkpoint)
+        self._nodes = {str(n.label): n for n in es.nodes}
+
+    def _initial_state(self):
+        return {'storages': {str(n.label): n.initial_capacity *
+                             n.nominal_capacity
+                             for n in self.es.nodes
+                             if isinstance(n, Storage) and
+                             n.initial_capacity is not None},
+                'status': []}
+
+    def _model(self, timesteps, state):
+        """ Builds the model of a window, starting from `state`.
+        """
+        binaries = {}
+        for (i, o), status in state['status']:
+            binary = self._nodes[i].outputs[self._nodes[o]].binary
+            binaries[binary] = binary.initial_status
+            binary.initial_status = status
+        try:
+            om = OperationalModel(self.es, timesteps=timesteps,
+                                  **self.model_kwargs)
+        finally:
+            for binary, status in binaries.items():
+                binary.initial_status = status
+
+        levels = {self._nodes[label]: level
+                  for label, level in state['storages'].items()}
+        if levels:
+            first, last = timesteps[0], timesteps[-1]
+            for n in levels:
+                om.Storage.capacity[n, last].unfix()
+                om.Storage.balance[n, first].deactivate()
+
+            def _start_rule(model, n):
+                """ The storage balance of the first timestep, starting with
+                the level carried over.
+                """
+                i, o = next(iter(n.inputs)), next(iter(n.outputs))
+                return (om.Storage.capacity[n, first] ==
+                        levels[n] * (1 - n.capacity_loss[first]) +
+                        (om.flow[i, n, first] *
+                         n.inflow_conversion_factor[first] -
+                         om.flow[n, o, first] /
+                         n.outflow_conversion_factor[first]) *
+                        om.timeincrement[first])
+            om.rolling_start = po.Constraint(list(levels), rule=_start_rule)
+        return om
+
+    def _final_state(self, om):
+        """ Returns the storage levels and binary states at the end of the
+        window solved by `om`.
+        """
+        last = om.timesteps[-1]
+        state = {'storages': {}, 'status': []}
+        if hasattr(om, 'Storage') and hasattr(om.Storage, 'STORAGES'):
+            state['storages'] = {str(n.label): om.Storage.capacity[n, last]
+                                 .value for n in om.Storage.STORAGES}
+        if hasattr(om, 'BinaryFlow') and hasattr(om.BinaryFlow,
+                                                 'BINARY_FLOWS'):
+            state['status'] = [
+                [[str(i.label), str(o.label)],
+                 int(round(om.BinaryFlow.status[i, o, last].value))]
+                for i, o in om.BinaryFlow.BINARY_FLOWS]
+        return state
+
+    def run(self, max_windows=None):
+        """ Solves the windows following the last completed one and stores
+        the results of all completed windows as :attr:`es.results`.
+
+        Parameters
+        ----------
+        max_windows : int
+            Number of windows to solve at most.
+
+        Returns
+        -------
+        boolean
+            Whether all windows are completed.
+        """
+        checkpoint = self.checkpoint
+        if checkpoint.position == 0 and not checkpoint.state:
+            checkpoint.state = self._initial_state()
+        stop = len(self.windows)
+        if max_windows is not None:
+            stop = min(stop, checkpoint.position + max_windows)
+        for position in range(checkpoint.position, stop):
+            om = self._model(self.windows[position], checkpoint.state)
+            om.solve(**self.solve_kwargs)
+            keys, values = [], []
+            for i, targets in self.es.results.items():
+                for o, series in targets.items():
+                    keys.append([str(i.label), str(o.label)])
+                    values.append(np.asarray(series, dtype=np.float64))
+            values = np.array(values).reshape(len(keys), -1)
+            if checkpoint.position and keys != checkpoint.keys:
+                raise ValueError(("The results of window {} differ from " +
+                                  "the previous ones.").format(position))
+            checkpoint.keys = keys
+            checkpoint.parts.append(values)
+            checkpoint.objective += om.objective()
+            checkpoint.state = self._final_state(om)
+            checkpoint.position = position + 1
+            if checkpoint.path is not None:
+                checkpoint.save()
+        self.es.results = self.results()
+        return checkpoint.position == len(self.windows)
+
+    def results(self):
+        """ Returns the results of the completed windows like
+        :meth:`OperationalModel.results
+        <oemof.solph.models.OperationalModel.results>` does.
+        """
+        results = UserDict()
+        results.objective = self.checkpoint.objective
+        for (i, o), values in zip(self.checkpoint.keys,
+                                  self.checkpoint.values):
+            results.setdefault(self._nodes[i], UserDict())[
+                self._nodes[o]] = UserList(values.tolist())
+        return results
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Solving models from asyncio code without blocking the event loop.
+
+:class:`SolverPool` solves models in a thread pool, so an event loop, e.g. of
+an HTTP service, keeps serving requests while a model is solved. Every thread
+calls the public `solve()` of pyomo, which keeps the temporary files of each
+thread apart. The pool limits the number of solvers running at the same time
+across all threads and event loops using it.
+
+Examples
+--------
+>>> import asyncio
+>>> import pandas as pd
+>>> import oemof.solph as solph
+>>> es = solph.EnergySystem(
+...     timeindex=pd.date_range('1/1/2012', periods=2, freq='H'))
+>>> demand = solph.Sink(label='demand')
+>>> pv = solph.Source(label='pv', outputs={demand: solph.Flow(
+...     actual_value=[1, 2], nominal_value=1, fixed=True, variable_costs=3)})
+>>> om = solph.OperationalModel(es)
+>>> pool = SolverPool(max_processes=2)
+>>> result = asyncio.run(om.solve_async(solver='scipy-highs', pool=pool))
+>>> es.results.objective
+9
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import os
+import threading
+
+from pyomo.common.tempfiles import TempfileManager
+
+
+class SolverPool:
+    """ Limits the number of solvers running concurrently.
+
+    Parameters
+    ----------
+    max_processes : int
+        Number of solvers allowed to run at the same time, by all threads and
+        event loops using the pool. Defaults to the number of processors.
+    max_threads : int
+        Number of threads solving models, of which at most `max_processes`
+        run a solver while the others wait. Defaults to `max_processes`.
+
+    Attributes
+    ----------
+    active : int
+        The number of solvers currently running.
+    """
+    def __init__(self, max_processes=None, max_threads=None):
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self._slots = threading.BoundedSemaphore(self.max_processes)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_threads or self.max_processes)
+        self.active = 0
+
+    def _solve(self, model, solver, solver_io, **kwargs):
+        from .models import _solve_or_load
+        keepfiles = kwargs.get('solve_kwargs', {}).get('keepfiles', False)
+        with self._slots:
+            with self._lock:
+                self.active += 1
+            # The temporary files of a failed solve are left by pyomo in a
+            # context on top of this one, which are both released here.
+            context = TempfileManager.push()
+            try:
+                return _solve_or_load(model, solver, solver_io, **kwargs)
+            finally:
+                while TempfileManager.pop(remove=not keepfiles) is not context:
+                    pass
+                with self._lock:
+                    self.active -= 1
+
+    async def solve(self, model, solver='glpk', solver_io='lp', **kwargs):
+        r""" Solves `model` in a thread of the pool and loads the solution
+        into it once one of the solver slots is free.
+
+        Takes the same arguments as :meth:`OperationalModel.solve
+        <oemof.solph.models.OperationalModel.solve>`, including `cache`,
+        and returns the solver results.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(
+            self._solve, model, solver, solver_io, **kwargs))
+
+    def shutdown(self):
+        """ Stops the threads of the pool once they are done.
+        """
+        self._executor.shutdown()
+
+
+_default = None
+
+
+def default_pool():
+    """ Returns the :class:`SolverPool` used if none is given, with one
+    solver slot per processor.
+    """
+    global _default
+    if _default is None:
+        _default = SolverPool()
+    return _default
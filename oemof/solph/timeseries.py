@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+Storage for the time series attached to flows and storages.
+
+Large models hold most of their memory in the sequence attributes of
+:class:`Flows <oemof.solph.network.Flow>` and :class:`Storages
+<oemof.solph.network.Storage>`. :func:`externalize` moves all of them into
+one binary file and replaces them with read-only, memory-mapped views into
+that file, which are pickled by reference, so that processes working on the
+same energy system share the page-cached file instead of copies of the
+sequences. :class:`SharedTimeSeries` does the same using a shared memory
+block.
+
+Identical profiles, e.g. the same price curve used as `variable_costs` of many
+flows, can be stored only once with a :class:`SequenceStore`.
+"""
+
+import hashlib
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from oemof.columnar import ArrayWriter, open_arrays
+from .network import Flow, Storage
+from .plumbing import _Sequence
+
+
+#: The attributes holding sequences, by class.
+SEQUENCE_ATTRIBUTES = {
+    Flow: ('actual_value', 'min', 'max', 'positive_gradient',
+           'negative_gradient', 'variable_costs'),
+    Storage: ('capacity_loss', 'inflow_conversion_factor',
+              'outflow_conversion_factor', 'capacity_max', 'capacity_min')}
+
+
+def sequences(nodes):
+    """ Yields `(obj, attribute, values)` for every sequence attribute of
+    the flows and storages of `nodes` which holds an actual sequence, i.e.
+    which wasn't set from a scalar.
+
+    Parameters
+    ----------
+    nodes : iterable or :class:`EnergySystem <oemof.solph.network.EnergySystem>`
+        The nodes whose output flows are searched, together with the nodes
+        themselves.
+    """
+    nodes = list(getattr(nodes, 'nodes', nodes))
+    objects = nodes + [f for n in nodes for f in n.outputs.values()]
+    for obj in objects:
+        for cls, attributes in SEQUENCE_ATTRIBUTES.items():
+            if not isinstance(obj, cls):
+                continue
+            for attribute in attributes:
+                values = getattr(obj, attribute, None)
+                if values is None or isinstance(values, (_Sequence, str)):
+                    continue
+                yield obj, attribute, values
+
+
+class SequenceStore:
+    """ Keeps one canonical, read-only array per distinct sequence.
+
+    Sequences are identified by a digest of their values, so equal profiles
+    map to the same array, which can be compared by identity.
+
+    Examples
+    --------
+    >>> store = SequenceStore()
+    >>> a = store.add([1, 2, 3])
+    >>> b = store.add((1.0, 2.0, 3.0))
+    >>> a is b, len(store)
+    (True, 1)
+    >>> store.digest(a) == store.digest([1, 2, 3])
+    True
+    """
+    def __init__(self):
+        self._arrays = {}
+        self._digests = {}
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def __iter__(self):
+        return iter(self._arrays.values())
+
+    @property
+    def nbytes(self):
+        """ The number of bytes held by the canonical arrays.
+        """
+        return sum(a.nbytes for a in self._arrays.values())
+
+    def digest(self, values):
+        """ Returns the digest identifying the sequence `values`.
+
+        The digest of a canonical array is looked up instead of computed.
+        """
+        digest = self._digests.get(id(values))
+        if digest is not None:
+            return digest
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        return hashlib.sha1(values.view(np.uint8)).hexdigest()
+
+    def add(self, values):
+        """ Returns the canonical array holding the same values as `values`,
+        adding a read-only copy of `values` if there is none yet.
+        """
+        digest = self.digest(values)
+        array = self._arrays.get(digest)
+        if array is None:
+            array = np.array(values, dtype=np.float64).ravel()
+            array.flags.writeable = False
+            self._arrays[digest] = array
+            self._digests[id(array)] = digest
+        return array
+
+
+def deduplicate(nodes, store=None):
+    """ Replaces all sequences of the flows and storages of `nodes` by the
+    canonical arrays of `store`, so that equal profiles are held in memory
+    only once.
+
+    The keyword arguments recorded for pickling nodes are updated as well.
+
+    Parameters
+    ----------
+    nodes : iterable or :class:`EnergySystem <oemof.solph.network.EnergySystem>`
+    store : :class:`SequenceStore`
+        The store to use. A new one is created if none is given, so
+        deduplicating several energy systems into the same store shares their
+        profiles as well.
+
+    Returns
+    -------
+    :class:`SequenceStore`
+    """
+    if store is None:
+        store = SequenceStore()
+    found = list(sequences(nodes))
+    _replace(found, lambda i: store.add(found[i][2]))
+    return store
+
+
+class _SequenceView(np.ndarray):
+    """ A read-only view into a block of memory holding time series, which
+    is pickled as its location in that block.
+
+    Subclasses implement :meth:`_open` to create the array for the whole
+    block. Arrays derived from a view, e.g. by arithmetic, are pickled as
+    ordinary arrays.
+    """
+
+    @classmethod
+    def attach(cls, key, offset, length):
+        """ Returns the view of `length` values at `offset` in the block
+        `key`, opening the block if this process hasn't opened it yet.
+        """
+        if key not in cls._blocks:
+            cls._blocks[key] = cls._open(key)
+        view = cls._blocks[key][offset:offset + length].view(cls)
+        view.flags.writeable = False
+        view._location = (key, offset, length)
+        return view
+
+    def __array_finalize__(self, obj):
+        self._location = None
+
+    def __reduce__(self):
+        if self._location is None:
+            return np.asarray(self).__reduce__()
+        return (type(self).attach, self._location)
+
+
+class MappedSequence(_SequenceView):
+    """ A read-only view into a memory-mapped time series file.
+
+    Pickling a mapped sequence only stores the file name and its position in
+    the file. Unpickling maps the file again, once per process.
+    """
+    _blocks = {}
+
+    @staticmethod
+    def _open(path):
+        return open_arrays(path, mmap=True)
+
+
+class SharedSequence(_SequenceView):
+    """ A read-only view into a :class:`SharedTimeSeries` block.
+
+    Pickling a shared sequence only stores the name of the shared memory
+    block and its position in it. Unpickling attaches to the block, once per
+    process, without copying it.
+    """
+    _blocks = {}
+    # The blocks have to stay open as long as arrays use their buffers.
+    _memory = {}
+
+    @classmethod
+    def _open(cls, name):
+        try:
+            block = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching registers the block with the
+            # resource tracker, which unlinks it when the tracker exits. Child
+            # processes share the tracker of their parent, which owns the
+            # block, but other processes have to unregister it.
+            block = shared_memory.SharedMemory(name=name)
+            if multiprocessing.parent_process() is None:
+                resource_tracker.unregister(block._name, 'shared_memory')
+        array = np.ndarray((block.size // 8,), dtype=np.float64,
+                           buffer=block.buf)
+        cls._memory[name] = block
+        return array
+
+
+def _add(writer, found):
+    """ Adds the sequences `found` to `writer`, each array object only once,
+    and returns their locations.
+    """
+    locations = {}
+    for _, _, values in found:
+        if id(values) not in locations:
+            locations[id(values)] = writer.add(values)
+    return [locations[id(values)] for _, _, values in found]
+
+
+def _replace(found, view):
+    """ Replaces the sequences `found` by the views created by calling
+    `view` with the index of a sequence.
+    """
+    for i, (obj, attribute, _) in enumerate(found):
+        values = view(i)
+        setattr(obj, attribute, values)
+        state = getattr(obj, '_state', None)
+        if state is not None and attribute in state[1]:
+            state[1][attribute] = values
+    return [(obj, attribute) for obj, attribute, _ in found]
+
+
+def externalize(nodes, path):
+    """ Writes all sequences of the flows and storages of `nodes` into the
+    `.npy` file `path` and replaces them by :class:`MappedSequence` views
+    into that file.
+
+    The keyword arguments recorded for pickling nodes are updated as well,
+    so the original sequences can be garbage collected.
+
+    Parameters
+    ----------
+    nodes : iterable or :class:`EnergySystem <oemof.solph.network.EnergySystem>`
+    path : str
+        Name of the file to write. An existing file is overwritten.
+
+    Returns
+    -------
+    list
+        The `(obj, attribute)` pairs which were replaced.
+    """
+    found = list(sequences(nodes))
+    writer = ArrayWriter()
+    locations = _add(writer, found)
+    writer.write(path)
+    MappedSequence._blocks.pop(path, None)
+    return _replace(found, lambda i: MappedSequence.attach(path,
+                                                           *locations[i]))
+
+
+class SharedTimeSeries:
+    """ Moves all sequences of the flows and storages of `nodes` into one
+    :class:`multiprocessing.shared_memory.SharedMemory` block and replaces
+    them by :class:`SharedSequence` views into that block.
+
+    Energy systems pickled afterwards, e.g. to send them to worker
+    processes, only carry the name of the block and the positions of the
+    sequences in it. Workers attach to the block without copying it.
+
+    The process creating the block owns it. Use the object as a context
+    manager or call :meth:`unlink` to free the block once all workers are
+    done. Existing views stay valid until they are garbage collected.
+
+    Parameters
+    ----------
+    nodes : iterable or :class:`EnergySystem <oemof.solph.network.EnergySystem>`
+
+    Attributes
+    ----------
+    name : str
+        The name of the shared memory block.
+    replaced : list
+        The `(obj, attribute)` pairs which were replaced.
+
+    Examples
+    --------
+    >>> from oemof.solph.network import Sink, Source
+    >>> sink = Sink()
+    >>> source = Source(outputs={sink: Flow(actual_value=[1, 2, 3])})
+    >>> with SharedTimeSeries([source, sink]) as shared:
+    ...     flow = source.outputs[sink]
+    ...     print(type(flow.actual_value).__name__, flow.actual_value[1])
+    SharedSequence 2.0
+    """
+    def __init__(self, nodes):
+        found = list(sequences(nodes))
+        writer = ArrayWriter()
+        locations = _add(writer, found)
+        self._block = shared_memory.SharedMemory(
+            create=True, size=max(len(writer), 1) * 8)
+        self.name = self._block.name
+        array = np.ndarray((len(writer),), dtype=np.float64,
+                           buffer=self._block.buf)
+        offset = 0
+        for values in writer.arrays:
+            array[offset:offset + len(values)] = values
+            offset += len(values)
+        SharedSequence._blocks[self.name] = array
+        SharedSequence._memory[self.name] = self._block
+        self.replaced = _replace(
+            found, lambda i: SharedSequence.attach(self.name, *locations[i]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unlink()
+
+    def unlink(self):
+        """ Frees the shared memory block once all processes attached to it
+        are done with it.
+        """
+        SharedSequence._blocks.pop(self.name, None)
+        SharedSequence._memory.pop(self.name, None)
+        self._block.unlink()
+        try:
+            self._block.close()
+        except BufferError:
+            # Views into the block are still in use. It is closed once they
+            # are garbage collected.
+            pass
@@ -47,6 +47,7 @@ setup(name='oemof',
                         'pandas >= 0.18.0',
                         'pyomo >= 4.2.0, != 4.3.11377',
                         'matplotlib'],
+      extras_require={'scipy-highs': ['scipy >= 1.9.0']},
       entry_points={
           'console_scripts': [
               'oemof_examples = examples.examples:examples']}
@@ -2,6 +2,10 @@ try:
     from collections.abc import Iterable
 except ImportError:
     from collections import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Barrier
 
 from nose.tools import ok_, eq_
 
@@ -37,6 +41,45 @@ class EnergySystem_Tests:
         self.es.timeindex = self.timeindex
         ok_(len(self.es.timeindex) == 5)
 
+    def test_concurrent_population_of_energy_systems(self):
+        """ Energy systems used as context managers don't share nodes.
+
+        Each thread builds its own energy system with identically labelled
+        nodes. The barrier makes sure that all of them are inside their `with`
+        block at the same time, so nodes would end up in the wrong energy
+        system (and trigger label collisions) if the registry wasn't local to
+        the thread.
+        """
+        barrier = Barrier(4)
+
+        def populate(i):
+            with es.EnergySystem() as ES:
+                barrier.wait()
+                bus = Bus(label="bus")
+                Transformer(label="transformer {}".format(i), inputs=[bus])
+                barrier.wait()
+            return ES
+
+        with ThreadPoolExecutor(4) as pool:
+            systems = list(pool.map(populate, range(4)))
+        for i, ES in enumerate(systems):
+            eq_(sorted(n.label for n in ES.nodes),
+                ["bus", "transformer {}".format(i)])
+        eq_(self.es.nodes, [])
+
+    def test_dump_and_restore_inside_with_block(self):
+        tmpdir = mkdtemp()
+        try:
+            with es.EnergySystem() as ES:
+                Bus(label="bus")
+                ES.dump(dpath=tmpdir)
+                ES.restore(dpath=tmpdir)
+                Bus(label="other bus")
+            eq_(sorted(n.label for n in ES.nodes), ["bus", "other bus"])
+            eq_(self.es.nodes, [])
+        finally:
+            rmtree(tmpdir)
+
     def test_entity_grouping_on_construction(self):
         bus = Bus(label="test bus")
         ES = es.EnergySystem(entities=[bus])
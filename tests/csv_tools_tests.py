@@ -0,0 +1,187 @@
+from shutil import copy, rmtree
+from tempfile import mkdtemp
+import os
+
+from nose.tools import eq_, ok_, raises
+import numpy as np
+import pandas as pd
+
+from oemof.solph.inputlib.csv_tools import (
+    NodesFromCSV, merge_csv_files, read_pyramid_level, resample_pyramid,
+    write_pyramid)
+import oemof.solph as solph
+
+
+DATA = os.path.join(os.path.dirname(__file__), os.pardir, 'examples',
+                    'solph', 'csv_reader', 'investment', 'data')
+
+
+class NodesFromCSV_Tests:
+
+    def setup(self):
+        self.es = solph.EnergySystem()
+        self.nodes = NodesFromCSV(
+            file_nodes_flows=os.path.join(DATA, 'nodes_flows.csv'),
+            file_nodes_flows_sequences=os.path.join(DATA,
+                                                    'nodes_flows_seq.csv'))
+
+    def test_scalar_attributes(self):
+        pp = self.nodes['REGION1_pp_lignite']
+        bel = self.nodes['REGION1_bus_el']
+        flow = pp.outputs[bel]
+        eq_(flow.fixed_costs, 39000)
+        eq_(flow.max[8759], 0.85)
+        eq_(flow.variable_costs[0], 4.4)
+        eq_(flow.investment.ep_costs, 1500)
+        eq_(pp.conversion_factors[bel][10], 0.38)
+        ok_(self.nodes['GL_bus_lignite'] in pp.inputs)
+
+    def test_sequences_are_views_into_one_array(self):
+        load = self.nodes['REGION1_load']
+        solar = self.nodes['REGION1_solar']
+        bel = self.nodes['REGION1_bus_el']
+        demand = load.inputs[bel].actual_value
+        ok_(isinstance(demand, np.ndarray))
+        eq_(len(demand), 8760)
+        eq_(demand[1], 0.6099923722)
+        ok_(demand.base is not None)
+        ok_(demand.base is solar.outputs[bel].actual_value.base)
+
+
+class NodesFromCSV_Cache_Tests:
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+        self.files = []
+        for f in ['nodes_flows.csv', 'nodes_flows_seq.csv']:
+            copy(os.path.join(DATA, f), self.tmpdir)
+            self.files.append(os.path.join(self.tmpdir, f))
+
+    def teardown(self):
+        rmtree(self.tmpdir)
+
+    def load(self):
+        solph.EnergySystem()
+        return NodesFromCSV(*self.files, cache=True)
+
+    def test_cache_is_created_and_used(self):
+        first = self.load()
+        cache = self.files[0] + '.cache'
+        ok_(os.path.exists(cache))
+        mtime = os.path.getmtime(cache)
+        second = self.load()
+        eq_(os.path.getmtime(cache), mtime)
+        eq_(sorted(first), sorted(second))
+        bel = second['REGION1_bus_el']
+        eq_(list(second['REGION1_load'].inputs[bel].actual_value),
+            list(first['REGION1_load'].inputs[first['REGION1_bus_el']]
+                 .actual_value))
+
+    def test_cache_is_refreshed_if_a_file_changes(self):
+        self.load()
+        with open(self.files[0], 'a') as f:
+            f.write('Sink,REGION1_extra,REGION1_bus_el,REGION1_extra' +
+                    ',' * 19 + '\n')
+        ok_('REGION1_extra' in self.load())
+        os.utime(self.files[1], (0, 0))
+        ok_('REGION1_extra' in self.load())
+
+
+class Merge_CSV_Files_Tests:
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+        self.output = mkdtemp()
+        self.seq = pd.read_csv(os.path.join(DATA, 'nodes_flows_seq.csv'),
+                               index_col=[0], header=[0, 1, 2, 3, 4])
+        for i in range(len(self.seq.columns)):
+            self.seq.iloc[:, [i]].to_csv(
+                os.path.join(self.tmpdir, 'part{}_seq.csv'.format(i)))
+        self.nodes_flows = pd.read_csv(os.path.join(DATA, 'nodes_flows.csv'))
+        self.nodes_flows.iloc[:20].to_csv(
+            os.path.join(self.tmpdir, 'first.csv'), index=False)
+        self.nodes_flows.iloc[20:].to_csv(
+            os.path.join(self.tmpdir, 'second.csv'), index=False)
+
+    def teardown(self):
+        rmtree(self.tmpdir)
+        rmtree(self.output)
+
+    def test_merged_frames(self):
+        nodes_flows, seq = merge_csv_files(self.tmpdir, write=False)
+        eq_(len(nodes_flows), len(self.nodes_flows))
+        eq_(sorted(seq.columns), sorted(self.seq.columns))
+        pd.testing.assert_frame_equal(seq[self.seq.columns], self.seq)
+
+    def test_streaming_writes_the_same_files(self):
+        merge_csv_files(self.tmpdir, self.output)
+        expected = {}
+        for f in os.listdir(self.output):
+            with open(os.path.join(self.output, f)) as csvfile:
+                expected[f] = csvfile.read()
+            os.remove(os.path.join(self.output, f))
+        files = merge_csv_files(self.tmpdir, self.output, stream=True,
+                                chunksize=1000)
+        eq_(sorted(os.path.basename(f) for f in files), sorted(expected))
+        for f in files:
+            with open(f) as csvfile:
+                eq_(csvfile.read(), expected[os.path.basename(f)])
+
+    @raises(ValueError)
+    def test_duplicate_sequence_headers(self):
+        self.seq.iloc[:, [0]].to_csv(
+            os.path.join(self.tmpdir, 'duplicate_seq.csv'))
+        merge_csv_files(self.tmpdir, write=False)
+
+    def test_empty_sequence_file(self):
+        open(os.path.join(self.tmpdir, 'empty_seq.csv'), 'w').close()
+        try:
+            merge_csv_files(self.tmpdir, write=False)
+        except ValueError as e:
+            ok_('empty_seq.csv' in str(e))
+        else:
+            raise AssertionError("ValueError not raised")
+
+    @raises(ValueError)
+    def test_empty_file(self):
+        open(os.path.join(self.tmpdir, 'empty.csv'), 'w').close()
+        merge_csv_files(self.tmpdir, write=False)
+
+    @raises(ValueError)
+    def test_missing_sequence_files(self):
+        for f in os.listdir(self.tmpdir):
+            if 'seq' in f:
+                os.remove(os.path.join(self.tmpdir, f))
+        merge_csv_files(self.tmpdir, self.output)
+
+
+class Resample_Pyramid_Tests:
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+        random = np.random.RandomState(3)
+        self.seq = pd.DataFrame(
+            random.rand(1000, 3), columns=['a', 'b', 'c'],
+            index=pd.date_range('1/1/2014 05:30', periods=1000,
+                                freq='15min'))
+        self.seq.iloc[::7, 1] = np.nan
+        self.seq = self.seq.drop(self.seq.index[500:600])
+        self.samples = ['D', '30min', 'H', '5H', '10H', 'W', '3H', 'M']
+
+    def teardown(self):
+        rmtree(self.tmpdir)
+
+    def test_means_equal_resampling_each_rate(self):
+        pyramid = resample_pyramid(self.seq, self.samples)
+        eq_(sorted(pyramid), sorted(self.samples))
+        for rate in self.samples:
+            pd.testing.assert_frame_equal(pyramid[rate],
+                                          self.seq.resample(rate).mean())
+
+    def test_binary_roundtrip(self):
+        pyramid = resample_pyramid(self.seq.tz_localize('UTC'), ['H', 'D'])
+        files = write_pyramid(pyramid, self.tmpdir, file_prefix='x_')
+        eq_(os.path.basename(files['H']), 'x_H_seq.npz')
+        for rate in ['H', 'D']:
+            pd.testing.assert_frame_equal(read_pyramid_level(files[rate]),
+                                          pyramid[rate], check_freq=False)
@@ -0,0 +1,240 @@
+from collections import UserDict, UserList
+from shutil import rmtree
+from tempfile import mkdtemp
+import logging
+import os
+
+from nose.tools import ok_, eq_
+import numpy as np
+import pandas as pd
+
+from oemof.outputlib import ResultsDataFrame as RDF
+from oemof.outputlib import chunked
+import oemof.solph as solph
+
+
+def _legacy_frame(es):
+    """ The results data frame as it was built before it was vectorized.
+    """
+    tuples = [(row[0], row[1], row[2], date, val)
+              for row in _legacy_rows(es)
+              for date, val in zip(es.timeindex, row[3])]
+    index = ['bus_label', 'type', 'obj_label', 'datetime']
+    df = pd.DataFrame(tuples, columns=index + ['val'])
+    df.set_index(index, inplace=True)
+    df.sort_index(inplace=True)
+    # The label levels are categoricals since they are sliced by code.
+    df.index = df.index.set_levels(
+        [pd.CategoricalIndex(l) for l in df.index.levels[:3]], level=[0, 1, 2])
+    return df
+
+
+def _legacy_rows(es):
+    """ A frozen copy of the classification of the result series as done by
+    the original :class:`ResultsDataFrame`.
+    """
+    for k, v in es.results.items():
+        if 'Bus' in str(k.__class__):
+            for kk, vv in v.items():
+                if k is kk:
+                    yield (k.label, 'other', 'duals', vv)
+                elif isinstance(kk, str):
+                    yield (k.label, 'from_bus', 'kk', vv)
+                else:
+                    yield (k.label, 'from_bus', kk.label, vv)
+        elif k in v.keys():
+            bus = list(k.outputs.keys())[0]
+            for kk, vv in v.items():
+                if k is kk:
+                    yield (bus.label, 'other', k.label, vv)
+                else:
+                    yield (bus.label, 'to_bus', k.label, v.get(bus))
+        else:
+            for kk, vv in v.items():
+                yield (kk.label, 'to_bus', k.label, vv)
+
+
+class _Label:
+    """ A label holding a list of numbers.
+    """
+    def __init__(self, name, years):
+        self.name, self.years = name, years
+
+    def _key(self):
+        return (self.name, tuple(self.years))
+
+    def __eq__(self, other):
+        return self._key() == other._key()
+
+    def __lt__(self, other):
+        return self._key() < other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+class ResultsDataFrame_Tests:
+
+    def setup(self):
+        logging.disable(logging.CRITICAL)
+        self.es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2012', periods=24, freq='H'))
+        bel = solph.Bus(label='electricity')
+        bth = solph.Bus(label='heat')
+        pv = solph.Source(label='pv', outputs={bel: solph.Flow()})
+        demand = solph.Sink(label='demand', inputs={bel: solph.Flow()})
+        heat = solph.Sink(label='heat_demand', inputs={bth: solph.Flow()})
+        chp = solph.LinearTransformer(
+            label='chp', inputs={bel: solph.Flow()},
+            outputs={bth: solph.Flow()}, conversion_factors={bth: 1})
+        storage = solph.Storage(label='storage', inputs={bel: solph.Flow()},
+                                outputs={bel: solph.Flow()},
+                                nominal_capacity=10)
+        random = np.random.RandomState(1)
+        results = UserDict()
+        for source, target in self.es.flows():
+            results[source] = results.get(source, UserDict())
+            results[source][target] = UserList(random.rand(24).tolist())
+        results[storage][storage] = UserList(random.rand(24).tolist())
+        results[bel][bel] = random.rand(24).tolist()
+        results[bth][bth] = [None] * 12 + random.rand(12).tolist()
+        self.es.results = results
+        self.nodes = dict(pv=pv, demand=demand, heat=heat, chp=chp)
+
+    def test_frame_is_identical_to_the_tuple_based_one(self):
+        expected = _legacy_frame(self.es)
+        frame = RDF(energy_system=self.es)
+        pd.testing.assert_frame_equal(pd.DataFrame(frame), expected)
+        ok_(frame.index.is_monotonic_increasing)
+
+    def test_rows_sharing_their_labels_are_interleaved(self):
+        bel = [k for k in self.es.results if k.label == 'electricity'][0]
+        self.es.results[bel]['first'] = [1.0] * 24
+        self.es.results[bel]['second'] = [2.0] * 24
+        frame = RDF(energy_system=self.es)
+        pd.testing.assert_frame_equal(pd.DataFrame(frame),
+                                      _legacy_frame(self.es))
+        eq_(list(frame.loc[('electricity', 'from_bus', 'kk')].val[:4]),
+            [1, 2, 1, 2])
+
+    def test_shorter_timeindex_truncates_series(self):
+        self.es.timeindex = self.es.timeindex[:10]
+        frame = RDF(energy_system=self.es)
+        pd.testing.assert_frame_equal(pd.DataFrame(frame),
+                                      _legacy_frame(self.es))
+        eq_(len(frame), 10 * len(list(_legacy_rows(self.es))))
+
+    def test_slice_by_matches_index_slice(self):
+        frame = RDF(energy_system=self.es)
+        idx = pd.IndexSlice
+        dates = slice(pd.Timestamp('2012-01-01 05:00'),
+                      pd.Timestamp('2012-01-01 07:00'))
+        cases = [(('electricity', slice(None), slice(None)), {}),
+                 ((slice(None), 'to_bus', slice(None)),
+                  dict(date_from=dates.start, date_to=dates.stop)),
+                 ((['heat'], slice(None), ['chp', 'duals']), {})]
+        for (bus, type, obj), dkw in cases:
+            expected = frame.loc[idx[bus, type, obj,
+                                     dates if dkw else slice(None)], :]
+            subset = frame.slice_by(bus_label=bus, type=type, obj_label=obj,
+                                    **dkw)
+            pd.testing.assert_frame_equal(subset, pd.DataFrame(expected))
+
+    def test_slice_by_keeps_requested_order(self):
+        frame = RDF(energy_system=self.es)
+        idx = pd.IndexSlice
+        for bus, obj in [(['heat', 'electricity'], slice(None)),
+                         (slice(None), ['pv', 'chp'])]:
+            subset = frame.slice_by(bus_label=bus, obj_label=obj)
+            pd.testing.assert_frame_equal(subset, pd.DataFrame(
+                frame.loc[idx[bus, :, obj, :], :]))
+        subset = frame.slice_by(bus_label=['heat', 'electricity'])
+        eq_(subset.index.get_level_values(0)[0], 'heat')
+
+    def test_bus_balance_is_cached_until_changed(self):
+        frame = RDF(energy_system=self.es)
+        for bus in ['electricity', 'heat']:
+            pd.testing.assert_frame_equal(frame.slice_bus_balance(bus),
+                                          frame._slice_bus_balance(bus))
+        eq_(list(frame.slice_bus_balance('heat').columns),
+            ['heat_demand', 'duals', 'chp'])
+        frame.slice_bus_balance('heat')['chp'] = 0
+        ok_((frame.slice_bus_balance('heat')['chp'] != 0).any())
+        frame.loc[('heat', 'to_bus', 'chp'), 'val'] = 1
+        eq_(frame.slice_bus_balance('heat')['chp'].sum(), 24)
+        frame['val'] = 0
+        eq_(frame.slice_bus_balance('heat')['chp'].sum(), 0)
+        frame['val'].values[:] = 2
+        eq_(frame.slice_bus_balance('heat')['chp'].sum(), 0)
+        frame.clear_cache()
+        eq_(frame.slice_bus_balance('heat')['chp'].sum(), 48)
+
+    def test_label_levels_are_categoricals(self):
+        frame = RDF(energy_system=self.es)
+        for level in frame.index.levels[:3]:
+            ok_(isinstance(level, pd.CategoricalIndex))
+        eq_(list(frame.slice_by(bus_label='heat', type='to_bus').index
+                 .get_level_values('obj_label').unique()), ['chp'])
+
+
+class Chunked_Results_Tests:
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+        self.fixture = ResultsDataFrame_Tests()
+        self.fixture.setup()
+        self.es = self.fixture.es
+
+    def teardown(self):
+        rmtree(self.tmpdir)
+
+    def test_slicing_matches_results_data_frame(self):
+        self.es.results.objective = 3
+        chunked.dump(self.es.results, self.tmpdir, self.es.timeindex,
+                     chunk_size=7)
+        results = chunked.ChunkedResults(self.tmpdir)
+        frame = RDF(energy_system=self.es)
+        eq_(results.objective, 3)
+        eq_(len([f for f in os.listdir(self.tmpdir) if f.endswith('.npy')]),
+            -(-len(frame) // 7))
+        for kwargs in [{}, dict(bus_label='heat'),
+                       dict(obj_label=['storage', 'chp']),
+                       dict(type='to_bus', date_from='2012-01-01 05:00',
+                            date_to='2012-01-01 07:00')]:
+            pd.testing.assert_frame_equal(
+                results.slice_by(**kwargs),
+                pd.DataFrame(frame.slice_by(**kwargs)),
+                check_index_type=False)
+        for bus in ['electricity', 'heat']:
+            pd.testing.assert_frame_equal(results.slice_bus_balance(bus),
+                                          frame.slice_bus_balance(bus))
+            pd.testing.assert_frame_equal(
+                results.slice_unstacked(bus_label=bus, type='from_bus'),
+                frame.slice_unstacked(bus_label=bus, type='from_bus'))
+
+    def test_labels_holding_numeric_lists(self):
+        label = _Label('pp', [2020, 2030])
+        with chunked.ChunkedWriter(self.tmpdir, self.es.timeindex) as writer:
+            writer.add('electricity', 'to_bus', label, range(24))
+            writer.attributes['investment'] = [('grid', label, 5)]
+        results = chunked.ChunkedResults(self.tmpdir)
+        eq_(results.rows.index.get_level_values('obj_label')[0], label)
+        eq_(results.slice_by(obj_label=label)['val'].sum(), 276)
+        eq_(results.investment, {('grid', label): 5})
+
+    def test_streaming_from_a_model(self):
+        es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2012', periods=3, freq='H'))
+        demand = solph.Sink(label='demand')
+        solph.Source(label='pv', outputs={demand: solph.Flow(
+            investment=solph.Investment(ep_costs=2))})
+        om = solph.OperationalModel(es)
+        for value, variable in enumerate(om.flow.values()):
+            variable.value = value
+        for variable in om.InvestmentFlow.invest.values():
+            variable.value = 7
+        chunked.dump(om, self.tmpdir)
+        results = chunked.ChunkedResults(self.tmpdir)
+        eq_(results.investment, {('pv', 'demand'): 7})
+        eq_(results.objective, om.objective())
+        eq_(results.slice_by(obj_label='pv')['val'].tolist(), [0, 1, 2])
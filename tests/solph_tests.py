@@ -1,11 +1,65 @@
+import asyncio
+from collections import UserDict, UserList
+from contextlib import contextmanager
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+from shutil import rmtree, which
+from tempfile import mkdtemp
+
+from nose.plugins.skip import SkipTest
 from nose.tools import ok_, eq_
+import numpy as np
+import pandas as pd
+import pyomo.environ as po
+from pyomo.common import Executable
+from pyomo.common.errors import ApplicationError
+from pyomo.common.tempfiles import TempfileManager
+from scipy.optimize import OptimizeResult
 
+from oemof import network
 from oemof.energy_system import EnergySystem as ES
 from oemof.solph.blocks import InvestmentFlow as IF
+from oemof.solph import aggregation, decomposition
+from oemof.solph.cache import ResultCache
+from oemof.solph.matrix import StandardForm
+from oemof.solph.broker import DirectoryBroker, run_workers, work
+from oemof.solph.models import LazyResults
+from oemof.solph.plumbing import _Sequence
+from oemof.solph.rolling import Checkpoint, RollingHorizon
+from oemof.solph.solverpool import SolverPool
+from oemof.solph.timeseries import (MappedSequence, SequenceStore,
+                                    SharedSequence, SharedTimeSeries,
+                                    deduplicate, externalize)
 from oemof.solph.network import Investment
+from oemof.tools.economics import annuity
 import oemof.solph as solph
 
 
+def _storage_system(costs=None, demand=None, inflow=None, **kwargs):
+    """ Builds an energy system in which a storage, charged from a source
+    with the variable `costs`, supplies a fixed `demand`.
+
+    The keyword arguments `inflow` are passed on to the flow into the
+    storage and all others to the storage. Returns the energy system, the
+    source, the demand and the storage.
+    """
+    costs = [1, 5, 5] if costs is None else costs
+    demand = [0, 0.5, 0.5] if demand is None else demand
+    es = solph.EnergySystem(
+        timeindex=pd.date_range('1/1/2012', periods=len(demand), freq='H'))
+    sink = solph.Sink(label='demand')
+    source = solph.Source(label='source')
+    storage = solph.Storage(
+        label='storage',
+        inputs={source: solph.Flow(variable_costs=costs, **(inflow or {}))},
+        outputs={sink: solph.Flow(actual_value=demand, fixed=True)},
+        nominal_capacity=10, inflow_conversion_factor=0.8, **kwargs)
+    return es, source, sink, storage
+
+
 class Grouping_Tests:
 
     def setup(self):
@@ -38,3 +92,986 @@ class Grouping_Tests:
             ("Expected InvestmentFlow group to be nonempty.\n" +
              "Got: {}").format(self.es.groups.get(IF)))
 
+
+class Columnar_Dump_Tests:
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+
+    def teardown(self):
+        rmtree(self.tmpdir)
+
+    def test_dump_and_restore_roundtrip(self):
+        es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2012', periods=3, freq='H'))
+        bgas = solph.Bus(label=('gas', 'bus'))
+        bel = solph.Bus(label='electricity')
+        solph.LinearTransformer(
+            label='pp', inputs={bgas: solph.Flow()},
+            outputs={bel: solph.Flow(
+                max=[0.5, 0.6, 0.7],
+                investment=Investment(ep_costs=10, maximum=20))},
+            conversion_factors={bel: 0.4})
+        eq_(es.flows()[es.groups['pp'], bel].min[2], 0)
+        results = UserDict()
+        for source, target in es.flows():
+            results[source] = results.get(source, UserDict())
+            results[source][target] = UserList([1, 2, 3])
+        results.objective = 42
+        es.results = results
+        es.dump(self.tmpdir, columnar=True)
+
+        restored = solph.EnergySystem()
+        restored.restore(self.tmpdir, columnar=True)
+        nodes = {n.label: n for n in restored.nodes}
+        pp, bel = nodes['pp'], nodes['electricity']
+        flow = pp.outputs[bel]
+
+        eq_(sorted(str(n) for n in restored.nodes),
+            sorted(str(n) for n in es.nodes))
+        ok_(nodes[('gas', 'bus')] in pp.inputs)
+        eq_(list(flow.max), [0.5, 0.6, 0.7])
+        eq_(flow.min[2], 0)
+        eq_(flow.investment.ep_costs, 10)
+        eq_(pp.conversion_factors[bel][1], 0.4)
+        ok_(restored.groups[IF])
+        eq_(list(restored.timeindex), list(es.timeindex))
+        eq_(restored.results.objective, 42)
+        eq_(list(restored.results[pp][bel]), [1, 2, 3])
+
+        # sequences stay views into the array file until they grow
+        ok_(isinstance(flow.min.data, np.ndarray))
+        eq_(flow.min[4], 0)
+        eq_(list(flow.min.data), [0] * 5)
+
+        # restored nodes can be pickled again
+        copy = pickle.loads(pickle.dumps(pp))
+        eq_(sorted(str(n) for n in copy.outputs), ['electricity'])
+        eq_(sorted(str(n) for n in copy.inputs), [str(('gas', 'bus'))])
+
+
+class LazyResults_Tests:
+
+    def setup(self):
+        self.es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2012', periods=3, freq='H'))
+        demand = solph.Sink(label='demand')
+        solph.Source(label='pv', outputs={demand: solph.Flow(
+            variable_costs=1, investment=Investment(ep_costs=2))})
+        solph.Source(label='grid', outputs={demand: solph.Flow(
+            variable_costs=3, nominal_value=4)})
+        self.om = solph.OperationalModel(self.es)
+        # Fake a solution instead of calling a solver.
+        for value, variable in enumerate(self.om.flow.values()):
+            variable.value = value
+        for variable in self.om.InvestmentFlow.invest.values():
+            variable.value = 7
+
+    def test_values_are_pulled_on_first_access(self):
+        expected = self.om.results()
+        results = LazyResults.from_model(self.om)
+        eq_(results.data, {})
+        eq_(results.objective, expected.objective)
+        eq_(dict(results.investment), dict(expected.investment))
+        eq_(list(results), list(expected))
+        source = list(expected)[0]
+        target = list(expected[source])[0]
+        eq_(list(results[source][target]), list(expected[source][target]))
+        eq_(results[source][target].invest, 7)
+        eq_(list(results.data), [source])
+        eq_(list(results[source].data), [target])
+
+    def test_pickling_materializes_the_results(self):
+        results = pickle.loads(pickle.dumps(LazyResults.from_model(self.om)))
+        expected = self.om.results()
+        eq_(type(results), UserDict)
+        eq_(results.objective, expected.objective)
+        eq_({(s.label, t.label): list(v) for s in results
+             for t, v in results[s].items()},
+            {(s.label, t.label): list(v) for s in expected
+             for t, v in expected[s].items()})
+
+
+class ScipyHighs_Tests:
+
+    def storage(self, **kwargs):
+        self.es, self.source, self.demand, storage = _storage_system(
+            inflow=kwargs)
+        return storage
+
+    def test_linear_program(self):
+        storage = self.storage()
+        om = solph.OperationalModel(self.es)
+        om.receive_duals()
+        result = om.solve(solver='scipy-highs')
+        ok_(result.success)
+        eq_(round(self.es.results.objective, 6), 4.5)
+        eq_([round(v, 6) for v in self.es.results[self.source][storage]],
+            [2, 0, 0.5])
+        # storing one more unit needs 1.25 units from the expensive hours
+        eq_(round(om.dual[om.Storage.balance[storage, 1]], 6), -6.25)
+        eq_(round(om.rc[om.flow[self.source, storage, 0]], 6), -4)
+
+    def test_mixed_integer_program(self):
+        storage = self.storage(min=0.5, binary=solph.BinaryFlow())
+        om = solph.OperationalModel(self.es)
+        om.solve(solver='scipy-highs', cmdline_options={'mip_rel_gap': 0})
+        eq_(round(self.es.results.objective, 6), 6.5)
+        eq_([om.BinaryFlow.status[self.source, storage, t].value
+             for t in om.TIMESTEPS], [1, 1, 0])
+
+    def test_mixed_integer_program_without_duals(self):
+        storage = self.storage(min=0.5, binary=solph.BinaryFlow())
+        om = solph.OperationalModel(self.es)
+        form = StandardForm(om)
+        form._linprog = lambda lb, ub, options: (
+            OptimizeResult(status=2, message="Infeasible."), None)
+        result = form.solve()
+        ok_(result.success)
+        ok_(not hasattr(result, 'duals'))
+        form.load(om, result)
+        eq_(om.BinaryFlow.status[self.source, storage, 2].value, 0)
+
+    def test_unused_variables_are_set_to_a_bound(self):
+        self.storage()
+        om = solph.OperationalModel(self.es)
+        om.unused = po.Var(within=po.NonNegativeReals)
+        om.unused_bounded = po.Var(bounds=(2, 5))
+        om.unused_free = po.Var()
+        om.solve(solver='scipy-highs')
+        eq_([om.unused.value, om.unused_bounded.value, om.unused_free.value],
+            [0, 2, 0])
+
+    def test_constraints_without_variables_are_checked(self):
+        self.storage()
+        om = solph.OperationalModel(self.es)
+        om.fixed = po.Var(initialize=3)
+        om.fixed.fix()
+        om.satisfied = po.Constraint(expr=om.fixed <= 3)
+        ok_(all(c is not om.satisfied for c in StandardForm(om).constraints))
+        om.violated = po.Constraint(expr=om.fixed >= 4)
+        try:
+            StandardForm(om)
+        except ValueError as e:
+            ok_('violated' in str(e))
+        else:
+            raise AssertionError("ValueError not raised")
+
+    def test_solve_kwargs(self):
+        self.storage()
+        om = solph.OperationalModel(self.es)
+        ok_(om.solve(solver='scipy-highs', solve_kwargs={'tee': False})
+            .success)
+        try:
+            om.solve(solver='scipy-highs', solve_kwargs={'keepfiles': True})
+        except ValueError as e:
+            ok_('keepfiles' in str(e))
+        else:
+            raise AssertionError("ValueError not raised")
+
+
+_CBC_STUB = """#!{}
+import os
+import sys
+import time
+args = sys.argv[1:]
+if '-stop' in args:
+    print('Version: 2.10.5')
+    sys.exit(0)
+if '-fail' in args:
+    print('Error: broken solver')
+    sys.exit(1)
+log = os.environ.get('CBC_STUB_LOG')
+if log:
+    with open(log, 'a') as f:
+        f.write('start\\n')
+    time.sleep(0.2)
+with open(args[args.index('-solu') + 1], 'w') as f:
+    f.write('Optimal - objective value 9.00000000')
+if log:
+    with open(log, 'a') as f:
+        f.write('end\\n')
+print('Result - Optimal solution found')
+"""
+
+
+@contextmanager
+def _stubbed_cbc():
+    """ Replaces the CBC executable by a stub only writing the solution of a
+    model without free variables, see :func:`_pv_model`, and yields the
+    directory of pyomo's temporary files.
+    """
+    tmpdir, files = mkdtemp(), mkdtemp()
+    stub = os.path.join(tmpdir, 'cbc')
+    with open(stub, 'w') as f:
+        f.write(_CBC_STUB.format(sys.executable))
+    os.chmod(stub, 0o755)
+    Executable('cbc').set_path(stub)
+    TempfileManager.push()
+    TempfileManager.tempdir = files
+    try:
+        yield files
+    finally:
+        TempfileManager.pop()
+        Executable('cbc').set_path(None)
+        rmtree(tmpdir)
+        rmtree(files)
+
+
+def _pv_model():
+    es = solph.EnergySystem(
+        timeindex=pd.date_range('1/1/2012', periods=2, freq='H'))
+    demand = solph.Sink(label='demand')
+    solph.Source(label='pv', outputs={demand: solph.Flow(
+        actual_value=[1, 2], nominal_value=1, fixed=True, variable_costs=3)})
+    return solph.OperationalModel(es)
+
+
+class SolverPool_Tests:
+
+    def model(self, costs):
+        return solph.OperationalModel(_storage_system(costs)[0])
+
+    def solve_all(self, pool, models, **kwargs):
+        async def solve():
+            return await asyncio.gather(*[
+                om.solve_async(pool=pool, **kwargs) for om in models])
+        return asyncio.run(solve())
+
+    def test_concurrent_solves(self):
+        costs = [[1, 5, 5], [1, 1, 1], [5, 2, 5]]
+        expected = []
+        for c in costs:
+            om = self.model(c)
+            om.solve(solver='scipy-highs')
+            expected.append(om.es.results.objective)
+        pool = SolverPool(max_processes=1)
+        models = [self.model(c) for c in costs]
+        self.solve_all(pool, models, solver='scipy-highs')
+        eq_([om.es.results.objective for om in models], expected)
+        eq_(round(expected[0], 6), 4.5)
+        eq_(pool.active, 0)
+        pool.shutdown()
+
+    def test_pool_in_several_event_loops(self):
+        pool = SolverPool(max_processes=1)
+        for run in range(2):
+            models = [self.model(c) for c in ([1, 5, 5], [1, 1, 1])]
+            self.solve_all(pool, models, solver='scipy-highs')
+            eq_([round(om.es.results.objective, 6) for om in models],
+                [4.5, 2.5])
+        pool.shutdown()
+
+    def test_stubbed_solver_subprocess(self):
+        """ A solver running as a subprocess, with a CBC executable only
+        writing the solution of a model without free variables.
+        """
+        with _stubbed_cbc() as files:
+            om = _pv_model()
+            es = om.es
+            pv, demand = es.groups['pv'], es.groups['demand']
+            pool = SolverPool(max_processes=1)
+            results = asyncio.run(om.solve_async(solver='cbc', pool=pool))
+            eq_(str(results.solver.termination_condition), 'optimal')
+            eq_(es.results.objective, 9)
+            eq_(list(es.results[pv][demand]), [1, 2])
+            try:
+                asyncio.run(om.solve_async(solver='cbc', pool=pool,
+                                           cmdline_options={'fail': ''}))
+            except ApplicationError:
+                pass
+            else:
+                raise AssertionError("ApplicationError not raised")
+            eq_(pool.active, 0)
+            # the problem, solution and log files are removed
+            eq_(os.listdir(files), [])
+            pool.shutdown()
+
+    def test_limit_holds_across_event_loops(self):
+        """ Two threads with an event loop each share a pool with one solver
+        slot, so their solvers run one after the other.
+        """
+        with _stubbed_cbc() as files:
+            log = os.path.join(files, 'log')
+            os.environ['CBC_STUB_LOG'] = log
+            try:
+                pool = SolverPool(max_processes=1, max_threads=2)
+                models = [_pv_model() for _ in range(2)]
+                threads = [threading.Thread(target=asyncio.run, args=(
+                    om.solve_async(solver='cbc', pool=pool),))
+                    for om in models]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                pool.shutdown()
+            finally:
+                del os.environ['CBC_STUB_LOG']
+            eq_([om.es.results.objective for om in models], [9, 9])
+            with open(log) as f:
+                eq_(f.read().split(), ['start', 'end', 'start', 'end'])
+            os.remove(log)
+            eq_(os.listdir(files), [])
+
+    def test_cache(self):
+        cache = ResultCache()
+        pool = SolverPool(max_processes=1)
+        for run in range(2):
+            om = self.model([1, 5, 5])
+            asyncio.run(om.solve_async(solver='scipy-highs', pool=pool,
+                                       cache=cache))
+            eq_(round(om.es.results.objective, 6), 4.5)
+        eq_((cache.misses, cache.hits), (1, 1))
+        pool.shutdown()
+
+    def test_solver_subprocess(self):
+        if which('glpsol') is None:
+            raise SkipTest("GLPK is not installed.")
+        pool = SolverPool(max_processes=2)
+        models = [self.model([1, 5, 5]), self.model([1, 1, 1])]
+        self.solve_all(pool, models, solver='glpk')
+        eq_([round(om.es.results.objective, 6) for om in models],
+            [4.5, 2.5])
+        pool.shutdown()
+
+
+class DirectoryBroker_Tests:
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+        self.es = _storage_system()[0]
+        self.broker = DirectoryBroker(self.tmpdir, max_attempts=2)
+        self.broker.add_system('base', self.es)
+        self.costs = {'a': [1, 5, 5], 'b': 2, 'c': [5, 1, 1]}
+        for job, costs in self.costs.items():
+            ok_(self.broker.submit(
+                job, 'base',
+                overrides={('source', 'storage'): {'variable_costs': costs}},
+                solve_kwargs={'solver': 'scipy-highs'}))
+        self.broker.submit('broken', 'base',
+                           overrides={('source', 'nowhere'): {'min': 1}})
+
+    def teardown(self):
+        rmtree(self.tmpdir)
+
+    def expected(self, costs):
+        self.es.flows()[self.es.groups['source'],
+                        self.es.groups['storage']].variable_costs = (
+            solph.plumbing.sequence(costs))
+        om = solph.OperationalModel(self.es)
+        om.solve(solver='scipy-highs')
+        return self.es.results
+
+    def test_workers_run_all_jobs(self):
+        eq_(run_workers(self.tmpdir, processes=2, max_attempts=2), 5)
+        eq_(self.broker.jobs('done'), ['a', 'b', 'c'])
+        eq_(self.broker.jobs('pending') + self.broker.jobs('running'), [])
+        for job, costs in self.costs.items():
+            result = self.broker.result(job)
+            expected = self.expected(costs)
+            eq_(round(result['objective'], 6), round(expected.objective, 6))
+            sequences = result['sequences']
+            ok_(sequences.index.equals(self.es.timeindex))
+            eq_(list(sequences['source', 'storage']),
+                list(expected[self.es.groups['source']][
+                    self.es.groups['storage']]))
+        # completed jobs are checkpoints
+        ok_(not self.broker.submit('a', 'base'))
+
+    def test_failed_jobs_are_retried(self):
+        eq_(work(self.tmpdir, max_attempts=2), 5)
+        eq_(self.broker.jobs('failed'), ['broken'])
+        job = self.broker.job('broken')
+        eq_(job['state'], 'failed')
+        eq_(job['attempts'], 2)
+        ok_('nowhere' in job['errors'][0])
+
+    def test_stale_jobs_are_requeued(self):
+        job = self.broker.claim()
+        eq_(self.broker.jobs('running'), [job['id']])
+        eq_(self.broker.requeue(timeout=60), [])
+        eq_(self.broker.requeue(timeout=-1), [job['id']])
+        eq_(self.broker.claim()['id'], job['id'])
+
+
+class RollingHorizon_Tests:
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+        self.es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2012', periods=4, freq='H'))
+        demand = solph.Sink(label='demand')
+        self.unit = solph.Source(label='unit', outputs={demand: solph.Flow(
+            nominal_value=10, min=0.5, max=0.6, variable_costs=-1,
+            binary=solph.BinaryFlow(startup_costs=10))})
+        source = solph.Source(label='source')
+        self.storage = solph.Storage(
+            label='storage', inputs={source: solph.Flow(variable_costs=5)},
+            outputs={solph.Sink(label='d2'): solph.Flow(
+                actual_value=[0, 0, 1, 0], nominal_value=1, fixed=True)},
+            nominal_capacity=2, initial_capacity=0.5,
+            inflow_conversion_factor=0.8)
+        self.source = source
+
+    def teardown(self):
+        rmtree(self.tmpdir)
+
+    def check(self, horizon):
+        results = self.es.results
+        # the unit is started once and the storage isn't refilled
+        eq_(results.objective, -4 * 6 + 10)
+        eq_(list(results[self.source][self.storage]), [0, 0, 0, 0])
+        eq_([round(v, 6) for v in results[self.storage][self.storage]],
+            [1, 1, 0.6, 0.6])
+        eq_(horizon.checkpoint.state['status'], [[['unit', 'demand'], 1]])
+
+    def test_levels_and_states_are_carried_over(self):
+        horizon = RollingHorizon(self.es, window=2, solver='scipy-highs')
+        eq_([list(w) for w in horizon.windows], [[0, 1], [2, 3]])
+        ok_(horizon.run())
+        self.check(horizon)
+
+    def test_resume(self):
+        path = os.path.join(self.tmpdir, 'run.npz')
+        horizon = RollingHorizon(self.es, window=2, checkpoint=path,
+                                 solver='scipy-highs')
+        ok_(not horizon.run(max_windows=1))
+        eq_(len(self.es.results[self.source][self.storage]), 2)
+        checkpoint = Checkpoint(path)
+        eq_(checkpoint.position, 1)
+        eq_(checkpoint.values.shape, (4, 2))
+        horizon = RollingHorizon(self.es, window=2, checkpoint=path,
+                                 solver='scipy-highs')
+        eq_(horizon.checkpoint.position, 1)
+        ok_(horizon.run())
+        self.check(horizon)
+        eq_(Checkpoint(path).position, 2)
+        # every window is written once, to a file of its own
+        eq_(sorted(os.listdir(self.tmpdir)),
+            ['run.0.npy', 'run.1.npy', 'run.npz'])
+
+    def test_storages_with_several_outputs_are_rejected(self):
+        network.flow[self.storage, solph.Sink(label='d3')] = solph.Flow()
+        try:
+            RollingHorizon(self.es, window=2, solver='scipy-highs')
+        except ValueError as e:
+            ok_('Storages' in str(e))
+        else:
+            raise AssertionError("ValueError not raised")
+
+
+class ResultCache_Tests:
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+        self.es, self.source, _, self.storage = _storage_system()
+
+    def teardown(self):
+        rmtree(self.tmpdir)
+
+    def solve(self, cache):
+        om = solph.OperationalModel(self.es)
+        om.receive_duals()
+        result = om.solve(solver='scipy-highs', cache=cache)
+        return om, result
+
+    def test_hits_restore_results(self):
+        om, result = self.solve(self.tmpdir)
+        ok_(not getattr(result, 'cached', False))
+        expected = self.es.results
+        duals = [om.dual[c] for c in om.Storage.balance.values()]
+
+        cache = ResultCache(self.tmpdir)
+        om, result = self.solve(cache)
+        ok_(result.cached)
+        eq_((cache.hits, cache.misses), (1, 0))
+        eq_(self.es.results.objective, expected.objective)
+        eq_(list(self.es.results[self.source][self.storage]),
+            list(expected[self.source][self.storage]))
+        eq_([om.dual[c] for c in om.Storage.balance.values()], duals)
+
+    def test_changed_models_miss(self):
+        cache = ResultCache()
+        self.solve(cache)
+        self.storage.inputs[self.source].variable_costs = (
+            solph.plumbing.sequence(2))
+        om, result = self.solve(cache)
+        ok_(not getattr(result, 'cached', False))
+        eq_((cache.hits, cache.misses), (0, 2))
+        self.solve(cache)
+        eq_((cache.hits, cache.misses), (1, 2))
+
+
+class CoarseToFine_Tests:
+
+    def setup(self):
+        self.es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2012', periods=8, freq='H'))
+        self.demand = solph.Sink(label='demand')
+        self.pp = solph.Source(label='pp', outputs={self.demand: solph.Flow(
+            variable_costs=3, investment=solph.Investment(ep_costs=2))})
+        grid = solph.Source(label='grid')
+        self.storage = solph.Storage(
+            label='storage',
+            inputs={grid: solph.Flow(variable_costs=[1] * 4 + [9] * 4)},
+            outputs={self.demand: solph.Flow()}, nominal_capacity=20,
+            inflow_conversion_factor=0.8)
+
+    def supply(self, model, load):
+        model.supply = po.Constraint(model.TIMESTEPS, rule=lambda m, t: (
+            m.flow[self.pp, self.demand, t] +
+            m.flow[self.storage, self.demand, t] == load[t]))
+
+    def solve(self, load, **kwargs):
+        om = solph.OperationalModel(self.es)
+        self.supply(om, load)
+        om.solve(solver='scipy-highs')
+        expected = om.objective()
+
+        def extend(coarse):
+            self.supply(coarse, [np.mean(load[k:k + 2])
+                                 for k in range(0, len(load), 2)])
+        om = solph.OperationalModel(self.es)
+        self.supply(om, load)
+        om.solve(solver='coarse-to-fine',
+                 solve_kwargs=dict(kwargs, factor=2, extend=extend))
+        eq_(round(om.objective(), 6), round(expected, 6))
+        return om
+
+    def test_aggregated(self):
+        flow = self.storage.inputs[self.es.groups['grid']]
+        with aggregation.aggregated(self.es, aggregation.segments(
+                range(8), 3), [1] * 8) as es:
+            eq_(flow.variable_costs, [1, 19 / 3, 9])
+            eq_(es.groups['storage'].capacity_loss, [0, 0, 0])
+        eq_(list(flow.variable_costs), [1] * 4 + [9] * 4)
+
+    def test_investments_are_fixed(self):
+        om = self.solve([2, 2, 6, 6, 4, 4, 2, 2], storage_band=0.1)
+        invest = om.InvestmentFlow.invest[self.pp, self.demand]
+        ok_(invest.fixed)
+        eq_(round(invest.value, 6), 2)
+
+    def test_infeasible_restrictions_are_undone(self):
+        # the coarse peak is lower than the peak of the full model
+        om = self.solve([1, 1, 1, 1, 1, 9, 1, 1])
+        ok_(not om.InvestmentFlow.invest[self.pp, self.demand].fixed)
+
+
+class Segmentation_Tests:
+
+    def setup(self):
+        self.es, self.source, self.demand, self.storage = _storage_system(
+            costs=[1, 1, 1, 1, 9, 9, 9, 9],
+            demand=[0, 0, 0, 0, 0.5, 0.5, 0.25, 0.25])
+
+    def test_segment(self):
+        eq_(aggregation.segment(self.es, n_segments=3),
+            [[0, 1, 2, 3], [4, 5], [6, 7]])
+        eq_(aggregation.segment(self.es, tolerance=0),
+            [[0, 1, 2, 3], [4, 5], [6, 7]])
+        eq_(len(aggregation.segment(self.es, n_segments=1)), 1)
+
+    def test_segmented_model_equals_the_full_model(self):
+        om = solph.OperationalModel(self.es)
+        om.solve(solver='scipy-highs')
+        expected = self.es.results
+
+        om = solph.SegmentedModel(
+            self.es, aggregation.segment(self.es, n_segments=3))
+        eq_(list(om.timeincrement[:3]), [4, 2, 2])
+        eq_(len(om.timeindex), 3)
+        ok_(om.timeindex.freq is None)
+        om.solve(solver='scipy-highs')
+        results = self.es.results
+        eq_(round(results.objective, 6), round(expected.objective, 6))
+        eq_(list(results[self.storage][self.demand]),
+            list(expected[self.storage][self.demand]))
+        eq_([round(v, 6) for v in results[self.source][self.storage]],
+            [0.9375] * 4 + [0] * 4)
+        # the levels are interpolated within the segments
+        eq_([round(v, 6) for v in
+             np.diff(results[self.storage][self.storage])],
+            [0.75, 0.75, 0.75, -1, -1, -0.5, -0.5])
+
+    def test_timeindex_without_frequency(self):
+        timeindex = self.es.timeindex[[0, 4, 6]]
+        try:
+            solph.OperationalModel(self.es, timeindex=timeindex,
+                                   timesteps=range(3))
+        except ValueError as e:
+            ok_('timeincrement' in str(e))
+        else:
+            raise AssertionError("ValueError not raised")
+        om = solph.OperationalModel(self.es, timeindex=timeindex,
+                                    timesteps=range(3),
+                                    timeincrement=[4, 2, 2])
+        eq_(om.timeincrement[1], 2)
+
+
+class Benders_Tests:
+
+    def setup(self):
+        self.es, self.source, _, self.storage = _storage_system(
+            costs=[1, 5, 5, 2, 6, 3] * 2,
+            demand=[0, 0.5, 0.5, 0.2, 0.9, 0.1] * 2,
+            inflow={'investment': Investment(ep_costs=3)},
+            capacity_loss=0.01)
+        om = solph.OperationalModel(self.es)
+        om.solve(solver='scipy-highs')
+        self.objective = self.es.results.objective
+
+    def check(self, om, result):
+        ok_(result.success)
+        eq_(round(result.fun, 6), round(self.objective, 6))
+        eq_(round(self.es.results.objective, 6), round(self.objective, 6))
+        eq_(round(om.InvestmentFlow.invest[self.source, self.storage].value,
+                  6), 2)
+
+    def test_serial_chunks(self):
+        om = solph.OperationalModel(self.es)
+        result = om.solve(solver='benders',
+                          solve_kwargs={'chunks': 3, 'max_workers': 1})
+        self.check(om, result)
+
+    def test_parallel_chunks(self):
+        om = solph.OperationalModel(self.es)
+        result = om.solve(solver='benders', solve_kwargs={
+            'chunks': [range(5), range(5, 12)], 'max_workers': 2})
+        self.check(om, result)
+
+    def test_no_iterations(self):
+        om = solph.OperationalModel(self.es)
+        result = decomposition.benders(om, chunks=3, max_workers=1,
+                                       max_iterations=0)
+        ok_(not result.success)
+        eq_(result.nit, 0)
+
+    def test_default_chunks(self):
+        om = solph.OperationalModel(self.es)
+        result = om.solve(solver='benders')
+        self.check(om, result)
+
+
+class Separable_Tests:
+
+    def setup(self):
+        self.es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2012', periods=6, freq='H'))
+        self.demand = solph.Sink(label='demand')
+        self.units = [
+            solph.Source(label='cheap', outputs={self.demand: solph.Flow(
+                nominal_value=10, max=[1, 1, 0.5, 0.5, 1, 1],
+                variable_costs=1)}),
+            solph.Source(label='peak', outputs={self.demand: solph.Flow(
+                nominal_value=8, min=0.5, variable_costs=4,
+                binary=solph.BinaryFlow())})]
+        self.load = [3, 8, 12, 9, 14, 4]
+
+    def model(self):
+        om = solph.OperationalModel(self.es)
+        om.supply = po.Constraint(om.TIMESTEPS, rule=lambda m, t: sum(
+            m.flow[u, self.demand, t] for u in self.units) == self.load[t])
+        om.receive_duals()
+        return om
+
+    def test_chunks_equal_the_whole_model(self):
+        eq_(decomposition.temporal_coupling(self.es), [])
+        for kwargs in [{'chunks': 6, 'max_workers': 1},
+                       {'chunks': [range(2), range(2, 6)], 'max_workers': 2}]:
+            om = self.model()
+            result = om.solve(solver='separable', solve_kwargs=kwargs)
+            ok_(result.success)
+            eq_(round(result.fun, 6), 95)
+            eq_(round(self.es.results.objective, 6), 95)
+            eq_([round(om.dual[om.supply[t]], 6) for t in om.TIMESTEPS],
+                [1, 1, 4, 4, 4, 1])
+
+    def test_coupled_model_is_solved_as_a_whole(self):
+        self.units[0].outputs[self.demand].summed_max = 4
+        eq_([(i.label, a) for (i, o), a in
+             decomposition.temporal_coupling(self.es)],
+            [('cheap', 'summed_max')])
+        om = self.model()
+        result = om.solve(solver='separable')
+        ok_(result.success)
+        eq_(round(result.fun, 6), 95)
+
+    def test_workers_hold_their_shard_only(self):
+        shards = decomposition._Shards(list('abcde'), max_workers=2)
+        try:
+            eq_(shards.map(_held, range(5)),
+                [[0, 2, 4], [1, 3], [0, 2, 4], [1, 3], [0, 2, 4]])
+        finally:
+            shards.shutdown()
+
+
+class Components_Tests:
+
+    def setup(self):
+        self.es, self.source, _, self.storage = _storage_system()
+        self.de = solph.Sink(label='de')
+        self.pv = solph.Source(label='pv', outputs={self.de: solph.Flow(
+            actual_value=[1, 2, 3], nominal_value=2, fixed=True,
+            variable_costs=1)})
+        solph.Sink(label='unconnected')
+
+    def test_components(self):
+        eq_([sorted(n.label for n in part)
+             for part in decomposition.components(self.es)],
+            [['demand', 'source', 'storage'], ['de', 'pv'], ['unconnected']])
+
+    def check(self):
+        results = self.es.results
+        eq_(len(results.solver), 2)
+        eq_(round(results.objective, 6), 12 + 4.5)
+        eq_(list(results[self.pv][self.de]), [2, 4, 6])
+        eq_([round(v, 6) for v in results[self.source][self.storage]],
+            [2, 0, 0.5])
+        eq_(len(results[self.storage][self.storage]), 3)
+
+    def test_serial_components(self):
+        decomposition.solve_components(self.es, max_workers=1,
+                                       solver='scipy-highs')
+        self.check()
+        # building the models of the components keeps the registry
+        solph.Sink(label='added')
+        eq_(self.es.nodes[-1].label, 'added')
+
+    def test_parallel_components(self):
+        decomposition.solve_components(self.es, max_workers=2,
+                                       solver='scipy-highs')
+        self.check()
+
+    def test_parallel_components_with_flows_added_later(self):
+        # NodesFromCSV connects nodes like this, after creating them
+        fr = solph.Sink(label='fr')
+        wind = solph.Source(label='wind')
+        network.flow[wind, fr] = solph.Flow(
+            actual_value=[3, 2, 1], nominal_value=1, fixed=True,
+            variable_costs=2)
+        decomposition.solve_components(self.es, max_workers=1,
+                                       solver='scipy-highs')
+        serial = self.es.results.objective
+        decomposition.solve_components(self.es, max_workers=2,
+                                       solver='scipy-highs')
+        eq_(round(serial, 6), 12 + 4.5 + 12)
+        eq_(round(self.es.results.objective, 6), round(serial, 6))
+        eq_(list(self.es.results[wind][fr]), [3, 2, 1])
+
+
+class Lagrangian_Tests:
+
+    def setup(self):
+        self.es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2012', periods=6, freq='H'))
+        demand = solph.Sink(label='demand')
+        self.units = [
+            solph.Source(label='unit{}'.format(k), outputs={demand: solph.Flow(
+                nominal_value=n, min=0.5, variable_costs=c,
+                binary=solph.BinaryFlow(startup_costs=s))})
+            for k, (n, c, s) in enumerate([(10, 1, 20), (6, 3, 2), (4, 6, 0)])]
+        self.load = [3, 8, 14, 17, 9, 4]
+
+    def model(self):
+        om = solph.OperationalModel(self.es)
+        # couples the units like the balance of a bus
+        om.supply = po.Constraint(om.TIMESTEPS, rule=lambda m, t: sum(
+            m.flow[u, o, t] for u in self.units for o in u.outputs) ==
+            self.load[t])
+        return om
+
+    def check(self, om, result):
+        om.solve(solver='scipy-highs', cmdline_options={'mip_rel_gap': 0})
+        optimum = self.es.results.objective
+        ok_(result.lower_bound <= optimum + 1e-6)
+        eq_(round(result.fun, 6), optimum)
+        eq_(round(result.upper_bound, 6), optimum)
+
+    def test_serial_units(self):
+        om = self.model()
+        result = om.solve(solver='lagrangian', solve_kwargs={
+            'relax': [om.supply], 'max_workers': 1, 'max_iterations': 20,
+            'repair_interval': 5})
+        eq_(round(self.es.results.objective, 6), round(result.fun, 6))
+        supply = [sum(om.flow[u, o, t].value for u in self.units
+                      for o in u.outputs) for t in om.TIMESTEPS]
+        eq_([round(v, 6) for v in supply], self.load)
+        self.check(self.model(), result)
+
+    def test_parallel_units(self):
+        om = self.model()
+        result = om.solve(solver='lagrangian', solve_kwargs={
+            'relax': [om.supply], 'max_workers': 2, 'max_iterations': 10})
+        self.check(self.model(), result)
+
+    def test_no_iterations(self):
+        om = self.model()
+        result = decomposition.lagrangian(om, relax=[om.supply],
+                                          max_workers=1, max_iterations=0)
+        eq_(result.nit, 0)
+        ok_(result.lower_bound <= result.fun + 1e-6)
+
+    def test_bus_balances_are_relaxed_by_default(self):
+        es = solph.EnergySystem(timeindex=self.es.timeindex)
+        bus = solph.Bus(label='bus')
+        solph.Sink(label='demand', inputs={bus: solph.Flow(
+            actual_value=self.load, nominal_value=1, fixed=True)})
+        for k, (n, c, s) in enumerate([(10, 1, 20), (6, 3, 2), (4, 6, 0)]):
+            solph.Source(label='unit{}'.format(k), outputs={bus: solph.Flow(
+                nominal_value=n, min=0.5, variable_costs=c,
+                binary=solph.BinaryFlow(startup_costs=s))})
+        result = solph.OperationalModel(es).solve(
+            solver='lagrangian', solve_kwargs={
+                'max_workers': 1, 'max_iterations': 20,
+                'repair_interval': 5})
+        solph.OperationalModel(es).solve(solver='scipy-highs',
+                                         cmdline_options={'mip_rel_gap': 0})
+        eq_(round(result.fun, 6), round(es.results.objective, 6))
+
+
+class ExpansionModel_Tests:
+
+    def setup(self):
+        self.es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2020', periods=2, freq='H'))
+        self.market = solph.Sink(label='market')
+        self.pv = solph.Source(label='pv', outputs={self.market: solph.Flow(
+            actual_value=[0.5, 1], fixed=True, variable_costs=-4,
+            investment=Investment(maximum=5, existing=1, capex=20,
+                                  lifetime=15, wacc=0.1))})
+        # Operation earns 4 * 1.5 per unit of capacity and hour. The
+        # existing capacity is extended to the maximum, the vintage of 2020
+        # lasts until 2034 and is replaced in 2040.
+        annual = annuity(20, 15, 0.1)
+
+        def discount(years):
+            return sum(1.05 ** -(y - 2020) for y in years)
+        self.discount = discount
+        self.objective = (discount(range(2020, 2050)) * -4 * 1.5 * 2 * 5 +
+                          4 * annual * discount(range(2020, 2035)) +
+                          4 * annual * discount(range(2040, 2050)))
+
+    def solve(self, myopic):
+        em = solph.ExpansionModel(self.es, periods=[2020, 2030, 2040],
+                                  end=2050, discount_rate=0.05, weights=2,
+                                  myopic=myopic)
+        em.solve(solver='scipy-highs')
+        results = self.es.results
+        eq_([round(results.investment[self.pv, self.market, p], 6)
+             for p in [2020, 2030, 2040]], [4, 0, 4])
+        eq_([round(results.capacity[self.pv, self.market, p], 6)
+             for p in [2020, 2030, 2040]], [5, 5, 5])
+        eq_(round(results.objective, 6), round(self.objective, 6))
+        eq_(sorted(results.keys()), [2020, 2030, 2040])
+        return em
+
+    def test_perfect_foresight(self):
+        em = self.solve(myopic=False)
+        eq_(em.operation[2030].flow[self.pv, self.market, 1].value, 5)
+
+    def test_myopic(self):
+        em = self.solve(myopic=True)
+        eq_([m.periods for m in em.models], [[2020], [2030], [2040]])
+        ok_(not hasattr(em, 'invest'))
+
+    def test_fixed_costs_are_not_weighted(self):
+        # The fixed costs of a flow without investment are paid once a year,
+        # independent of the weight of the representative timeindex.
+        solph.Source(label='grid', outputs={self.market: solph.Flow(
+            actual_value=[0, 0], fixed=True, nominal_value=2,
+            fixed_costs=3)})
+        self.objective += 2 * 3 * self.discount(range(2020, 2050))
+        self.solve(myopic=False)
+
+
+class TimeSeries_Tests:
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+        self.es = solph.EnergySystem(
+            timeindex=pd.date_range('1/1/2012', periods=4, freq='H'))
+        self.demand = solph.Sink(label='demand')
+        self.pv = solph.Source(label='pv', outputs={self.demand: solph.Flow(
+            actual_value=[0.1, 0.2, 0.3, 0.4], nominal_value=10, fixed=True,
+            variable_costs=[1, 2, 3, 4])})
+        bus = solph.Bus(label='bus')
+        self.storage = solph.Storage(
+            label='storage', inputs={bus: solph.Flow()},
+            outputs={bus: solph.Flow()}, nominal_capacity=10,
+            capacity_loss=[0.01, 0.02, 0.03, 0.04])
+
+    def teardown(self):
+        rmtree(self.tmpdir)
+
+    def test_sequences_are_mapped_views(self):
+        path = os.path.join(self.tmpdir, 'timeseries.npy')
+        replaced = externalize(self.es, path)
+        flow = self.pv.outputs[self.demand]
+        eq_(sorted(a for _, a in replaced),
+            ['actual_value', 'capacity_loss', 'variable_costs'])
+        ok_(isinstance(flow.actual_value, MappedSequence))
+        eq_(list(flow.variable_costs), [1, 2, 3, 4])
+        eq_(self.storage.capacity_loss[2], 0.03)
+        ok_(self.storage._state[1]['capacity_loss'] is
+            self.storage.capacity_loss)
+        ok_(isinstance(flow.min, _Sequence))
+
+        copy = pickle.loads(pickle.dumps(flow.actual_value))
+        ok_(np.shares_memory(copy, flow.actual_value))
+        ok_(len(pickle.dumps(flow.actual_value)) < 200)
+
+        om = solph.OperationalModel(self.es.__class__(
+            timeindex=self.es.timeindex, entities=[self.pv, self.demand]))
+        eq_(om.flow[self.pv, self.demand, 2].value, 3)
+
+    def test_sequences_are_shared_with_workers(self):
+        with SharedTimeSeries(self.es) as shared:
+            flow = self.pv.outputs[self.demand]
+            ok_(isinstance(flow.actual_value, SharedSequence))
+            eq_(len(shared.replaced), 3)
+            dumped = pickle.dumps(self.storage)
+            ok_(len(dumped) < 2000)
+            storage = pickle.loads(dumped)
+            eq_(list(storage.capacity_loss), [0.01, 0.02, 0.03, 0.04])
+            eq_(storage.nominal_capacity, 10)
+
+            context = multiprocessing.get_context('fork')
+            with context.Pool(1) as pool:
+                eq_(pool.map(_costs, [[self.pv, self.demand]]), [10.0])
+        ok_(shared.name not in SharedSequence._blocks)
+        ok_(shared.name not in SharedSequence._memory)
+
+    def test_unlinked_block_is_closed(self):
+        shared = SharedTimeSeries([])
+        shared.unlink()
+        ok_(shared._block.buf is None)
+        ok_(shared.name not in SharedSequence._memory)
+
+    def test_equal_profiles_are_stored_once(self):
+        wind = solph.Source(label='wind', outputs={self.demand: solph.Flow(
+            actual_value=(0.1, 0.2, 0.3, 0.4), variable_costs=[1, 2, 3, 4])})
+        store = deduplicate(self.es)
+        eq_(len(store), 3)
+        pv, wind = self.pv.outputs[self.demand], wind.outputs[self.demand]
+        ok_(pv.actual_value is wind.actual_value)
+        ok_(pv.variable_costs is wind.variable_costs)
+        ok_(not pv.actual_value.flags.writeable)
+        eq_(store.digest(wind.variable_costs), store.digest([1, 2, 3, 4]))
+        ok_(self.pv._state[1]['outputs'][self.demand] is pv)
+
+        path = os.path.join(self.tmpdir, 'timeseries.npy')
+        externalize(self.es, path)
+        eq_(len(np.load(path)), 12)
+        eq_(list(wind.actual_value), [0.1, 0.2, 0.3, 0.4])
+
+
+def _held(k):
+    return sorted(decomposition._SUBPROBLEMS)
+
+
+def _costs(nodes):
+    flow = nodes[0].outputs[nodes[1]]
+    ok_(isinstance(flow.actual_value, SharedSequence))
+    return float(np.dot(flow.actual_value, flow.variable_costs) *
+                 flow.nominal_value / 3)
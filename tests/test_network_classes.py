@@ -1,8 +1,10 @@
 from traceback import format_exception_only as feo
+import pickle
 
 from nose.tools import assert_raises, eq_, ok_
 
 from oemof.energy_system import EnergySystem as ES
+from oemof import network
 from oemof.network import Bus, Node, Transformer
 
 
@@ -105,6 +107,15 @@ class Node_Tests:
              "\n  Got: {} instead").format(new.outputs))
 
 
+    def test_pickled_nodes_keep_flows_added_later(self):
+        Node.registry = None
+        source, target = Node(label="source"), Node(label="target")
+        network.flow[source, target] = "flow"
+        source, target = pickle.loads(pickle.dumps((source, target)))
+        eq_(source.outputs, {target: "flow"})
+        eq_(target.inputs, {source: "flow"})
+
+
 class EnergySystem_Nodes_Integration_Tests:
 
     def setup(self):